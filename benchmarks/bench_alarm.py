@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Alarm Latency Benchmark          #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Full daemon against vp2_sim.py with a  #
+#    wind stow rule, alarms subscribed over #
+#    the service socket                     #
+#   -frame receipt -> alarm event latency   #
+#   -usage: python bench_alarm.py -h        #
+#############################################
+
+import os
+import sys
+import json
+import time
+import select
+import socket
+import argparse
+import calendar
+import datetime
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'weather_daemon'))
+import main_thread
+from bench_e2e import daemon_args, free_port, percentile, start_sim
+
+
+def iso_epoch(ts):
+    dt = datetime.datetime.strptime(ts, '%Y-%m-%dT%H:%M:%S.%f')
+    return calendar.timegm(dt.utctimetuple()) + dt.microsecond * 1e-6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Frame receipt to alarm event latency')
+    parser.add_argument('--duration', type=float, default=10.0, help='measurement window, seconds')
+    parser.add_argument('--interval', type=float, default=0.05, help='simulator seconds between packets')
+    parser.add_argument('--above', type=float, default=8, help='wind_speed alarm threshold, mph')
+    parser.add_argument('--clear', type=float, default=6, help='wind_speed clear threshold, mph')
+    opts = parser.parse_args()
+
+    sim_opts = argparse.Namespace(stations=1, interval=opts.interval, latency=0.0,
+                                  fragment=0, drop=0.0, replay=None)
+    port = free_port()
+    sim = start_sim(sim_opts, port)
+
+    log_path = tempfile.mkdtemp()
+    args = daemon_args(['--ser_ip', '127.0.0.1', '--ser_port', str(free_port()),
+                        '--wx_ip', '127.0.0.1', '--wx_port', str(port), '--wx_rate', '1',
+                        '--wx_stream', '--wx_history', '1',
+                        '--wx_alarms', os.path.join(log_path, 'alarms.json'),
+                        '--log_path', log_path, '--startup_ts', 'bench'])
+    with open(args.wx_alarms, 'w') as f:
+        json.dump([{'name':'wind_stow', 'field':'wind_speed', 'above':opts.above, 'clear':opts.clear}], f)
+
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    mt = main_thread.Main_Thread(args)
+    mt.daemon = True
+    mt.start()
+    time.sleep(2.5) #BOOT -> ACTIVE
+
+    svc = (args.ser_ip, args.ser_port)
+    alarm_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    obs_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    alarm_sock.sendto('subscribe alarms', svc)
+    obs_sock.sendto('subscribe fields=wind_speed', svc)
+    alarm_sock.recv(1024)
+    obs_sock.recv(1024)
+
+    alarm_lat, obs_lat, states = [], [], {}
+    end = time.time() + opts.duration
+    try:
+        while True:
+            timeout = end - time.time()
+            if timeout <= 0: break
+            r, w, x = select.select([alarm_sock, obs_sock], [], [], timeout)
+            now = time.time()
+            if alarm_sock in r:
+                event = json.loads(alarm_sock.recv(4096))
+                alarm_lat.append(now - event['t'])
+                states[event['state']] = states.get(event['state'], 0) + 1
+            if obs_sock in r:
+                obs = json.loads(obs_sock.recv(4096))
+                obs_lat.append(now - iso_epoch(obs['ts']))
+    finally:
+        sys.stdout = real_stdout
+        sim.kill()
+
+    print 'window        : {:.1f} s, sim interval {:.3f} s'.format(opts.duration, opts.interval)
+    print 'alarm events  : {:d} ALARM, {:d} CLEAR'.format(states.get('ALARM', 0), states.get('CLEAR', 0))
+    for label, lat in (('alarm', sorted(alarm_lat)), ('observation', sorted(obs_lat))):
+        if not lat: continue
+        print '{:12s}  : receipt -> subscriber p50 {:.2f} ms, p99 {:.2f} ms, max {:.2f} ms ({:d})'.format(
+            label, 1000 * percentile(lat, 0.5), 1000 * percentile(lat, 0.99), 1000 * lat[-1], len(lat))
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
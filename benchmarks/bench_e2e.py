@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+#############################################
+#   Title: End to End Benchmark             #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Real davis.py / multi_station.py       #
+#    client against vp2_sim.py              #
+#   -frames/sec, send -> consumer latency,  #
+#    CPU and RSS of the client process      #
+#   -usage: python bench_e2e.py -h          #
+#############################################
+
+import os
+import sys
+import json
+import time
+import select
+import socket
+import argparse
+import logging
+import tempfile
+import subprocess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'weather_daemon'))
+import davis
+import multi_station
+import weather_daemon
+import vp2_sim
+
+
+def daemon_args(argv):
+    #Parsed by the daemon's own parser, every other option at its default
+    return weather_daemon.build_parser().parse_args(argv)
+
+
+def free_port():
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+
+def rss_kb(key='VmRSS'):
+    #VmRSS current, VmHWM peak resident set size
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith(key + ':'): return int(line.split()[1])
+    return 0
+
+
+def percentile(data, p):
+    return data[min(len(data) - 1, int(len(data) * p))]
+
+
+def start_sim(opts, port):
+    cmd = [sys.executable, os.path.join(BENCH_DIR, 'vp2_sim.py'),
+           '--port', str(port), '--stations', str(opts.stations),
+           '--interval', str(opts.interval), '--latency', str(opts.latency),
+           '--fragment', str(opts.fragment), '--drop', str(opts.drop),
+           '--archive_days', '0']
+    if opts.replay: cmd += ['--replay', opts.replay]
+    sim = subprocess.Popen(cmd, stdout=subprocess.PIPE)
+    sim.stdout.readline() #listening
+    return sim
+
+
+def client_args(opts, port):
+    log_path = tempfile.mkdtemp()
+    argv = ['--wx_ip', '127.0.0.1', '--wx_port', str(port), '--wx_rate', str(opts.rate),
+            '--wx_loop_n', str(opts.loop_n), '--wx_history', '1', '--log_path', log_path]
+    if opts.mode != 'poll': argv.append('--wx_stream')
+    if opts.mode == 'lps': argv.append('--wx_loop2')
+    if opts.stations > 1:
+        path = os.path.join(log_path, 'stations.json')
+        with open(path, 'w') as f:
+            json.dump([{'name':'wx{:d}'.format(i), 'ip':'127.0.0.1', 'port':port + i}
+                       for i in range(opts.stations)], f)
+        argv += ['--wx_stations', path]
+    return daemon_args(argv)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End to end client benchmark against vp2_sim.py')
+    parser.add_argument('--mode', choices=('poll', 'stream', 'lps'), default='stream')
+    parser.add_argument('--duration', type=float, default=10.0, help='measurement window, seconds')
+    parser.add_argument('--stations', type=int, default=1, help='> 1 runs Multi_Station_Thread')
+    parser.add_argument('--rate', type=float, default=0.1, help='poll mode period, seconds')
+    parser.add_argument('--loop_n', type=int, default=200)
+    parser.add_argument('--interval', type=float, default=0.002, help='simulator seconds between packets')
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--fragment', type=int, default=0)
+    parser.add_argument('--drop', type=float, default=0.0)
+    parser.add_argument('--replay', default=None)
+    opts = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    port = free_port()
+    if opts.stations > 1: port = 20000 + os.getpid() % 20000
+    args = client_args(opts, port)
+    sim = start_sim(opts, port)
+
+    #davis.py prints every observation, keep that out of the measurement
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    if args.wx_stations: wx = multi_station.Multi_Station_Thread(args)
+    else: wx = davis.Ethernet_VantagePro2(args)
+    wx.daemon = True
+    wx.start()
+
+    latency = []
+    count = 0
+    try:
+        warmup = time.time() + 1.0
+        while time.time() < warmup:
+            select.select([wx.rx_q], [], [], 0.1)
+            wx.rx_q.get_all()
+        rss0 = rss_kb()
+        t0, c0 = time.time(), os.times()
+        end = t0 + opts.duration
+        while True:
+            now = time.time()
+            if now >= end: break
+            select.select([wx.rx_q], [], [], end - now)
+            now = time.time()
+            for station, seq, obs in wx.rx_q.get_all():
+                count += 1
+                if opts.replay is None: latency.append(vp2_sim.decode_stamp(obs, now))
+        t1, c1 = time.time(), os.times()
+    finally:
+        sys.stdout = real_stdout
+        sim.kill()
+
+    cpu = (c1[0] - c0[0]) + (c1[1] - c0[1])
+    lat = sorted(latency)
+    print 'mode          : {:s}, {:d} station(s), sim interval {:.3f} s'.format(opts.mode, opts.stations, opts.interval)
+    print 'window        : {:.1f} s'.format(t1 - t0)
+    print 'observations  : {:d} ({:.0f}/s)'.format(count, count / (t1 - t0))
+    print 'client cpu    : {:.1f} % of one core'.format(100.0 * cpu / (t1 - t0))
+    print 'client rss    : {:d} kB (start {:d} kB, peak {:d} kB)'.format(
+        rss_kb(), rss0, rss_kb('VmHWM'))
+    if lat:
+        print 'latency p50   : {:.1f} ms'.format(1000 * percentile(lat, 0.50))
+        print 'latency p99   : {:.1f} ms'.format(1000 * percentile(lat, 0.99))
+        print 'latency max   : {:.1f} ms'.format(1000 * lat[-1])
+    if not args.wx_stations:
+        print 'crc errors    : {:d}, bytes discarded {:d}'.format(wx.framer.crc_errors, wx.framer.discarded)
+    else:
+        health = wx.health()
+        print 'crc errors    : {:d}, reconnects {:d}'.format(sum(h['crc_errors'] for h in health),
+                                                             sum(h['reconnects'] for h in health))
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Idle CPU / Latency Benchmark     #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Runs Main_Thread against a local fake  #
+#    console, reports process CPU and       #
+#    receipt -> subscriber push latency     #
+#   -usage: python bench_idle.py [seconds]  #
+#############################################
+
+import os
+import sys
+import json
+import time
+import struct
+import socket
+import datetime
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'weather_daemon'))
+import packets
+import main_thread
+from bench_e2e import daemon_args, free_port
+
+
+def loop_packet():
+    pkt = bytearray(packets.LOOP_SIZE)
+    pkt[0:3] = 'LOO'
+    struct.pack_into('<bBHHhBhBBH', pkt, 3, 0, 0, 0, 29921, 712, 38, 655, 12, 8, 270)
+    pkt[33] = 81
+    pkt[95:97] = '\n\r'
+    struct.pack_into('>H', pkt, 97, packets.crc16(pkt, 0, 97))
+    return str(pkt)
+
+
+def fake_console(lsock):
+    #Answers wake up and LOOP 1 only, enough for poll mode
+    pkt = loop_packet()
+    conn, addr = lsock.accept()
+    while True:
+        data = conn.recv(64)
+        if not data: return
+        if data == '\n': conn.send('\n\r')
+        elif data.startswith('LOOP'): conn.send('\x06' + pkt)
+
+
+class Subscription(threading.Thread):
+    #UDP push subscriber, timestamps each observation on arrival
+    def __init__(self, port):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.addr = ('127.0.0.1', port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.latency = []
+    def subscribe(self):
+        self.sock.settimeout(1.0)
+        self.sock.sendto('subscribe fields=ts', self.addr)
+        self.sock.recvfrom(4096) #lease
+        self.sock.settimeout(None)
+        self.start()
+    def run(self):
+        while True:
+            data = self.sock.recvfrom(4096)[0]
+            now = datetime.datetime.utcnow()
+            ts = json.loads(data)['ts']
+            ts = datetime.datetime.strptime(ts, '%Y-%m-%dT%H:%M:%S.%f' if '.' in ts else '%Y-%m-%dT%H:%M:%S')
+            self.latency.append((now - ts).total_seconds())
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 15.0
+    lsock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    lsock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    lsock.bind(('127.0.0.1', 0))
+    lsock.listen(1)
+    threading.Thread(target=fake_console, args=(lsock,)).start()
+
+    ser_port = free_port()
+    args = daemon_args(['--ser_ip', '127.0.0.1', '--ser_port', str(ser_port),
+                        '--wx_ip', '127.0.0.1', '--wx_port', str(lsock.getsockname()[1]),
+                        '--wx_rate', '1', '--wx_history', '1',
+                        '--log_path', tempfile.mkdtemp(), '--startup_ts', 'bench'])
+
+    #Main_Thread prints every observation, keep that out of the measurement
+    real_stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    mt = main_thread.Main_Thread(args)
+    mt.daemon = True
+    mt.start()
+    time.sleep(3) #BOOT -> ACTIVE
+    tap = Subscription(ser_port)
+    tap.subscribe()
+    t0, c0 = time.time(), os.times()
+    time.sleep(duration)
+    t1, c1 = time.time(), os.times()
+    sys.stdout = real_stdout
+
+    cpu = (c1[0] - c0[0]) + (c1[1] - c0[1])
+    lat = sorted(tap.latency)
+    print 'window        : {:.1f} s, 1 Hz LOOP 1 polling'.format(t1 - t0)
+    print 'process cpu   : {:.2f} % of one core'.format(100.0 * cpu / (t1 - t0))
+    if lat:
+        print 'observations  : {:d}'.format(len(lat))
+        print 'latency p50   : {:.1f} ms'.format(1000 * lat[len(lat) // 2])
+        print 'latency max   : {:.1f} ms'.format(1000 * lat[-1])
+    os._exit(0)
+
+
+if __name__ == '__main__':
+    main()
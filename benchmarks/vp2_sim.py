@@ -0,0 +1,388 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Vantage Pro2 TCP Simulator       #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Stand-in for a WeatherLinkIP console   #
+#   -Wake up, LOOP n, LPS 3 n, DMPAFT       #
+#   -N stations on consecutive ports        #
+#   -Latency, fragmentation, dropped bytes  #
+#   -usage: python vp2_sim.py -h            #
+#############################################
+
+import os
+import sys
+import math
+import time
+import heapq
+import random
+import select
+import socket
+import struct
+import argparse
+import datetime
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'weather_daemon'))
+import packets
+import framer
+import capture
+
+ACK = chr(0x06)
+NAK = chr(0x21)
+ESC = chr(0x1B)
+
+ARCHIVE_PERIOD  = 300   #seconds between archive records
+STAMP_RES       = 10000 #send time stamp ticks per second
+STAMP_MOD       = 1 << 32
+
+
+def encode_layout(layout, values):
+    '''
+    Inverse of packets.apply_plan: packs a dict of field values into a
+    frame following a layout table.  Missing fields are sent as 0.
+    '''
+    st, names, plan = packets.compile_layout(layout)
+    raw = [0] * (plan[-1][1] or plan[-1][0] + 1)
+    for name, (start, stop, divisor, dashed) in zip(names, plan):
+        v = values.get(name, 0)
+        if stop: raw[start:stop] = list(v)
+        elif divisor: raw[start] = int(round(v * divisor))
+        else: raw[start] = int(v)
+    return bytearray(st.pack(*raw))
+
+
+def seal(frame):
+    #'LOO' header, '\n\r' trailer and CRC on a 99 byte LOOP/LOOP2 frame
+    frame[0:3] = 'LOO'
+    frame[95:97] = '\n\r'
+    struct.pack_into('>H', frame, 97, packets.crc16(frame, 0, 97))
+    return frame
+
+
+def stamp_frame(frame, t):
+    #Send time in STAMP_RES units, mod 2^32, carried in sunrise/sunset of
+    #LOOP packets.  Benchmarks use it for end to end latency, see decode_stamp().
+    tick = int(t * STAMP_RES) % STAMP_MOD
+    struct.pack_into('<HH', frame, 91, tick >> 16, tick & 0xFFFF)
+    return seal(frame)
+
+
+def decode_stamp(obs, now):
+    '''
+    Seconds between the simulator stamping a LOOP packet and now.  A
+    packet stamped just after now (queued while the reader was sampling
+    the clock) gives a small negative value rather than wrapping.
+    '''
+    tick = (obs.sunrise << 16) | obs.sunset
+    d = (int(now * STAMP_RES) - tick) % STAMP_MOD
+    if d >= STAMP_MOD // 2: d -= STAMP_MOD
+    return d / float(STAMP_RES)
+
+
+class Weather_Model(object):
+    '''
+    Synthetic weather: diurnal temperature and humidity, random walk wind,
+    slow pressure drift and the odd shower.  Deterministic per seed.
+    '''
+    def __init__(self, seed=0):
+        self.rng        = random.Random(seed)
+        self.phase      = seed * 0.37
+        self.wind       = 5.0
+        self.wind_dir   = self.rng.randrange(360)
+        self.day_rain   = 0.0
+        self.raining    = 0
+
+    def values(self, t):
+        day = 2 * math.pi * ((t % 86400) / 86400.0) + self.phase
+        rng = self.rng
+        self.wind = min(60.0, max(0.0, self.wind + rng.gauss(0, 1.5)))
+        self.wind_dir = (self.wind_dir + int(rng.gauss(0, 10))) % 360
+        if self.raining: self.raining -= 1
+        elif rng.random() < 0.002: self.raining = rng.randrange(10, 200)
+        if self.raining: self.day_rain += 0.01 * (rng.random() < 0.3)
+        out_temp = 60.0 + 12.0 * math.sin(day) + rng.gauss(0, 0.2)
+        out_hum = int(min(100, max(5, 60 - 25 * math.sin(day) + rng.gauss(0, 2))))
+        return {'bar_trend':0, 'pkt_type':0, 'next_record':0,
+                'barometer':29.92 + 0.2 * math.sin(day / 7.0),
+                'inside_temp':70.0 + rng.gauss(0, 0.1), 'inside_hum':40,
+                'outside_temp':out_temp, 'outside_hum':out_hum,
+                'wind_speed':int(self.wind), 'wind_avg':int(self.wind * 0.8),
+                'wind_dir':self.wind_dir or 360,
+                'extra_temps':[255] * 7, 'soil_temps':[255] * 4, 'leaf_temps':[255] * 4,
+                'extra_hums':[255] * 7, 'soil_moist':[255] * 4, 'leaf_wet':[255] * 4,
+                'extra_alarms':[0] * 8, 'soil_leaf_alarms':[0] * 4,
+                'rain_rate':2.0 * bool(self.raining), 'day_rain':self.day_rain,
+                'month_rain':self.day_rain, 'year_rain':self.day_rain,
+                'uv_index':max(0.0, 8 * math.sin(day)), 'solar_rad':int(max(0, 900 * math.sin(day))),
+                'battery':4.6, 'forecast_rule':45,
+                #LOOP2
+                'wind_avg_10min':self.wind * 0.8, 'wind_avg_2min':self.wind * 0.9,
+                'wind_gust_10min':int(self.wind * 1.4), 'wind_gust_dir':self.wind_dir or 360,
+                'rain_15min':0.0, 'rain_hour':0.0, 'rain_24hr':self.day_rain,
+                'bar_abs':29.92 - 0.07, 'bar_raw':29.92 - 0.07, 'altimeter':29.92}
+
+
+class Station(object):
+    '''
+    One simulated console: LOOP/LOOP2 frame source and archive memory.
+    '''
+    def __init__(self, index, replay=None, archive_days=1.0, stamp=True):
+        self.index  = index
+        self.model  = Weather_Model(index)
+        self.stamp  = stamp
+        self.replay = replay #list of recorded frames, cycled
+        self.pos    = 0
+        self.archive = self._archive(archive_days)
+
+    def loop(self, t, loop2=False):
+        if self.replay:
+            frame = bytearray(self.replay[self.pos % len(self.replay)])
+            self.pos += 1
+            if frame[4] == packets.LOOP2_TYPE: return seal(frame)
+        else:
+            vals = self.model.values(t)
+            if loop2:
+                vals['pkt_type'] = packets.LOOP2_TYPE
+                return seal(encode_layout(packets.LOOP2_LAYOUT, vals))
+            frame = encode_layout(packets.LOOP_LAYOUT, vals)
+        if self.stamp: return stamp_frame(frame, t)
+        return seal(frame)
+
+    def _archive(self, days):
+        #Archive records every ARCHIVE_PERIOD up to now, oldest first
+        n = int(days * 86400 / ARCHIVE_PERIOD)
+        recs = numpy.zeros(n, dtype=packets.ARCHIVE_DTYPE)
+        now = datetime.datetime.now().replace(second=0, microsecond=0)
+        now -= datetime.timedelta(minutes=now.minute % (ARCHIVE_PERIOD // 60))
+        model = Weather_Model(self.index)
+        for i in xrange(n):
+            dt = now - datetime.timedelta(seconds=ARCHIVE_PERIOD * (n - 1 - i))
+            v = model.values(time.mktime(dt.timetuple()))
+            recs['date_stamp'][i], recs['time_stamp'][i] = packets.stamp_from_datetime(dt)
+            recs['outside_temp'][i] = int(v['outside_temp'] * 10)
+            recs['high_out_temp'][i] = recs['outside_temp'][i] + 5
+            recs['low_out_temp'][i] = recs['outside_temp'][i] - 5
+            recs['barometer'][i] = int(v['barometer'] * 1000)
+            recs['outside_hum'][i] = v['outside_hum']
+            recs['wind_avg'][i] = v['wind_avg']
+            recs['wind_high'][i] = v['wind_speed']
+            recs['wind_dir'][i] = int(v['wind_dir'] / 22.5 + 0.5) % 16
+            recs['solar_rad'][i] = v['solar_rad']
+        return recs
+
+    def dmpaft_pages(self, date_stamp, time_stamp):
+        '''
+        Pages holding every record newer than the stamp, and the index of
+        the first new record in the first page.
+        '''
+        stamps = packets.archive_stamp(self.archive['date_stamp'].astype('i8'), self.archive['time_stamp'])
+        start = int(numpy.searchsorted(stamps, packets.archive_stamp(date_stamp, time_stamp), 'right'))
+        first = start % packets.PAGE_RECORDS
+        recs = self.archive[start - first:]
+        pad = (-len(recs)) % packets.PAGE_RECORDS
+        raw = recs.tobytes() + '\xff' * (pad * packets.ARCHIVE_SIZE)
+        size = packets.PAGE_RECORDS * packets.ARCHIVE_SIZE
+        pages = []
+        for i in xrange(len(raw) // size):
+            page = bytearray([i & 0xFF]) + raw[i * size:(i + 1) * size] + bytearray(4)
+            page += struct.pack('>H', packets.crc16(page))
+            pages.append(str(page))
+        return pages, first
+
+
+class Conn(object):
+    '''
+    Console side protocol state of one client connection.
+    '''
+    def __init__(self, sock, station):
+        self.sock       = sock
+        self.station    = station
+        self.inbuf      = ''
+        self.left       = 0     #LOOP packets still to send
+        self.sent       = 0     #packets sent for the current LOOP/LPS command
+        self.lps        = False
+        self.next_pkt   = 0.0
+        self.tx_at      = 0.0   #time the last queued write goes out
+        self.dmp        = None  #DMPAFT state: 'stamp', 'start', 'page'
+        self.pages      = None
+        self.page       = 0
+
+
+class Simulator(object):
+    '''
+    Serves N stations on ports port..port+N-1 from one select() loop.
+    latency delays every reply, fragment splits packets into writes of at
+    most that many bytes, drop removes one byte from that fraction of
+    packets (the client sees a CRC error and has to resync).
+    '''
+    def __init__(self, ip='127.0.0.1', port=10001, stations=1, interval=2.5,
+                 latency=0.0, fragment=0, drop=0.0, replay=None, archive_days=1.0,
+                 stamp=True, seed=0):
+        self.interval   = interval
+        self.latency    = latency
+        self.fragment   = fragment
+        self.drop       = drop
+        self.rng        = random.Random(seed)
+        self.listeners  = {}
+        self.conns      = {}
+        self.timers     = [] #(time, seq, sock, data)
+        self.seq        = 0
+        self.frames     = 0
+        frames = load_replay(replay) if replay else None
+        for i in range(stations):
+            ls = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            ls.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            ls.bind((ip, port + i))
+            ls.listen(4)
+            self.listeners[ls] = Station(i, frames, archive_days, stamp)
+        self.port = min(ls.getsockname()[1] for ls in self.listeners)
+
+    def _send(self, conn, data, at):
+        #Queue data for delivery at time at (+ latency), in fragments
+        at = max(at + self.latency, conn.tx_at) #never overtake queued data
+        step = self.fragment or len(data)
+        for i in range(0, len(data), step):
+            self.seq += 1
+            heapq.heappush(self.timers, (at, self.seq, conn, data[i:i + step]))
+            at += 0.0005 * (self.fragment > 0)
+        conn.tx_at = at
+
+    def _packet(self, conn, now):
+        loop2 = conn.lps and conn.sent % 2 == 1
+        frame = conn.station.loop(now, loop2)
+        self.frames += 1
+        if self.drop and self.rng.random() < self.drop:
+            del frame[self.rng.randrange(len(frame))]
+        self._send(conn, str(frame), now)
+        conn.left -= 1
+        conn.sent += 1
+        conn.next_pkt = now + self.interval
+
+    def _command(self, conn, now):
+        while conn.dmp is None and '\n' in conn.inbuf:
+            line, conn.inbuf = conn.inbuf.split('\n', 1)
+            words = line.strip().split()
+            if not words:
+                self._send(conn, '\n\r', now) #wake up
+            elif words[0] == 'LOOP' and len(words) == 2:
+                self._send(conn, ACK, now)
+                conn.left, conn.lps, conn.next_pkt, conn.sent = int(words[1]), False, now, 0
+            elif words[0] == 'LPS' and len(words) == 3:
+                #LOOP and LOOP2 alternate, bitmask 3 only, n packets in all
+                self._send(conn, ACK, now)
+                conn.left, conn.lps, conn.next_pkt, conn.sent = int(words[2]), True, now, 0
+            elif words[0] == 'DMPAFT':
+                self._send(conn, ACK, now)
+                conn.left, conn.dmp = 0, 'stamp'
+            else:
+                self._send(conn, '\n\rOK\n\r', now)
+        if conn.dmp == 'stamp' and len(conn.inbuf) >= 6:
+            stamp, conn.inbuf = conn.inbuf[:6], conn.inbuf[6:]
+            if packets.crc16(bytearray(stamp)) != 0:
+                self._send(conn, NAK, now)
+                conn.dmp = None
+                return
+            conn.pages, first = conn.station.dmpaft_pages(*struct.unpack('<HH', stamp[:4]))
+            hdr = struct.pack('<HH', len(conn.pages), first)
+            self._send(conn, ACK + hdr + struct.pack('>H', packets.crc16(bytearray(hdr))), now)
+            conn.dmp, conn.page = 'start', 0
+        while conn.dmp in ('start', 'page') and conn.inbuf:
+            c, conn.inbuf = conn.inbuf[0], conn.inbuf[1:]
+            if c == ESC or (c == ACK and conn.page == len(conn.pages)):
+                conn.dmp = None
+                break
+            if c == ACK and conn.dmp == 'page': conn.page += 1
+            if conn.page == len(conn.pages):
+                conn.dmp = None
+                break
+            conn.dmp = 'page'
+            self._send(conn, conn.pages[conn.page], now) #NAK resends
+
+    def _close(self, conn):
+        del self.conns[conn.sock]
+        conn.sock.close()
+        self.timers = [t for t in self.timers if t[2] is not conn]
+        heapq.heapify(self.timers)
+
+    def serve_forever(self):
+        while True:
+            now = time.time()
+            deadlines = [c.next_pkt for c in self.conns.values() if c.left > 0 and c.dmp is None]
+            if self.timers: deadlines.append(self.timers[0][0])
+            timeout = max(0, min(deadlines) - now) if deadlines else None
+            r, w, x = select.select(self.listeners.keys() + self.conns.keys(), [], [], timeout)
+            now = time.time()
+            for s in r:
+                if s in self.listeners:
+                    sock, addr = s.accept()
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    self.conns[sock] = Conn(sock, self.listeners[s])
+                    continue
+                conn = self.conns[s]
+                try:
+                    data = s.recv(4096)
+                except socket.error:
+                    data = ''
+                if not data:
+                    self._close(conn)
+                    continue
+                conn.inbuf += data
+                self._command(conn, now)
+            for conn in self.conns.values():
+                if conn.left > 0 and conn.dmp is None and conn.next_pkt <= now:
+                    self._packet(conn, now)
+            while self.timers and self.timers[0][0] <= now:
+                at, seq, conn, data = heapq.heappop(self.timers)
+                if conn.sock not in self.conns: continue
+                try:
+                    conn.sock.sendall(data)
+                except socket.error:
+                    self._close(conn)
+
+
+def load_replay(path):
+    '''
+    Recorded weather: the LOOP/LOOP2 frames of a daemon capture file
+    (--wx_capture), or every valid packet found in a raw byte dump.
+    '''
+    with open(path, 'rb') as fh:
+        raw = fh.read()
+    if raw.startswith(capture.MAGIC):
+        frames = [p for t, kind, p in capture.read_capture(path) if kind == capture.FRAME]
+    else:
+        frames = framer.Loop_Framer().feed(raw)
+    if not frames: raise ValueError('No LOOP packets in {:s}'.format(path))
+    return [str(frame) for frame in frames]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vantage Pro2 WeatherLinkIP simulator')
+    parser.add_argument('--ip', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=10001, help='first station port')
+    parser.add_argument('--stations', type=int, default=1, help='stations on consecutive ports')
+    parser.add_argument('--interval', type=float, default=2.5, help='seconds between LOOP packets')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every reply')
+    parser.add_argument('--fragment', type=int, default=0, help='max bytes per write, 0 = whole packets')
+    parser.add_argument('--drop', type=float, default=0.0, help='fraction of packets with a dropped byte')
+    parser.add_argument('--replay', default=None, help='raw LOOP capture to replay instead of synthetic weather')
+    parser.add_argument('--archive_days', type=float, default=1.0, help='days of archive records for DMPAFT')
+    parser.add_argument('--no_stamp', dest='stamp', action='store_false',
+                        help='do not carry the send time in sunrise/sunset')
+    args = parser.parse_args()
+    sim = Simulator(args.ip, args.port, args.stations, args.interval, args.latency,
+                    args.fragment, args.drop, args.replay, args.archive_days, args.stamp)
+    print 'Simulating {:d} station(s) on {:s}:{:d}'.format(args.stations, args.ip, sim.port)
+    sys.stdout.flush()
+    try:
+        sim.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Adaptive Poll Rate Policy        #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Fast polls or LOOP n streaming while   #
+#    wind, rain or pressure trend is active #
+#   -Decays back to the base rate           #
+#############################################
+
+import json
+import logging
+import datetime
+from collections import OrderedDict
+
+from ring_buffer import epoch
+
+BASE, FAST = 'base', 'fast'
+
+
+def load_policy(path):
+    '''
+    Reads a JSON policy, e.g.
+      {"fast_rate":1, "stream":false, "hold":600,
+       "levels":{"wind_speed":20, "rain_rate":0.1, "bar_trend":60}}
+    The station goes fast while any levels field is at or above its level
+    (absolute value, so bar_trend -60 counts as well as 60; dashed values
+    never count), polling every
+    fast_rate seconds, or streaming LOOP n when stream is true.  It goes
+    back to the base --wx_rate once nothing has triggered for hold seconds.
+    '''
+    with open(path) as f:
+        return compile_policy(json.load(f))
+
+
+def compile_policy(spec):
+    '''
+    Checks a policy spec and returns (fast_rate, stream, hold, levels),
+    levels a tuple of (field, level).  Raises ValueError on a bad policy.
+    '''
+    levels = spec.get('levels')
+    if not isinstance(levels, dict) or not levels:
+        raise ValueError('Rate policy needs levels: {:s}'.format(json.dumps(spec)))
+    fast_rate = float(spec.get('fast_rate', 1))
+    if fast_rate <= 0:
+        raise ValueError('Bad fast_rate: {:g}'.format(fast_rate))
+    return (fast_rate, bool(spec.get('stream', False)), float(spec.get('hold', 600)),
+            tuple((str(f), abs(float(v))) for f, v in sorted(levels.items())))
+
+
+class Rate_Policy(object):
+    '''
+    Watches every observation of one station and decides its acquisition
+    mode.  update() returns True on a transition, the owner then applies
+    rate and stream.  Field offsets are resolved once per record type.
+    '''
+    def __init__(self, policy, base_rate, base_stream=False, station=None):
+        self.fast_rate, self.fast_stream, self.hold, self.levels = policy
+        self.base_rate  = base_rate
+        self.base_stream = base_stream
+        self.station    = station
+        self.logger     = logging.getLogger('wxd')
+
+        self.mode       = BASE
+        self.rate       = base_rate
+        self.stream     = base_stream
+        self.last_trip  = None  #observation time a level was last crossed
+        self.since      = None  #time of the last transition, UTC
+        self.reason     = None
+        self.transitions = 0
+        self._plans     = {}
+
+    def _plan(self, rec_type):
+        plan = []
+        for field, level in self.levels:
+            if field in rec_type._fields: plan.append((field, rec_type._fields.index(field), level))
+            else: self.logger.warning('Rate policy: no field {:s} in {:s}'.format(field, rec_type.__name__))
+        plan = tuple(plan)
+        self._plans[rec_type] = plan
+        return plan
+
+    def update(self, obs):
+        plan = self._plans.get(type(obs))
+        if plan is None: plan = self._plan(type(obs))
+        t = epoch(obs.ts)
+        trip = None
+        for field, idx, level in plan:
+            v = obs[idx]
+            if v is not None and abs(v) >= level: #NaN (dashed) compares False
+                trip = '{:s} = {:g}'.format(field, v)
+                break
+        if trip is not None:
+            self.last_trip = t
+            if self.mode == FAST: return False
+            self._set(FAST, self.fast_rate, self.fast_stream or self.base_stream, trip)
+            return True
+        if self.mode == BASE or t - self.last_trip < self.hold: return False
+        self._set(BASE, self.base_rate, self.base_stream, 'calm for {:g} s'.format(self.hold))
+        return True
+
+    def _set(self, mode, rate, stream, reason):
+        self.mode, self.rate, self.stream, self.reason = mode, rate, stream, reason
+        self.since = datetime.datetime.utcnow()
+        self.transitions += 1
+        how = 'LOOP n stream' if stream else 'poll every {:g} s'.format(rate)
+        name = '' if self.station is None else ' ' + self.station
+        self.logger.info('Station{:s} rate {:s}, {:s}: {:s}'.format(name, mode, how, reason))
+
+    def state(self):
+        return OrderedDict([('station', self.station), ('mode', self.mode),
+                            ('rate', self.rate), ('stream', self.stream),
+                            ('reason', self.reason), ('transitions', self.transitions),
+                            ('since', self.since.isoformat() if self.since else None)])
@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Observation Alarm Rules          #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Threshold, hysteresis, rate of change  #
+#    and sustained conditions on any field  #
+#   -Evaluated inline in the weather thread #
+#############################################
+
+import json
+import logging
+from collections import deque, OrderedDict
+
+from ring_buffer import epoch
+
+ABOVE, BELOW, RATE = 0, 1, 2
+KINDS = {'above':ABOVE, 'below':BELOW, 'rate':RATE}
+
+
+def load_rules(path):
+    '''
+    Reads a JSON list of rules, e.g.
+      {"name":"wind_stow", "field":"wind_speed", "above":35, "clear":25, "for":3}
+      {"name":"freeze", "field":"outside_temp", "below":32, "clear":34}
+      {"name":"wind_jump", "field":"wind_speed", "rate":2.0, "window":10}
+    above/below/rate is the alarm threshold (rate in field units per
+    second over window seconds).  clear is the hysteresis threshold, the
+    alarm threshold when left out; the alarm clears once the value is
+    strictly past it, so a value sitting on the threshold stays in
+    alarm.  for is how long the condition must
+    hold, in seconds, before the alarm is raised.
+    '''
+    with open(path) as f:
+        return compile_rules(json.load(f))
+
+
+def compile_rules(specs):
+    '''
+    Flattens rule specs into (name, field, kind, set, clear, hold, window)
+    tuples, raises ValueError on a bad rule.
+    '''
+    rules = []
+    names = set()
+    for spec in specs:
+        kinds = [k for k in KINDS if k in spec]
+        if len(kinds) != 1 or 'name' not in spec or 'field' not in spec:
+            raise ValueError('Bad alarm rule: {:s}'.format(json.dumps(spec)))
+        if spec['name'] in names:
+            raise ValueError('Duplicate alarm rule: {:s}'.format(spec['name']))
+        names.add(spec['name'])
+        kind = KINDS[kinds[0]]
+        level = float(spec[kinds[0]])
+        window = float(spec.get('window', 0))
+        if kind == RATE and window <= 0:
+            raise ValueError('Rate rule needs a window: {:s}'.format(spec['name']))
+        rules.append((str(spec['name']), str(spec['field']), kind, level,
+                      float(spec.get('clear', level)), float(spec.get('for', 0)), window))
+    return rules
+
+
+class Alarm_Engine(object):
+    '''
+    Evaluates every rule against each observation, in the thread that
+    decoded it, and calls emit(event) on every alarm or clear transition.
+    Per rule state lives in flat lists indexed like the rule list; field
+    offsets are resolved once per record type.
+    '''
+    def __init__(self, rules, station=None, emit=None):
+        self.rules      = rules
+        self.station    = station
+        self.emit       = emit #callable(event dict), set by Main_Thread
+        self.logger     = logging.getLogger('wxd')
+
+        n = len(rules)
+        self.active     = [False] * n
+        self.since      = [None] * n    #time the pending transition started
+        self.samples    = [deque() if r[2] == RATE else None for r in rules]
+        self._plans     = {}            #record type -> field index per rule
+
+    def _plan(self, rec_type):
+        plan = []
+        for name, field, kind, level, clear, hold, window in self.rules:
+            if field in rec_type._fields: plan.append(rec_type._fields.index(field))
+            else:
+                plan.append(None) #field not in this record type, rule skipped
+                self.logger.warning('Alarm rule {:s}: no field {:s} in {:s}'.format(name, field, rec_type.__name__))
+        self._plans[rec_type] = plan
+        return plan
+
+    def evaluate(self, obs):
+        plan = self._plans.get(type(obs))
+        if plan is None: plan = self._plan(type(obs))
+        t = epoch(obs.ts)
+        active, since, samples = self.active, self.since, self.samples
+        for i, (name, field, kind, level, clear, hold, window) in enumerate(self.rules):
+            idx = plan[i]
+            if idx is None: continue
+            value = obs[idx]
+            if value is None or value != value:
+                continue #dashed reading (NaN): no sample, no rate history, state held
+            if kind == RATE:
+                hist = samples[i]
+                hist.append((t, value))
+                while t - hist[0][0] > window: hist.popleft()
+                t0, v0 = hist[0]
+                value = abs(value - v0) / (t - t0) if t > t0 else 0.0
+                trip, reset = value >= level, value < clear
+            elif kind == ABOVE:
+                trip, reset = value >= level, value < clear
+            else:
+                trip, reset = value <= level, value > clear
+            #hysteresis: only the condition that changes state matters
+            change = reset if active[i] else trip
+            if not change:
+                since[i] = None
+                continue
+            if since[i] is None: since[i] = t
+            if t - since[i] < hold and not active[i]: continue
+            since[i] = None
+            active[i] = not active[i]
+            self._event(name, field, active[i], value, obs.ts, t)
+
+    def _event(self, name, field, active, value, ts, t):
+        event = OrderedDict([('alarm', name), ('state', 'ALARM' if active else 'CLEAR'),
+                             ('station', self.station), ('field', field), ('value', value),
+                             ('ts', ts.isoformat()), ('t', t)])
+        if active: self.logger.warning('Alarm {:s}: {:s} = {:g}'.format(name, field, value))
+        else: self.logger.info('Alarm {:s} cleared: {:s} = {:g}'.format(name, field, value))
+        if self.emit: self.emit(event)
+
+    def states(self):
+        return [OrderedDict([('alarm', r[0]), ('station', self.station), ('active', a)])
+                for r, a in zip(self.rules, self.active)]
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Vantage Pro2 Archive Download    #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Incremental DMPAFT download            #
+#   -Resumes from a checkpoint file         #
+#############################################
+
+import os
+import time
+import json
+import socket
+import struct
+import logging
+import threading
+
+import packets
+import capture
+
+ACK = chr(0x06)
+NAK = chr(0x21)
+ESC = chr(0x1B)
+CAN = chr(0x18)
+
+PAGE_RETRIES    = 3     #NAK a bad page this many times before giving up
+PAGES_PER_BATCH = 64    #pages decoded and checkpointed together
+
+class Archive_Sync(object):
+    '''
+    Downloads archive records newer than the checkpoint with DMPAFT.
+    Pages are ACKed/NAKed as they arrive, decoded in bulk every
+    PAGES_PER_BATCH pages and handed to handler(cols, valid, stamp),
+    stamp being the (date_stamp, time_stamp) of the newest record in the
+    batch.  The checkpoint only moves when the consumer calls commit(stamp)
+    once the batch is stored, so an interrupted download or a batch that
+    never reached the store is downloaded again on the next sync.
+    '''
+    def __init__(self, checkpoint_path, handler, timeout=2.0, capture=None):
+        self.path       = checkpoint_path
+        self.handler    = handler
+        self.timeout    = timeout
+        self.capture    = capture #Capture_Writer, raw pages recorded when set
+        self.logger     = logging.getLogger('wxd')
+
+        self.lock       = threading.Lock() #commit() runs in the consumer's thread
+        self.date_stamp = 0
+        self.time_stamp = 0
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                ckpt = json.load(f)
+            self.date_stamp = ckpt['date_stamp']
+            self.time_stamp = ckpt['time_stamp']
+            self.logger.info('Archive checkpoint: {:d} {:04d}'.format(self.date_stamp, self.time_stamp))
+        except (IOError, ValueError, KeyError):
+            self.logger.info('No archive checkpoint at {:s}, downloading full logger'.format(self.path))
+
+    def _save(self):
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'date_stamp':self.date_stamp, 'time_stamp':self.time_stamp}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp, self.path)
+
+    def _recv_exact(self, sock, n):
+        buf = bytearray()
+        deadline = time.time() + self.timeout
+        while len(buf) < n and time.time() < deadline:
+            try:
+                data = sock.recv(n - len(buf))
+            except socket.timeout:
+                continue
+            if not data: break
+            buf.extend(data)
+        if len(buf) < n: return None
+        return buf
+
+    def _expect_ack(self, sock):
+        resp = self._recv_exact(sock, 1)
+        return resp is not None and resp[0] == ord(ACK)
+
+    def sync(self, sock):
+        '''
+        Runs one DMPAFT download on a connected, awake socket.
+        Returns the number of records delivered.
+        '''
+        sock.send('DMPAFT\n')
+        if not self._expect_ack(sock):
+            self.logger.warning('DMPAFT not acknowledged')
+            return 0
+        with self.lock:
+            date_stamp, time_stamp = self.date_stamp, self.time_stamp
+        since = packets.archive_stamp(date_stamp, time_stamp) #newest record delivered
+        stamp = struct.pack('<HH', date_stamp, time_stamp)
+        sock.send(stamp + struct.pack('>H', packets.crc16(bytearray(stamp))))
+        if not self._expect_ack(sock):
+            self.logger.warning('DMPAFT time stamp rejected')
+            return 0
+        resp = self._recv_exact(sock, 6)
+        if resp is None or packets.crc16(resp) != 0:
+            sock.send(ESC)
+            self.logger.warning('DMPAFT page count CRC error')
+            return 0
+        pages, first = struct.unpack_from('<HH', resp)
+        if self.capture: self.capture.write(capture.ARCHIVE_HDR, time.time(), resp[:4])
+        self.logger.info('DMPAFT: {:d} pages to download'.format(pages))
+        sock.send(ACK)
+
+        total = 0
+        buf = bytearray()
+        for i in xrange(pages):
+            for attempt in xrange(PAGE_RETRIES + 1):
+                page = self._recv_exact(sock, packets.PAGE_SIZE)
+                if page is not None and packets.crc16(page) == 0: break
+                sock.send(NAK)
+            else:
+                sock.send(ESC)
+                self.logger.warning('DMPAFT aborted at page {:d} of {:d}'.format(i, pages))
+                break
+            sock.send(ACK)
+            if self.capture: self.capture.write(capture.ARCHIVE_PAGE, time.time(), page)
+            buf.extend(page)
+            if len(buf) >= PAGES_PER_BATCH * packets.PAGE_SIZE:
+                count, since = self._deliver(buf, first, since)
+                total += count
+                first = 0
+                buf = bytearray()
+        if buf: total += self._deliver(buf, first, since)[0]
+        self.logger.info('DMPAFT: {:d} archive records received'.format(total))
+        return total
+
+    def _deliver(self, buf, first, since):
+        #Returns (records delivered, newest archive_stamp delivered)
+        cols, valid = packets.decode_archive_pages(bytes(buf), first, since)
+        count = int(valid.sum())
+        if not count: return 0, since
+        stamps = packets.archive_stamp(cols['date_stamp'][valid].astype('i8'), cols['time_stamp'][valid])
+        last = stamps.argmax()
+        stamp = (int(cols['date_stamp'][valid][last]), int(cols['time_stamp'][valid][last]))
+        self.handler(cols, valid, stamp)
+        return count, int(stamps[last])
+
+    def commit(self, stamp):
+        '''
+        Advances the checkpoint to stamp, (date_stamp, time_stamp) of the
+        newest record now in the store, and saves it.  Older stamps are
+        ignored.
+        '''
+        with self.lock:
+            if packets.archive_stamp(*stamp) <= packets.archive_stamp(self.date_stamp, self.time_stamp):
+                return
+            self.date_stamp, self.time_stamp = stamp
+            self._save()
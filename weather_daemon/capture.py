@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Raw Frame Capture                #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Records raw LOOP/LOOP2/archive frames  #
+#    with receive timestamps                #
+#############################################
+
+import struct
+import threading
+
+import packets
+
+#File layout: MAGIC, then records of REC_HDR (receive time as float64
+#epoch seconds, kind, payload length) followed by the raw payload.
+MAGIC       = 'WXCAP\x01'
+REC_HDR     = struct.Struct('<dBH')
+
+FRAME           = 0 #LOOP or LOOP2 packet, 99 bytes from 'LOO'
+ARCHIVE_HDR     = 1 #DMPAFT page count and first record, 4 bytes
+ARCHIVE_PAGE    = 2 #DMPAFT page, 267 bytes
+
+READ_CHUNK  = 1 << 20
+
+
+class Capture_Writer(object):
+    '''
+    Appends raw frames to a capture file.  Writes go through a 64 kB file
+    buffer, flush() is run from the scheduler with the history store.
+    '''
+    def __init__(self, path):
+        self.path   = path
+        self.lock   = threading.Lock()
+        self.f      = open(path, 'ab', 1 << 16)
+        if self.f.tell() == 0: self.f.write(MAGIC)
+        self.records = 0
+
+    def write(self, kind, t, payload):
+        with self.lock:
+            self.f.write(REC_HDR.pack(t, kind, len(payload)))
+            self.f.write(payload)
+            self.records += 1
+
+    def flush(self):
+        with self.lock:
+            self.f.flush()
+
+    def close(self):
+        with self.lock:
+            self.f.close()
+
+
+def read_capture(path):
+    '''
+    Generator of (t, kind, payload) for every complete record in a
+    capture, payload as a bytearray.  A torn last record is ignored.
+    '''
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('Not a capture file: {:s}'.format(path))
+        buf = ''
+        pos = 0
+        while True:
+            if len(buf) - pos < REC_HDR.size + packets.PAGE_SIZE:
+                data = f.read(READ_CHUNK)
+                buf = buf[pos:] + data
+                pos = 0
+                if not data and len(buf) < REC_HDR.size: return
+            t, kind, length = REC_HDR.unpack_from(buf, pos)
+            end = pos + REC_HDR.size + length
+            if end > len(buf): return
+            yield t, kind, bytearray(buf[pos + REC_HDR.size:end])
+            pos = end
@@ -15,124 +15,294 @@ import time
 import socket
 import binascii
 import datetime
-import struct
-import numpy
+import select
 
 
-from Queue import Queue
-from watchdog_timer import *
-import weather.temp as temp
+from Queue import Full
 
+from select_queue import Select_Queue, DROP_OLDEST, KEEP_LATEST, BLOCK
+import scheduler
+import packets
+import framer
+import archive
+import capture
+import alarms
+import ring_buffer
+import rollup
+import trackers
+import derived
+import adaptive
+import metrics
+import profiling
+import pipeline
 
-class Ethernet_VantagePro2(threading.Thread):
-    def __init__ (self, args):
+LOOP_REARM      = 2     #re-issue LOOP n when this many packets remain
+LOOP_INTERVAL   = 2.5   #seconds between LOOP packets from the console
+LOOP_Q_SIZE     = 64    #decoded observations waiting in the weather thread
+ARCHIVE_Q_SIZE  = 16    #archive batches waiting for a consumer
+BACKOFF_MIN     = 1.0   #reconnect backoff, doubles per failure
+BACKOFF_MAX     = 60.0
+
+
+class Ethernet_VantagePro2(threading.Thread, pipeline.Obs_Pipeline):
+    def __init__ (self, args, sched = None):
         threading.Thread.__init__(self, name = 'Weather_Thread')
         self._stop      = threading.Event()
         self.ip         = args.wx_ip
         self.port       = args.wx_port
         self.rate       = args.wx_rate
+        self.stream     = args.wx_stream #continuous LOOP n instead of LOOP 1 polls
+        self.loop_n     = args.wx_loop_n
+        self.loop2      = args.wx_loop2 #LPS 3 n, LOOP and LOOP2 merged
 
         self.logger     = logging.getLogger('wxd')
         print "Initializing {}".format(self.name)
         self.logger.info("Initializing {}".format(self.name))
 
-        self.loop_wd    = Watchdog(self.rate, self._loop_watchdog_event)
+        self.sched      = sched #shared scheduler, own one started in run() if None
+        self.poll_task  = None
 
         self.connected  = False
+        self.framer     = framer.Loop_Framer()
+        self.loop_left  = 0 #packets remaining in the current LOOP n
+        self.last_rx    = 0 #time of the last valid packet
+        self.crc_errors = 0
+        self.connects   = 0 #successful connections, woken up
+        self.backoff    = BACKOFF_MIN
+        self.next_connect = 0 #time of the next connection attempt
+        self.cmd_at     = None #time the last LOOP command went out, until its first byte
+        self.last_loop  = None #LOOP packet waiting for its LOOP2 in LPS mode
+        self.seq        = 0 #observations decoded, wire record sequence
+
+        self.cmd_q        = Select_Queue(4, KEEP_LATEST, 'wx_cmd_q') #station commands into thread
+        self.loop_q       = Select_Queue(LOOP_Q_SIZE, DROP_OLDEST, 'loop_q', metrics.LOOP_Q_DWELL) #messages into thread
+        self.rx_q         = Select_Queue(args.queue_size, args.queue_policy, 'rx_q', metrics.RX_Q_DWELL) #messages out of thread
+        self.archive_q    = Select_Queue(ARCHIVE_Q_SIZE, BLOCK, 'archive_q') #(cols, valid, stamp) archive batches, a full queue holds back the download
+
+        #Recent observations for windowed queries, console updates every LOOP_INTERVAL
+        self.history    = ring_buffer.Obs_Ring_Buffer(int(args.wx_history * 3600 / LOOP_INTERVAL) + 1)
+        self.rollups    = rollup.Rollup_Engine()
+        self.trackers   = trackers.Peak_Tracker() #gusts and peaks over sliding windows
+        self.derived    = derived.Derived_Engine(args.wx_elevation) #AN-28 variables, hourly ET
+
+        self.alarms     = None #Alarm_Engine run on every observation
+        if args.wx_alarms:
+            self.alarms = alarms.Alarm_Engine(alarms.load_rules(args.wx_alarms))
+
+        self.adaptive   = None #Rate_Policy, faster acquisition in active weather
+        if args.wx_adaptive:
+            self.adaptive = adaptive.Rate_Policy(adaptive.load_policy(args.wx_adaptive),
+                                                 self.rate, self.stream)
+
+        self.capture    = None #raw frames to a capture file for replay
+        if args.wx_capture:
+            self.capture = capture.Capture_Writer(args.wx_capture)
 
-        self.loop_q       = Queue() #messages into thread
-        self.rx_q         = Queue() #messages into thread
+        self.archive    = None
+        if args.wx_archive:
+            ckpt = args.wx_archive_ckpt
+            if ckpt is None: ckpt = args.log_path + '/wxd_archive.json'
+            self.archive = archive.Archive_Sync(ckpt, self._archive_handler, capture=self.capture)
 
     def run(self):
         print "{:s} Started...".format(self.name)
         self.logger.info('Launched {:s}'.format(self.name))
-        self.loop_wd.start()
+        if (not self.connected): self._open()
+        if not self.stream: self._start_polls()
 
-        if (not self.connected):
-            self._connect()
-            self.sock.send('\n') #wake up Weather Station
-            self.sock.recvfrom(1024)
-            data, addr = self.sock.recvfrom(1024)
         while (not self._stop.isSet()):
-            while (not self.loop_q.empty()):
-                msg = self.loop_q.get()
-                self.rx_q.put(msg)        
-                print msg
-                for k in msg.keys():
-                    print k, msg[k]
-            time.sleep(0.25) #Query station every 5 seconds
-
-        self.loop_wd.stop()
+            if profiling.hook: profiling.hook()
+            #Sleep until a poll is due, a packet is queued, the station socket
+            #is readable, the stream stall deadline passes or a reconnect is
+            #due.  All station I/O happens in this thread.
+            rlist   = [self.cmd_q, self.loop_q]
+            if not self.connected and time.time() >= self.next_connect: self._open()
+            if self.connected:
+                timeout = self._stream_arm() if self.stream else self._poll_check()
+                if self.connected: rlist.append(self.sock)
+            if not self.connected: timeout = max(0, self.next_connect - time.time())
+            r, w, x = select.select(rlist, [], [], timeout)
+            for cmd in self.cmd_q.get_all():
+                if cmd == 'LOOP' and self.connected: self._loop_cmd()
+            if self.connected and self.sock in r:
+                self._rx()
+            for msg in self.loop_q.get_all():
+                self.rx_q.put(msg)
+
+        if self.poll_task: self.sched.cancel(self.poll_task)
         self.logger.warning('{:s} Terminated'.format(self.name))
         sys.exit()
 
-    def _loop_watchdog_event(self):
-        self.loop_wd.reset()
+    def health(self):
+        return [{'station':None, 'connected':self.connected, 'frames':self.framer.frames,
+                 'crc_errors':self.framer.crc_errors, 'discarded':self.framer.discarded,
+                 'reconnects':max(0, self.connects - 1), 'seq':self.seq}]
+
+    def _start_polls(self):
+        if self.sched is None:
+            self.sched = scheduler.Scheduler()
+            self.sched.daemon = True
+            self.sched.start()
+        self.poll_task = self.sched.add('wx_poll', self.rate, self._poll_event, delay=0)
+
+    def _apply_rate(self):
+        #Rate_Policy transition: new poll period, or switch to/from LOOP n
+        p = self.adaptive
+        self.rate = p.rate
+        if p.stream and not self.stream:
+            self.stream = True
+            self.loop_left = 0 #_stream_arm() sends LOOP n on the next pass
+            if self.poll_task: self.sched.cancel(self.poll_task)
+            self.poll_task = None
+        elif not p.stream and self.stream:
+            self.stream = False
+            if self.connected: self._send('\n') #any character ends LOOP n
+            self._start_polls()
+        elif self.poll_task:
+            self.sched.set_period(self.poll_task, self.rate)
+
+    def _poll_event(self):
+        #Runs in the scheduler thread, hand the poll to the weather thread
+        self.cmd_q.put('LOOP')
+
+    def _parse_loop_msg(self, frame, ts = None, offset = 1):
+        #frame[0] is the ACK returned by the LOOP command, packet starts at 'LOO'
+        return packets.decode_loop(frame, ts, offset, self.derived)
+
+    def _handle_frame(self, frame, ts):
+        #Returns True when an observation was queued
+        msg = self._observe(frame, ts)
+        if msg is None: return False
+        self.seq += 1
+        self.loop_q.put(pipeline.Station_Obs(None, self.seq, msg))
+        return True
+
+    def _archive_handler(self, cols, valid, stamp):
+        #Main_Thread stores the batch, then commits stamp to the checkpoint.
+        #Never dropped, a batch left behind on stop is not committed and is
+        #downloaded again on the next start.
+        while not self._stop.isSet():
+            try:
+                self.archive_q.put((cols, valid, stamp), timeout=0.5)
+                return
+            except Full:
+                pass
+
+    def _archive_wait(self):
+        #The store takes records in time order, so queued archive batches
+        #are stored before any newer observation goes out on rx_q
+        q = self.archive_q
+        with q.all_tasks_done:
+            while q.unfinished_tasks and not self._stop.isSet():
+                q.all_tasks_done.wait(0.5)
+
+    def _wake(self):
+        #Wake up Weather Station, console answers '\n\r' once awake
+        for i in range(3):
+            self.sock.send('\n')
+            try:
+                if '\n\r' in self.sock.recv(1024): return True
+            except socket.timeout:
+                pass
+        self.logger.warning('No wake up response from weather station')
+        return False
+
+    def _open(self):
+        #Connect, wake the console and backfill from its archive before LOOP
+        #starts, on failure retry after the backoff.  The backfill runs on
+        #every connection, it picks up whatever was logged while we were
+        #disconnected.
+        self._connect()
+        try:
+            if self.connected and self._wake():
+                self.connects += 1
+                self.backoff = BACKOFF_MIN
+                self.loop_left = 0 #LOOP n is re-armed on the new connection
+                if self.archive:
+                    self.archive.sync(self.sock)
+                    self._archive_wait()
+                self.last_rx = time.time()
+                return
+            reason = 'no wake up response'
+        except socket.error as e:
+            reason = 'wake up/backfill failed: {:s}'.format(str(e))
+        if not self.connected: reason = 'connect failed'
+        self._close(reason)
+
+    def _close(self, reason):
+        self.sock.close()
+        self.connected = False
+        self.framer.reset()
+        self.last_loop = None
+        self.cmd_at = None
+        self.logger.warning('Weather station {:s}, reconnect in {:.0f}s'.format(reason, self.backoff))
+        self.next_connect = time.time() + self.backoff
+        self.backoff = min(self.backoff * 2, BACKOFF_MAX)
+
+    def _send(self, data):
+        #Returns False when the connection had to be dropped
+        try:
+            self.sock.send(data)
+            return True
+        except socket.error as e:
+            self._close('send failed: {:s}'.format(str(e)))
+            return False
+
+    def _recv_frames(self):
+        #Read whatever is available and return the complete LOOP packets
+        t0 = metrics.timer()
+        try:
+            data = self.sock.recv(4096)
+        except socket.timeout:
+            return []
+        except socket.error as e:
+            self._close('recv failed: {:s}'.format(str(e)))
+            return []
+        if not data:
+            self._close('closed the connection')
+            return []
         ts = datetime.datetime.utcnow()
-        #print ts, 'Loop Watchdog Fired'
-        if self.connected:
-            self._loop_cmd()
-
-    def _parse_loop_msg(self, frame, ts = None):
-        #print msg['ts'], len(msg['msg']), 
-        #print binascii.hexlify(frame)
-        msg = {}
-        msg['ts'] = ts
-        #print numpy.uint8(struct.unpack('<B',frame[0:1]))[0] #ACK
-        #print frame[1:4] #LOO  
-
-        #3 Hour Barometer Trend
-        #-60 = Falling Rapidly = 196 (as an unsigned byte)
-        #-20 = Falling Slowly = 236 (as an unsigned byte)
-        #0 = Steady
-        #20 = Rising Slowly
-        #60 = Rising Rapidly   
-        msg['bar_trend']    = numpy.int8(struct.unpack('<B',frame[4:5]))[0] #Bar Trend
-        msg['pkt_type']     = int(frame[5])    #Packet Type, 0 = LOOP, 1 = LOOP2
-        msg['next_record']  = binascii.hexlify(frame[6:8]) #NExt Record See Manual
-        msg['barometer']    = round(numpy.int16(struct.unpack('<H',frame[8:10]))[0]/1000.0, 6) #In. Hg.
-        msg['inside_temp']  = round(numpy.int16(struct.unpack('<h',frame[10:12]))[0]/10.0, 6) #deg F
-        msg['inside_hum']   = numpy.int8(struct.unpack('<B',frame[12:13]))[0] # % humidity
-        msg['outside_temp'] = round(numpy.int16(struct.unpack('<h',frame[13:15]))[0]/10.0, 6) #deg F
-        msg['wind_speed']   = numpy.uint8(struct.unpack('<B',frame[15:16]))[0] #mph
-        msg['wind_avg']     = numpy.uint8(struct.unpack('<B',frame[16:17]))[0] #mph, 10 minute average
-        msg['wind_dir']     = numpy.uint16(struct.unpack('<H',frame[17:19]))[0] #deg F
-        msg['extra_temps']  = binascii.hexlify(frame[19:26])
-        msg['soil_temps']   = binascii.hexlify(frame[26:30])
-        msg['leaf_temps']   = binascii.hexlify(frame[30:34])
-        msg['outside_hum']  = numpy.int8(struct.unpack('<B',frame[34:35]))[0]# % humidity
-        msg['leaf_temps']   = binascii.hexlify(frame[35:42])
-        msg['rain_rate']    = numpy.uint16(struct.unpack('<H',frame[42:44]))[0]/100.0 #inches/hour
-        msg['uv_index']     = numpy.uint8(struct.unpack('<B',frame[44:45]))[0]/10.0 #uv index
-        msg['solar_rad']    = round(numpy.uint16(struct.unpack('<H',frame[45:47]))[0], 6) #watts/m^2
-        msg['battery']      = numpy.uint16(struct.unpack('<H',frame[88:90]))[0]*300.0/512.0/100.0 #Volts
-        msg['storm_date']   = binascii.hexlify(frame[49:51])
-        msg['day_rain']     = numpy.uint16(struct.unpack('<H',frame[51:53]))[0]/100.0 #inches/hour
-        msg['month_rain']   = numpy.uint16(struct.unpack('<H',frame[53:55]))[0]/100.0 #inches/hour
-        msg['year_rain']    = numpy.uint16(struct.unpack('<H',frame[55:57]))[0]/100.0 #inches/hour
-        msg['day_et']       = numpy.uint16(struct.unpack('<H',frame[57:59]))[0]/1000.0 #inches/hour
-        msg['month_et']     = numpy.uint16(struct.unpack('<H',frame[59:61]))[0]/100.0 #inches/hour
-        msg['year_et']      = numpy.uint16(struct.unpack('<H',frame[61:63]))[0]/100.0 #inches/hour
-        msg['the_rest']     = binascii.hexlify(frame[47:])
-        #print msg['bar_trend']
-
-        #Derived Fields
-        msg['dew_point_out']    = temp.calc_dewpoint(msg['outside_temp'], msg['outside_hum'])
-        msg['dew_point_in']     = temp.calc_dewpoint(msg['inside_temp'], msg['inside_hum'])
-        msg['wind_chill']       = temp.calc_wind_chill(msg['outside_temp'], msg['wind_speed'], msg['wind_avg'])
-        msg['heat_index']       = temp.calc_heat_index(msg['outside_temp'], msg['outside_hum'])
-        return msg
+        if self.cmd_at is not None:
+            metrics.CMD_FIRST_BYTE.observe(t0 - self.cmd_at)
+            self.cmd_at = None
+        frames = self.framer.feed(data)
+        if self.framer.crc_errors != self.crc_errors:
+            self.logger.warning('LOOP CRC errors: {:d}'.format(self.framer.crc_errors - self.crc_errors))
+            self.crc_errors = self.framer.crc_errors
+        if frames: self.last_rx = time.time()
+        metrics.FRAME_RX.observe(metrics.timer() - t0)
+        return [(frame, ts) for frame in frames]
 
     def _loop_cmd(self):
-        self.sock.send('LOOP 1\r\n')
-        #time.sleep(.05)
-        data, addr = self.sock.recvfrom(1024)
-        ts = datetime.datetime.utcnow()
-        if ((len(data) == 100) and (ord(data[0]) == 0x06)):  #LOOP command should return packet of length 100
-            #print binascii.hexlify(data[0])
-            loop_msg = self._parse_loop_msg(bytearray(data), ts)
-            self.loop_q.put(loop_msg)
+        #Reply packets are picked up by _rx() as they arrive
+        if self._send(self._loop_str(1 + self.loop2)): #LPS needs a LOOP and a LOOP2
+            self.cmd_at = metrics.timer()
+
+    def _stream_arm(self):
+        #Re-arm before n runs out, or when the stream has gone quiet.
+        #Returns the seconds left until the stream counts as stalled.
+        stall = 2 * LOOP_INTERVAL + 1
+        if ((self.loop_left <= LOOP_REARM) or
+            (time.time() - self.last_rx > stall)):
+            if not self._send(self._loop_str(self.loop_n)): return None
+            self.cmd_at = metrics.timer()
+            self.loop_left = self.loop_n
+            self.last_rx = time.time()
+        return max(0, self.last_rx + stall - time.time())
+
+    def _poll_check(self):
+        #Polls going unanswered this long means the link is dead.  Returns
+        #the seconds left until then.
+        stale = 3 * max(self.rate, LOOP_INTERVAL) + 5
+        left = self.last_rx + stale - time.time()
+        if left > 0: return left
+        self._close('no reply to LOOP for {:.0f}s'.format(stale))
+        return None
 
+    def _rx(self):
+        for frame, ts in self._recv_frames():
+            self.loop_left -= 1
+            self._handle_frame(frame, ts)
 
     def _connect(self):
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM) #TCP Socket
@@ -148,7 +318,7 @@ class Ethernet_VantagePro2(threading.Thread):
             self.connected = True
             print 'Connected!'
         except socket.error as msg:
-            print "Exception Thrown: " + str(msg) + " (" + str(self.timeout) + "s)"
+            print "Exception Thrown: " + str(msg) + " (" + str(self.sock.gettimeout()) + "s)"
             print "Unable to connect to Remote Relay at IP: " + str(self.ip) + ", Port: " + str(self.port)  
             self.connected = False
             self.logger.info('Failed to connect to weather station: [{:s}:{:s}]'.format(self.ip, str(self.port)))
@@ -166,6 +336,7 @@ class Ethernet_VantagePro2(threading.Thread):
         print '{:s} Terminating...'.format(self.name)
         self.logger.info('{:s} Terminating...'.format(self.name))
         self._stop.set()
+        self.loop_q.wake()
 
     def stopped(self):
         return self._stop.isSet()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+#############################################
+#   Title: AN-28 Derived Variables          #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Dew point, THSW, wet bulb, station and #
+#    altimeter pressure, ET and cloud base  #
+#   -See AN_28-derived-weather-variables.pdf#
+#############################################
+
+import math
+from collections import deque
+import numpy
+
+import weather.temp as temp
+
+#Appended to every LOOP/LOOP2 record, in this order
+DERIVED_FIELDS = ('dew_point_out',      #deg F
+                  'dew_point_in',       #deg F
+                  'wind_chill',         #deg F
+                  'heat_index',         #deg F
+                  'thsw',               #deg F, console thsw_index, NaN unless LOOP2 is polled
+                  'wet_bulb',           #deg F
+                  'station_pressure',   #In. Hg., console bar_abs when LOOP2 is polled
+                  'altimeter_setting',  #In. Hg., console altimeter when LOOP2 is polled
+                  'et_hour',            #inches, reference ET of the last complete hour
+                  'cloud_base')         #feet above the station
+
+NAN = float('nan')
+
+MPH_TO_MS   = 0.44704
+INHG_TO_KPA = 3.38639
+SIGMA       = 5.67e-8   #Stefan-Boltzmann, W/m^2/K^4
+ALBEDO      = 0.23      #grass reference
+TEMP_HOURS  = 12        #station pressure uses the mean of now and 12 hours ago
+
+
+def dewpoint_batch(t, rh):
+    '''
+    AN-28 dew point (deg F) of temperature (deg F) and humidity arrays,
+    NaN where humidity is outside 0 < rh <= 100, like _vapour().
+    '''
+    with numpy.errstate(invalid='ignore'): #NaN (dashed) compares False
+        rh = numpy.where((rh > 0) & (rh <= 100), rh, numpy.nan)
+    tc = (t - 32.0) / 1.8
+    ln = numpy.log(rh * 0.01 * 6.112 * numpy.exp(17.62 * tc / (tc + 243.12)))
+    return (243.12 * ln - 440.1) / (19.43 - ln) * 1.8 + 32.0
+
+
+def _vapour(tc, rh):
+    '''
+    Saturation and actual vapour pressure (hPa) and the AN-28 dew point
+    (deg C) at tc, rh.  NaN dew point at 0 % humidity.
+    '''
+    es = 6.112 * math.exp(17.62 * tc / (tc + 243.12))
+    e = es * rh * 0.01
+    if e <= 0: return es, e, NAN
+    ln = math.log(e)
+    return es, e, (243.12 * ln - 440.1) / (19.43 - ln)
+
+
+class Derived_Engine(object):
+    '''
+    Computes DERIVED_FIELDS once per observation.  Celsius/Kelvin values,
+    vapour pressures, dew point and wind speed in m/s are worked out once
+    and shared by every formula.  Formulas follow AN-28; values the console
+    already reports in LOOP2 (THSW, station pressure, altimeter) are used
+    as is so they match the display.  AN-28 gives no THSW formula, so
+    THSW is NaN when only LOOP is polled.  Reference ET follows the Vantage
+    method: temperature, wind, solar and vapour pressures are averaged
+    over each clock hour and ETo is computed when the hour closes.  One
+    engine per station, it keeps the hourly state.
+    '''
+    def __init__(self, elevation=None):
+        self.elevation  = elevation #feet, None when unknown
+        self.lapse      = 0.0       #AN-28 L, deg F
+        if elevation is not None: self.lapse = 11.0 * elevation / 8000.0
+
+        self.hour       = None      #clock hour being averaged
+        self.n          = 0
+        self.sums       = [0.0] * 6 #tc, wind m/s, solar, es, e (kPa), temp deg F
+        self.pressure   = NAN       #In. Hg., last station pressure of the hour
+        self.et_hour    = NAN
+        self.temps      = deque(maxlen=TEMP_HOURS) #hourly mean deg F
+
+    def derive(self, ts, t_out, h_out, t_in, h_in, wind, wind_avg, solar, barometer,
+               loop2=None):
+        '''
+        loop2 is (bar_abs, altimeter, thsw_index) from LOOP2, or None.
+        ts is the observation time, None skips the ET averages.  Dashed
+        readings arrive as NaN (packets.DASHED).
+        '''
+        if t_in == t_in and 0 < h_in <= 100:
+            dew_in = _vapour((t_in - 32.0) / 1.8, h_in)[2] * 1.8 + 32.0
+        else: dew_in = NAN
+
+        if loop2 and loop2[0] > 0: pressure, altimeter = loop2[0], loop2[1]
+        else: pressure = altimeter = NAN
+
+        if t_out != t_out or not 0 < h_out <= 100:
+            #dashed outside sensor, nothing outdoors can be derived
+            return [NAN, dew_in, NAN, NAN, NAN, NAN, pressure, altimeter, self.et_hour, NAN]
+
+        tc = (t_out - 32.0) / 1.8
+        es, e, td = _vapour(tc, h_out)
+        dew_out = td * 1.8 + 32.0
+        if solar != solar: solar = 0 #dashed solar sensor adds nothing to ET
+
+        if wind == wind:
+            u = wind * MPH_TO_MS
+            chill = temp.calc_wind_chill(t_out, wind, wind_avg if wind_avg == wind_avg else None)
+        else:
+            u = 0.0 #dashed anemometer, calm for ET
+            chill = NAN
+        heat = temp.calc_heat_index(t_out, h_out)
+        thsw = float(loop2[2]) if loop2 else NAN #dashed thsw_index is NaN already
+
+        #Stull (2011) wet bulb, within 1 deg C for 5-99 % humidity
+        wet = (tc * math.atan(0.151977 * math.sqrt(h_out + 8.313659))
+               + math.atan(tc + h_out) - math.atan(h_out - 1.676331)
+               + 0.00391838 * h_out ** 1.5 * math.atan(0.023101 * h_out)
+               - 4.686035) * 1.8 + 32.0
+
+        if pressure != pressure and self.elevation is not None and barometer > 0:
+            #invert the console sea level reduction PSL = PS * R
+            z = self.elevation
+            t12 = self.temps[0] if len(self.temps) == TEMP_HOURS else t_out
+            tr = (t_out + t12) * 0.5 + 460.0
+            c = tr * 0.378 * e / (barometer * INHG_TO_KPA * 10.0) #humidity correction
+            pressure = barometer / 10.0 ** (z / (122.8943111 * (tr + self.lapse + c)))
+            altimeter = (pressure ** 0.1903 + 1.313e-5 * z) ** (1.0 / 0.1903)
+
+        cloud = max(0.0, (t_out - dew_out) / 4.4 * 1000.0)
+
+        if ts is not None:
+            hour = ts.toordinal() * 24 + ts.hour
+            if hour != self.hour:
+                if self.n: self._close_hour()
+                self.hour = hour
+            s = self.sums
+            s[0] += tc
+            s[1] += u
+            s[2] += solar
+            s[3] += es * 0.1
+            s[4] += e * 0.1
+            s[5] += t_out
+            self.n += 1
+            if pressure == pressure: self.pressure = pressure
+            elif barometer > 0: self.pressure = barometer
+
+        return [dew_out, dew_in, chill, heat, thsw, wet, pressure, altimeter, self.et_hour, cloud]
+
+    def _close_hour(self):
+        #AN-28 (VP) hourly reference ET from the hour's averages, in inches
+        n = float(self.n)
+        tc, u, rs, ea, ed, tf = [v / n for v in self.sums]
+        self.sums = [0.0] * 6
+        self.n = 0
+        self.temps.append(tf)
+        if self.pressure != self.pressure: return
+
+        tk = tc + 273.16
+        delta = ea / tk * (6790.4985 / tk - 5.02808)
+        gamma = 0.000646 * (1 + 0.000946 * tc) * self.pressure * INHG_TO_KPA
+        w = delta / (delta + gamma)
+        if rs > 0: fu = 0.030 + 0.0576 * u
+        else: fu = 0.125 + 0.0439 * u
+        #net radiation: shortwave less albedo, clear sky longwave loss
+        rn = (1 - ALBEDO) * rs - SIGMA * tk ** 4 * (0.34 - 0.14 * math.sqrt(ed))
+        lam = 694.5 * (1 - 0.000946 * tc)
+        et = w * rn / lam + (1 - w) * (ea - ed) * fu #mm
+        self.et_hour = max(0.0, et) / 25.4
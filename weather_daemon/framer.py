@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Vantage Pro2 TCP Stream Framer   #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Reassembles LOOP packets from a TCP    #
+#    byte stream, resyncs on 'LOO' header   #
+#############################################
+
+import packets
+
+class Loop_Framer(object):
+    '''
+    Incremental LOOP packet framer.  feed() takes whatever recv() returned
+    and gives back the complete, CRC valid packets found so far.  Partial
+    packets stay buffered until the rest arrives, garbage and ACK bytes in
+    front of a header are discarded, and a CRC failure drops the header and
+    searches again one byte further on.
+    '''
+    def __init__(self, header='LOO', size=packets.LOOP_SIZE):
+        self.header     = bytearray(header)
+        self.size       = size
+        self.buf        = bytearray()
+
+        self.frames     = 0 #valid packets returned
+        self.crc_errors = 0 #header found, CRC failed
+        self.discarded  = 0 #bytes dropped while searching for a header
+
+    def feed(self, data):
+        buf = self.buf
+        buf.extend(data)
+        hlen = len(self.header)
+        out = []
+        pos = 0
+        while True:
+            idx = buf.find(self.header, pos)
+            if idx < 0:
+                #keep a possible partial header at the tail
+                keep = max(pos, len(buf) - hlen + 1)
+                self.discarded += keep - pos
+                pos = keep
+                break
+            self.discarded += idx - pos
+            if len(buf) - idx < self.size:
+                pos = idx #wait for the rest of the packet
+                break
+            if packets.crc16(buf, idx, self.size) == 0:
+                out.append(buf[idx:idx + self.size])
+                self.frames += 1
+                pos = idx + self.size
+            else:
+                self.crc_errors += 1
+                pos = idx + 1
+        del buf[:pos]
+        return out
+
+    def reset(self):
+        del self.buf[:]
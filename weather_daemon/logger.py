@@ -3,22 +3,193 @@
 # Logger utilities
 
 import math, sys, os, time, struct, traceback, binascii, logging
+import glob, threading, Queue
 import datetime as dt
 
+
+LOG_Q_SIZE      = 4096  #records waiting for the writer thread
+LOG_BACKUPS     = 10    #rotated log files kept
+REPEAT_WINDOW   = 10.0  #seconds identical messages are counted over
+REPEAT_BURST    = 3     #identical messages written per window before the rest are counted
+SWEEP_PERIOD    = 1.0   #seconds between repeat/drop summaries
+
 class MyFormatter(logging.Formatter):
-    #Overriding formatter for datetime
+    #Overriding formatter for datetime, the strftime text is cached and
+    #only rebuilt when the second changes, %f is filled in per record
     converter=dt.datetime.utcfromtimestamp
+    _cache = (None, None, None) #(second, datefmt, strftime text split at %f)
     def formatTime(self, record, datefmt=None):
-        ct = self.converter(record.created)
-        if datefmt:
-            s = ct.strftime(datefmt)
+        sec = int(record.created)
+        if self._cache[0] != sec or self._cache[1] != datefmt:
+            ct = self.converter(sec)
+            if datefmt: parts = [ct.strftime(p) for p in datefmt.split('%f')]
+            else: parts = [ct.strftime("%Y%m%d_%H:%M:%S")]
+            self._cache = (sec, datefmt, parts)
+        parts = self._cache[2]
+        if not datefmt:
+            return "%s,%03d" % (parts[0], record.msecs)
+        if len(parts) == 1: return parts[0]
+        return ('%06d' % min(999999, int(round((record.created - sec) * 1e6)))).join(parts)
+
+
+class Rotating_File_Handler(logging.FileHandler):
+    '''
+    FileHandler that rotates on size (max_bytes) or age (interval seconds),
+    whichever comes first, 0 disables either.  Rotated files get a UTC
+    timestamp suffix and only the newest backups are kept, 0 keeps all.
+    emit() does not flush, Log_Writer flushes once per batch.
+    '''
+    def __init__(self, path, max_bytes=0, interval=0, backups=LOG_BACKUPS):
+        logging.FileHandler.__init__(self, path)
+        self.max_bytes  = max_bytes
+        self.interval   = interval
+        self.backups    = backups
+        self.opened     = time.time()
+        self.size       = os.path.getsize(self.baseFilename)
+
+    def emit(self, record):
+        try:
+            msg = self.format(record)
+            if isinstance(msg, unicode): msg = msg.encode('utf-8')
+            if ((self.max_bytes and self.size + len(msg) >= self.max_bytes) or
+                (self.interval and record.created - self.opened >= self.interval)):
+                self._rotate()
+            self.stream.write(msg + '\n')
+            self.size += len(msg) + 1
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except:
+            self.handleError(record)
+
+    def _rotate(self):
+        self.stream.close()
+        dest = '{:s}.{:s}'.format(self.baseFilename, dt.datetime.utcnow().strftime('%Y%m%d_%H%M%S'))
+        n = 0
+        while os.path.exists(dest if not n else '{:s}_{:d}'.format(dest, n)): n += 1
+        if n: dest = '{:s}_{:d}'.format(dest, n)
+        os.rename(self.baseFilename, dest)
+        if self.backups:
+            for old in sorted(glob.glob(self.baseFilename + '.*'))[:-self.backups]: os.remove(old)
+        self.stream = self._open()
+        self.opened = time.time()
+        self.size   = 0
+
+
+class Queue_Handler(logging.Handler):
+    '''
+    Hands records to a Log_Writer without blocking or taking a lock, the
+    calling thread only pays for the queue put.  Records that do not fit
+    are counted in writer.dropped.
+    '''
+    def __init__(self, writer):
+        logging.Handler.__init__(self)
+        self.writer = writer
+
+    def handle(self, record):
+        #No handler lock, Queue is thread safe
+        if self.filter(record): self.emit(record)
+
+    def emit(self, record):
+        if record.args: #args may change before the writer gets to them
+            record.msg  = record.getMessage()
+            record.args = None
+        if record.exc_info: #tracebacks do not outlive this frame
+            record.exc_text = _exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        try:
+            self.writer.q.put_nowait(record)
+        except Queue.Full:
+            self.writer.dropped += 1
+
+_exc_formatter = logging.Formatter()
+
+
+class Log_Writer(threading.Thread):
+    '''
+    Writes queued records to handler from its own thread, so the weather,
+    service and main threads never wait on the disk.  Whatever is queued
+    is written as one batch and flushed once.  An identical message
+    (same level and text) past burst copies within window seconds is
+    counted instead of written, and summarised when the window closes.
+    '''
+    def __init__(self, handler, maxsize=LOG_Q_SIZE, window=REPEAT_WINDOW, burst=REPEAT_BURST):
+        threading.Thread.__init__(self, name = 'Log_Writer')
+        self.daemon     = True
+        self.handler    = handler
+        self.q          = Queue.Queue(maxsize)
+        self.window     = window
+        self.burst      = burst
+        self.repeats    = {} #(levelno, msg) -> [window end, count, last record]
+        self.written    = 0
+        self.suppressed = 0
+        self.dropped    = 0 #bumped by Queue_Handler on a full queue
+        self._reported  = 0
+
+    def run(self):
+        next_sweep = time.time() + SWEEP_PERIOD
+        while True:
+            batch = []
+            try:
+                batch.append(self.q.get(timeout=SWEEP_PERIOD))
+                while len(batch) < LOG_Q_SIZE: batch.append(self.q.get_nowait())
+            except Queue.Empty:
+                pass
+            now = time.time()
+            for record in batch:
+                if record is None:
+                    self._sweep(float('inf'))
+                    self.handler.close()
+                    return
+                self._write(record, now)
+            if now >= next_sweep:
+                self._sweep(now)
+                next_sweep = now + SWEEP_PERIOD
+            self.handler.flush()
+
+    def _write(self, record, now):
+        key = (record.levelno, record.msg)
+        r = self.repeats.get(key)
+        if r is None:
+            self.repeats[key] = [now + self.window, 1, record]
         else:
-            t = ct.strftime("%Y%m%d_%H:%M:%S")
-            s = "%s,%03d" % (t, record.msecs)
-        return s
+            r[1] += 1
+            r[2] = record
+            if r[1] > self.burst:
+                self.suppressed += 1
+                return
+        self.written += 1
+        self.handler.handle(record)
+
+    def _sweep(self, now):
+        for key, (end, count, record) in self.repeats.items():
+            if end > now: continue
+            del self.repeats[key]
+            if count > self.burst:
+                self._emit(record, 'Last message repeated {:d} more times: {:s}'.format(
+                    count - self.burst, record.getMessage()))
+        if self.dropped != self._reported:
+            self._emit(None, 'Log queue full, {:d} records dropped'.format(self.dropped - self._reported))
+            self._reported = self.dropped
+
+    def _emit(self, like, msg):
+        if like is None:
+            record = logging.LogRecord('wxd', logging.WARNING, __file__, 0, msg, None, None)
+        else:
+            record = logging.makeLogRecord(dict(like.__dict__, msg=msg, args=None))
+        self.handler.handle(record)
+
+    def stop(self, timeout=5.0):
+        #Writes everything queued so far, then closes the handler
+        try:
+            self.q.put(None, timeout=timeout)
+        except Queue.Full:
+            pass
+        self.join(timeout)
 
 
-def setup_logger(log_name, level=logging.INFO, ts = None, log_path = None):
+def setup_logger(log_name, level=logging.INFO, ts = None, log_path = None,
+                 max_bytes = 0, rotate = 0, backups = LOG_BACKUPS):
+    #Returns the started Log_Writer, stop() it on shutdown
     l = logging.getLogger(log_name)
     if ts == None: ts = str(get_uptime())
     log_file = "{:s}_{:s}.log".format(log_name, ts)
@@ -29,13 +200,15 @@ def setup_logger(log_name, level=logging.INFO, ts = None, log_path = None):
 
     formatter = MyFormatter(fmt='%(asctime)s UTC | %(threadName)14s | %(levelname)8s | %(message)s',datefmt='%Y%m%d %H:%M:%S.%f')
     #fileHandler = logging.FileHandler(log_path, mode='w')
-    fileHandler = logging.FileHandler(log_path)
+    fileHandler = Rotating_File_Handler(log_path, max_bytes, rotate, backups)
     fileHandler.setFormatter(formatter)
+    writer = Log_Writer(fileHandler)
+    writer.start()
     #streamHandler = logging.StreamHandler()
     #streamHandler.setFormatter(formatter)
     l.setLevel(level)
-    l.addHandler(fileHandler)
+    l.addHandler(Queue_Handler(writer))
     l.info('Logger Initialized')
     #l.addHandler(streamHandler) 
-    return fileHandler
+    return writer
 
@@ -12,10 +12,21 @@
 
 import threading
 import time
+import select
+import numpy
 
 from logger import *
 import davis
+import packets
+import multi_station
+import replay
 import service_thread
+import scheduler
+import store
+import metrics
+import profiling
+
+STORE_FLUSH = 10 #seconds between history store writes
 
 class Main_Thread(threading.Thread):
     def __init__ (self, args):
@@ -26,7 +37,10 @@ class Main_Thread(threading.Thread):
         self.state  = 'BOOT' #BOOT, STANDBY, ACTIVE, FAULT
 
         #setup logger
-        self.main_log_fh = setup_logger('wxd', ts=args.startup_ts, log_path=args.log_path)
+        self.log_writer = setup_logger('wxd', ts=args.startup_ts, log_path=args.log_path,
+                                       max_bytes=int(args.log_max_mb * 1e6),
+                                       rotate=int(args.log_rotate * 3600),
+                                       backups=args.log_backups)
         self.logger = logging.getLogger('wxd') #main logger
 
     def run(self):
@@ -54,36 +68,70 @@ class Main_Thread(threading.Thread):
                     pass
                 elif self.state == 'ACTIVE':
                     #Describe ACTIVE here
-                    #read uplink Queue from C2 Radio thread
-                    #print 'ACTIVE'
-                    #if (not self.service_thread.q.empty()):
-                    #    msg = self.service_thread.q.get()
-                    #    print '{:s} | Service Thread RX Message: {:s}'.format(self.name, msg)
-                        #self.wx_thread.tx_q.put(msg)
-                    if (not self.wx_thread.rx_q.empty()):
-                        wx_msg = self.wx_thread.rx_q.get()
-                        print '{:s} | WX rx_q message: {:s}'.format(self.name, str(wx_msg))
-                        #self._send_service_resp(rel_msg)
+                    #Block until the weather or service thread queues something
+                    select.select(self.wx_queues + [self.service_thread.q], [], [])
+                    if profiling.hook: profiling.hook()
+                    for msg in self.service_thread.q.get_all():
+                        print '{:s} | Service Thread RX Message: {:s}'.format(self.name, msg)
+                    #Observations first: the weather thread holds newer ones
+                    #back while a backfill is queued, so anything on rx_q
+                    #predates the archive batches (a reconnect backfill
+                    #fills the gap after them)
+                    for station, seq, wx_msg in self.wx_thread.rx_q.get_all():
+                        if self.args.verbose: self._dump_obs(wx_msg, station)
+                        self.service_thread.publish(wx_msg, station, seq)
+                        self.stores[station].append(wx_msg)
+                    if not self.multi:
+                        for batch in self.wx_thread.archive_q.get_all():
+                            try:
+                                self._store_archive(*batch)
+                            finally:
+                                self.wx_thread.archive_q.task_done()
 
                     #print "Querying relays"
                     #rel_state, rel_int = self.relay_thread.read_all_relays()
                     #print rel_state, rel_int
                     #time.sleep(1)
                     pass
-            
-                time.sleep(0.01) #Needed to throttle CPU
+
+                if self.state != 'ACTIVE':
+                    time.sleep(1) #ACTIVE blocks in select(), nothing else to wait on
 
         except (KeyboardInterrupt, SystemExit): #when you press ctrl+c
             print "\nCaught CTRL-C, Killing Threads..."
             self.logger.warning('Caught CTRL-C, Terminating Threads...')
             self.wx_thread.stop()
             self.wx_thread.join() # wait for the thread to finish what it's doing
+            self.sched.stop()
+            for s in self.stores.values(): s.close()
+            for c in self.captures: c.close()
             self.service_thread.stop()
             self.service_thread.join() # wait for the thread to finish what it's doing
+            if self.metrics_thread: self.metrics_thread.stop()
             self.logger.warning('Terminating {:s}...'.format(self.name))
+            self.log_writer.stop()
             sys.exit()
         sys.exit()
 
+    def _store_archive(self, cols, valid, stamp):
+        #DMPAFT backfill, the checkpoint only moves past records on disk
+        idx = numpy.flatnonzero(valid)
+        s = self.stores[None]
+        n = s.append_archive(packets.archive_epoch(cols['ts'][idx]),
+                             dict((k, v[idx]) for k, v in cols.items()))
+        s.flush(True)
+        if stamp is not None and self.wx_thread.archive: self.wx_thread.archive.commit(stamp)
+        self.logger.info('Stored {:d} of {:d} archive records'.format(n, len(idx)))
+
+    def _dump_obs(self, obs, station):
+        #--verbose: one line per observation, -vv: one line per field
+        name = '' if station is None else ' ' + station
+        if self.args.verbose < 2:
+            self.logger.info('Observation{:s}: {:s}'.format(name, str(obs)))
+        else:
+            self.logger.info('Observation{:s}:\n{:s}'.format(name, '\n'.join(
+                '    {:s} {:s}'.format(k, str(v)) for k, v in zip(obs._fields, obs))))
+
     def _send_service_resp(self,msg):
         self.service_thread._send_resp(msg)
         
@@ -100,23 +148,96 @@ class Main_Thread(threading.Thread):
 
     def _init_threads(self):
         try:
-            #Initialize Relay Thread
+            #Initialize Scheduler, runs every periodic task in the daemon
+            self.logger.info('Setting up Scheduler')
+            self.sched = scheduler.Scheduler()
+            self.sched.daemon = True
+
+            #Initialize Weather Thread, one station or a station list
             self.logger.info('Setting up Weather_Thread')
-            self.wx_thread = davis.Ethernet_VantagePro2(self.args) 
+            self.multi = self.args.wx_stations is not None and not self.args.replay
+            if self.args.replay:
+                self.wx_thread = replay.Replay_Thread(self.args)
+            elif self.multi:
+                self.wx_thread = multi_station.Multi_Station_Thread(self.args, self.sched)
+            else:
+                self.wx_thread = davis.Ethernet_VantagePro2(self.args, self.sched) 
             self.wx_thread.daemon = True
 
+            #Initialize History Stores, one per station, flushed from the scheduler
+            #A replay gets its own store: records at or before the newest
+            #one stored are dropped, so replaying into the live store keeps
+            #nothing and mixes nothing in
+            store_path = self.args.store_path
+            if store_path is None:
+                store_path = self.args.log_path + ('/replay_store' if self.args.replay else '/store')
+            self.stores = {}
+            if self.multi:
+                for name in self.wx_thread.order:
+                    self.logger.info('Opening History Store: {:s}/{:s}'.format(store_path, name))
+                    self.stores[name] = store.History_Store(store_path + '/' + name)
+            else:
+                self.logger.info('Opening History Store: {:s}'.format(store_path))
+                self.stores[None] = store.History_Store(store_path)
+            #Raw frame captures are flushed along with the stores
+            if self.multi: self.captures = [s.capture for s in self.wx_thread.sessions.values() if s.capture]
+            else: self.captures = [c for c in [self.wx_thread.capture] if c]
+            self.sched.add('store_flush', STORE_FLUSH, self._flush_stores)
+
             #Initialize Server Thread
             self.logger.info('Setting up Service_Thread')
-            self.service_thread = service_thread.Service_Thread(self.args) 
+            if self.multi:
+                self.service_thread = service_thread.Service_Thread(self.args)
+                for name in self.wx_thread.order:
+                    s = self.wx_thread.sessions[name]
+                    self.service_thread.add_station(name, s.history, s.rollups, s.trackers)
+                self.service_thread.health = self.wx_thread.health
+            else:
+                self.service_thread = service_thread.Service_Thread(self.args, self.wx_thread.history, self.wx_thread.rollups, self.wx_thread.trackers)
             self.service_thread.daemon = True
 
+            #Alarm events go straight from the weather thread to the service socket
+            if self.multi: engines = [s.alarms for s in self.wx_thread.sessions.values() if s.alarms]
+            else: engines = [e for e in [self.wx_thread.alarms] if e]
+            for e in engines: e.emit = self.service_thread.alarm
+            self.service_thread.alarm_engines = engines
+            if self.multi: policies = [self.wx_thread.sessions[n].adaptive for n in self.wx_thread.order]
+            else: policies = [self.wx_thread.adaptive]
+            self.service_thread.rate_policies = [p for p in policies if p]
+            #Main_Thread consumes rx_q and, single station, archive_q
+            self.wx_queues = [self.wx_thread.rx_q]
+            if not self.multi: self.wx_queues.append(self.wx_thread.archive_q)
+            wx_queues = [self.wx_thread.rx_q, self.wx_thread.cmd_q]
+            if self.multi: wx_queues.append(self.wx_thread.poll_q)
+            else: wx_queues += [self.wx_thread.loop_q, self.wx_thread.archive_q]
+            self.service_thread.queues = wx_queues + self.service_thread.queues
+            self.service_thread.sched = self.sched
+            self.service_thread.stores = self.stores
+
+            #Initialize Metrics Thread, local scrape endpoint
+            self.metrics_thread = None
+            if self.args.metrics_port:
+                self.logger.info('Setting up Metrics_Thread')
+                metrics.REGISTRY.add_collector(metrics.station_collector(self.wx_thread.health))
+                metrics.REGISTRY.add_collector(metrics.queue_collector(self.service_thread.queues))
+                metrics.REGISTRY.add_collector(metrics.scheduler_collector(self.sched))
+                self.metrics_thread = metrics.Metrics_Thread(self.args)
+                self.metrics_thread.daemon = True
+
             #Launch threads
+            self.logger.info('Launching Scheduler')
+            self.sched.start() #non-blocking
+
             self.logger.info('Launching WX_Thread')
             self.wx_thread.start() #non-blocking
     
             self.logger.info('Launching Service_Thread')
             self.service_thread.start() #non-blocking
 
+            if self.metrics_thread:
+                self.logger.info('Launching Metrics_Thread')
+                self.metrics_thread.start() #non-blocking
+
             return True
         except Exception as e:
             self.logger.warning('Error Launching Threads:')
@@ -125,6 +246,10 @@ class Main_Thread(threading.Thread):
             self.state = 'FAULT'
             return False
 
+    def _flush_stores(self):
+        for s in self.stores.values(): s.flush()
+        for c in self.captures: c.flush()
+
     def stop(self):
         print '{:s} Terminating...'.format(self.name)
         self.logger.info('{:s} Terminating...'.format(self.name))
@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Daemon Metrics                   #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Counters and fixed bucket histograms   #
+#    on the hot path                        #
+#   -Prometheus text format over HTTP on a  #
+#    local port                             #
+#############################################
+
+import time
+import logging
+import threading
+from bisect import bisect_left
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+#Stage timings use the wall clock: time.time() is the cheapest clock on
+#Python 2 and these spans are far shorter than any clock step.
+timer = time.time
+
+#Bucket upper bounds, seconds
+FAST_BUCKETS = (10e-6, 25e-6, 50e-6, 100e-6, 250e-6, 500e-6, 1e-3, 2.5e-3, 5e-3, 10e-3, 25e-3, 100e-3)
+SLOW_BUCKETS = (1e-3, 2.5e-3, 5e-3, 10e-3, 25e-3, 50e-3, 100e-3, 250e-3, 500e-3, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4'
+
+
+def _labels(labels):
+    pairs = ['{:s}="{:s}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+             for k, v in sorted(labels.items()) if v is not None]
+    if not pairs: return ''
+    return '{' + ','.join(pairs) + '}'
+
+
+class Counter(object):
+    '''
+    Monotonic count.  inc() is a single attribute add, each counter is
+    only bumped from one thread.
+    '''
+    __slots__ = ('name', 'help', 'value')
+
+    def __init__(self, name, help):
+        self.name   = name
+        self.help   = help
+        self.value  = 0
+
+    def inc(self, n=1):
+        self.value += n
+
+    def render(self, out):
+        out.append('# HELP {:s} {:s}\n# TYPE {:s} counter\n{:s} {:d}\n'.format(
+            self.name, self.help, self.name, self.name, self.value))
+
+
+class Histogram(object):
+    '''
+    Fixed bucket histogram.  observe() is one bisect over the bounds and
+    three adds; cumulative counts are only built by render().
+    '''
+    __slots__ = ('name', 'help', 'bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, name, help, buckets=FAST_BUCKETS):
+        self.name   = name
+        self.help   = help
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1) #last one is +Inf
+        self.sum    = 0.0
+        self.count  = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, out):
+        out.append('# HELP {:s} {:s}\n# TYPE {:s} histogram\n'.format(self.name, self.help, self.name))
+        counts = list(self.counts)
+        total = 0
+        for bound, n in zip(self.bounds, counts):
+            total += n
+            out.append('{:s}_bucket{{le="{:g}"}} {:d}\n'.format(self.name, bound, total))
+        total += counts[-1]
+        out.append('{:s}_bucket{{le="+Inf"}} {:d}\n{:s}_sum {:.9g}\n{:s}_count {:d}\n'.format(
+            self.name, total, self.name, self.sum, self.name, total))
+
+
+class Registry(object):
+    '''
+    Every metric of the daemon.  Counters kept elsewhere (framer, queue,
+    station health) are read at render time by collectors, callables
+    returning [(name, type, help, [(labels, value)])], so they cost
+    nothing between scrapes.  render() output is cached for max_age.
+    '''
+    def __init__(self):
+        self.metrics    = []
+        self.collectors = []
+        self.lock       = threading.Lock()
+        self._text      = None
+        self._at        = 0.0
+
+    def counter(self, name, help):
+        m = Counter(name, help)
+        self.metrics.append(m)
+        return m
+
+    def histogram(self, name, help, buckets=FAST_BUCKETS):
+        m = Histogram(name, help, buckets)
+        self.metrics.append(m)
+        return m
+
+    def add_collector(self, collector):
+        self.collectors.append(collector)
+
+    def render(self):
+        out = []
+        for m in self.metrics: m.render(out)
+        for collector in self.collectors:
+            for name, kind, help, samples in collector():
+                out.append('# HELP {:s} {:s}\n# TYPE {:s} {:s}\n'.format(name, help, name, kind))
+                for labels, value in samples:
+                    out.append('{:s}{:s} {:g}\n'.format(name, _labels(labels), value))
+        return ''.join(out)
+
+    def text(self, max_age):
+        with self.lock:
+            now = time.time()
+            if self._text is None or now - self._at >= max_age:
+                self._text = self.render()
+                self._at = now
+            return self._text
+
+
+REGISTRY = Registry()
+
+#--Hot Path Metrics-----------------------------------------------------
+CMD_FIRST_BYTE  = REGISTRY.histogram('wxd_command_first_byte_seconds',
+                                     'LOOP/LPS command sent to first reply byte', SLOW_BUCKETS)
+FRAME_RX        = REGISTRY.histogram('wxd_frame_receive_seconds',
+                                     'Station socket read and LOOP framing per recv()')
+PARSE           = REGISTRY.histogram('wxd_parse_seconds',
+                                     'LOOP/LOOP2 decode into a record, derived variables included')
+DERIVE          = REGISTRY.histogram('wxd_derive_seconds',
+                                     'Derived variable computation per observation')
+LOOP_Q_DWELL    = REGISTRY.histogram('wxd_loop_q_dwell_seconds',
+                                     'Time observations wait in loop_q', SLOW_BUCKETS)
+RX_Q_DWELL      = REGISTRY.histogram('wxd_rx_q_dwell_seconds',
+                                     'Time observations wait in rx_q', SLOW_BUCKETS)
+REPLY           = REGISTRY.histogram('wxd_service_reply_seconds',
+                                     'Service query received to reply sent')
+OBSERVATIONS    = REGISTRY.counter('wxd_observations_total', 'Observations decoded, all stations')
+
+
+def station_collector(health):
+    '''
+    Collector over health(), a list of station health dicts, exposing
+    the framer and connection counters.
+    '''
+    series = (('frames', 'wxd_frames_total', 'Valid LOOP/LOOP2 frames received'),
+              ('crc_errors', 'wxd_crc_errors_total', 'Frames failing CRC'),
+              ('discarded', 'wxd_discarded_bytes_total', 'Bytes dropped resyncing on a bad frame'),
+              ('reconnects', 'wxd_reconnects_total', 'Station reconnects'),
+              ('timeouts', 'wxd_timeouts_total', 'Station wake up or data timeouts'))
+    def collect():
+        stations = health()
+        out = []
+        for key, name, help in series:
+            samples = [({'station':h['station']}, h[key]) for h in stations if key in h]
+            if samples: out.append((name, 'counter', help, samples))
+        return out
+    return collect
+
+
+def queue_collector(queues):
+    '''
+    Collector over a list of Select_Queues: depth, high-water mark, puts
+    and drops per queue.
+    '''
+    def collect():
+        stats = [q.stats() for q in queues]
+        return [('wxd_queue_depth', 'gauge', 'Items waiting',
+                 [({'queue':s['name']}, s['depth']) for s in stats]),
+                ('wxd_queue_high_water', 'gauge', 'Deepest the queue has been',
+                 [({'queue':s['name']}, s['high_water']) for s in stats]),
+                ('wxd_queue_puts_total', 'counter', 'Items queued',
+                 [({'queue':s['name']}, s['puts']) for s in stats]),
+                ('wxd_queue_dropped_total', 'counter', 'Items dropped on overflow',
+                 [({'queue':s['name']}, s['dropped']) for s in stats])]
+    return collect
+
+
+def scheduler_collector(sched):
+    '''
+    Collector over Scheduler.stats(): runs, overruns, skipped periods and
+    start time jitter per periodic task.
+    '''
+    def collect():
+        stats = sched.stats()
+        return [('wxd_task_runs_total', 'counter', 'Periodic task runs',
+                 [({'task':s['name']}, s['runs']) for s in stats]),
+                ('wxd_task_overruns_total', 'counter', 'Runs that finished after the next deadline',
+                 [({'task':s['name']}, s['overruns']) for s in stats]),
+                ('wxd_task_skipped_total', 'counter', 'Periods dropped under the skip policy',
+                 [({'task':s['name']}, s['skipped']) for s in stats]),
+                ('wxd_task_jitter_mean_seconds', 'gauge', 'Mean start time past the deadline',
+                 [({'task':s['name']}, s['jitter_mean']) for s in stats]),
+                ('wxd_task_jitter_max_seconds', 'gauge', 'Largest start time past the deadline',
+                 [({'task':s['name']}, s['jitter_max']) for s in stats])]
+    return collect
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.registry.text(self.server.max_age)
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, fmt, *args):
+        pass #scrapes are not worth a log line
+
+
+class Metrics_Thread(threading.Thread):
+    '''
+    Serves the registry on http://127.0.0.1:<metrics_port>/metrics.  The
+    text is rebuilt at most once per metrics_interval seconds however
+    often it is scraped.
+    '''
+    def __init__ (self, args, registry=REGISTRY):
+        threading.Thread.__init__(self, name = 'Metrics_Thread')
+        self.logger     = logging.getLogger('wxd')
+        self.server     = HTTPServer(('127.0.0.1', args.metrics_port), _Handler)
+        self.server.registry = registry
+        self.server.max_age  = args.metrics_interval
+        self.logger.info('Metrics on http://127.0.0.1:{:d}/metrics'.format(self.server.server_address[1]))
+
+    def run(self):
+        self.server.serve_forever(poll_interval=1.0)
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
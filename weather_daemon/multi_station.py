@@ -0,0 +1,412 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Multi Station Vantage Interface  #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Many WeatherLinkIP stations, one       #
+#    thread, one poll() loop                #
+#   -Polls on the shared scheduler, per     #
+#    station reconnect state and counters   #
+#############################################
+
+import sys
+import json
+import errno
+import select
+import socket
+import logging
+import datetime
+import threading
+
+import framer
+import ring_buffer
+import rollup
+import trackers
+import derived
+import adaptive
+import capture
+import alarms
+import metrics
+import profiling
+import pipeline
+from pipeline import Station_Obs
+from select_queue import Select_Queue, KEEP_LATEST, DROP_OLDEST
+import scheduler
+from scheduler import monotonic
+from davis import LOOP_REARM, LOOP_INTERVAL
+
+DISCONNECTED, CONNECTING, WAKING, ACTIVE = 'DISCONNECTED', 'CONNECTING', 'WAKING', 'ACTIVE'
+
+WAKE_TIMEOUT    = 1.2   #seconds to wait for '\n\r'
+WAKE_TRIES      = 3
+BACKOFF_MIN     = 1.0   #reconnect backoff, doubles per failure
+BACKOFF_MAX     = 60.0
+STALL           = 2 * LOOP_INTERVAL + 1 #stream re-arm when quiet this long
+
+
+def load_stations(path, args):
+    '''
+    Reads the station list, a JSON list of objects with name, ip and port.
+    rate, stream, loop_n, loop2 and elevation default to the --wx_* arguments.
+    '''
+    with open(path) as f:
+        entries = json.load(f)
+    stations = []
+    for e in entries:
+        stations.append({'name':str(e['name']), 'ip':str(e['ip']), 'port':int(e['port']),
+                         'rate':float(e.get('rate', args.wx_rate)),
+                         'stream':bool(e.get('stream', args.wx_stream)),
+                         'loop_n':int(e.get('loop_n', args.wx_loop_n)),
+                         'loop2':bool(e.get('loop2', args.wx_loop2)),
+                         'elevation':e.get('elevation', args.wx_elevation)})
+    return stations
+
+
+class Station_Session(pipeline.Obs_Pipeline):
+    '''
+    Connection and protocol state for one station, driven by the owning
+    Multi_Station_Thread: on_writable/on_readable on socket events,
+    on_timer once deadline() has passed and on_poll when its Periodic_Task
+    on the shared scheduler is due.  deadline() only covers connect, wake
+    up, stall and stale link timeouts.  Memory per station is fixed: the
+    framer buffer, the ring buffer and the rollup accumulators.
+    '''
+    __slots__ = ('name', 'ip', 'port', 'rate', 'stream', 'loop_n', 'loop2',
+                 'sock', 'state', 'framer', 'history', 'rollups', 'trackers', 'derived', 'adaptive', 'emit', 'logger', 'capture', 'alarms',
+                 'sched', 'poll_q', 'poll_task', 'next_connect', 'backoff', 'wake_deadline', 'wake_tries',
+                 'loop_left', 'last_rx', 'last_loop', 'cmd_at',
+                 'seq', 'frames', 'crc_errors', 'reconnects', 'timeouts', 'connected_at')
+
+    def __init__(self, cfg, history_len, emit, capture_path=None, rules=None, policy=None):
+        self.name       = cfg['name']
+        self.ip         = cfg['ip']
+        self.port       = cfg['port']
+        self.rate       = cfg['rate']
+        self.stream     = cfg['stream']
+        self.loop_n     = cfg['loop_n']
+        self.loop2      = cfg['loop2']
+        self.emit       = emit
+        self.logger     = logging.getLogger('wxd')
+
+        self.sock       = None
+        self.state      = DISCONNECTED
+        self.framer     = framer.Loop_Framer()
+        self.history    = ring_buffer.Obs_Ring_Buffer(history_len)
+        self.rollups    = rollup.Rollup_Engine()
+        self.trackers   = trackers.Peak_Tracker()
+        self.derived    = derived.Derived_Engine(cfg['elevation'])
+        self.capture    = None
+        if capture_path: self.capture = capture.Capture_Writer(capture_path)
+        self.alarms     = None
+        if rules: self.alarms = alarms.Alarm_Engine(rules, self.name)
+        self.adaptive   = None
+        if policy: self.adaptive = adaptive.Rate_Policy(policy, self.rate, self.stream, self.name)
+
+        self.sched          = None #shared scheduler, set by schedule()
+        self.poll_q         = None
+        self.poll_task      = None
+        self.next_connect   = 0.0
+        self.backoff        = BACKOFF_MIN
+        self.wake_deadline  = 0.0
+        self.wake_tries     = 0
+        self.loop_left      = 0
+        self.last_rx        = 0.0
+        self.last_loop      = None
+        self.cmd_at         = None #time of the last LOOP command, until its first byte
+
+        self.seq            = 0 #observations emitted
+        self.frames         = 0
+        self.crc_errors     = 0
+        self.reconnects     = 0
+        self.timeouts       = 0 #wake or data timeouts
+        self.connected_at   = None
+
+    def health(self):
+        return {'station':self.name, 'state':self.state, 'seq':self.seq,
+                'frames':self.frames, 'crc_errors':self.crc_errors,
+                'discarded':self.framer.discarded, 'reconnects':self.reconnects,
+                'timeouts':self.timeouts, 'connected_at':self.connected_at}
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def events(self):
+        #poll() mask wanted in the current state
+        if self.state == CONNECTING: return select.POLLOUT
+        if self.sock is not None: return select.POLLIN
+        return 0
+
+    def deadline(self):
+        if self.state == DISCONNECTED: return self.next_connect
+        if self.state in (CONNECTING, WAKING): return self.wake_deadline
+        if self.stream:
+            if self._rearm_due(): return 0.0 #LOOP n about to run dry
+            return self.last_rx + STALL
+        return self.last_rx + self._stale()
+
+    def _rearm_due(self):
+        #Re-arm with LOOP_REARM packets still to come, once the current
+        #LOOP n has started arriving so a small n is not re-sent every pass
+        return self.loop_left <= LOOP_REARM and self.loop_left < self.loop_n
+
+    def _stale(self):
+        #no packet for this long in poll mode means the link is dead
+        return 3 * max(self.rate, LOOP_INTERVAL) + 5
+
+    def schedule(self, sched, poll_q):
+        #Polls run on sched, due ones are handed over on poll_q
+        self.sched = sched
+        self.poll_q = poll_q
+        if not self.stream: self._start_polls()
+
+    def unschedule(self):
+        if self.poll_task: self.sched.cancel(self.poll_task)
+        self.poll_task = None
+
+    def _start_polls(self):
+        self.poll_task = self.sched.add('wx_poll_' + self.name, self.rate, self._poll_event, delay=0)
+
+    def _poll_event(self):
+        #Runs in the scheduler thread, hand the poll to the weather thread
+        self.poll_q.put(self.name)
+
+    def connect(self, now):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setblocking(0)
+        err = self.sock.connect_ex((self.ip, self.port))
+        if err not in (0, errno.EINPROGRESS):
+            self.close(now, 'connect failed: {:s}'.format(errno.errorcode.get(err, str(err))))
+            return
+        self.state = CONNECTING
+        self.wake_deadline = now + WAKE_TIMEOUT * WAKE_TRIES
+
+    def close(self, now, reason):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+        self.logger.warning('Station {:s}: {:s}, reconnect in {:.0f}s'.format(self.name, reason, self.backoff))
+        self.state = DISCONNECTED
+        self.framer.reset()
+        self.last_loop = None
+        self.next_connect = now + self.backoff
+        self.backoff = min(self.backoff * 2, BACKOFF_MAX)
+
+    def on_writable(self, now):
+        err = self.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+        if err:
+            self.close(now, 'connect failed: {:s}'.format(errno.errorcode.get(err, str(err))))
+            return
+        self.state = WAKING
+        self.wake_tries = 0
+        self._send_wake(now)
+
+    def _send_wake(self, now):
+        self.wake_tries += 1
+        self.wake_deadline = now + WAKE_TIMEOUT
+        self._send('\n')
+
+    def _send(self, data):
+        try:
+            self.sock.send(data)
+        except socket.error as e:
+            self.close(monotonic(), 'send failed: {:s}'.format(str(e)))
+
+    def on_readable(self, now):
+        t0 = metrics.timer()
+        try:
+            data = self.sock.recv(4096)
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK): return
+            self.close(now, 'recv failed: {:s}'.format(str(e)))
+            return
+        if not data:
+            self.close(now, 'connection closed')
+            return
+        if self.state == WAKING:
+            if '\n\r' in data: self._activate(now)
+            return
+        ts = datetime.datetime.utcnow()
+        if self.cmd_at is not None:
+            metrics.CMD_FIRST_BYTE.observe(t0 - self.cmd_at)
+            self.cmd_at = None
+        crc = self.framer.crc_errors
+        frames = self.framer.feed(data)
+        metrics.FRAME_RX.observe(metrics.timer() - t0)
+        for frame in frames:
+            self.frames += 1
+            self.loop_left -= 1
+            self.last_rx = now
+            self._handle_frame(frame, ts)
+        self.crc_errors += self.framer.crc_errors - crc
+
+    def _activate(self, now):
+        self.state = ACTIVE
+        if self.connected_at is not None: self.reconnects += 1
+        self.connected_at = datetime.datetime.utcnow().isoformat()
+        self.backoff = BACKOFF_MIN
+        self.last_rx = now
+        self.loop_left = 0
+        self.logger.info('Station {:s}: connected to [{:s}:{:d}]'.format(self.name, self.ip, self.port))
+        if not self.stream: self.on_poll(now) #first observation without waiting a period
+
+    def _handle_frame(self, frame, ts):
+        msg = self._observe(frame, ts)
+        if msg is None: return
+        self.seq += 1
+        self.emit(Station_Obs(self.name, self.seq, msg))
+
+    def _apply_rate(self):
+        #Rate_Policy transition: new poll period, or switch to/from LOOP n
+        p = self.adaptive
+        self.rate = p.rate
+        if p.stream and not self.stream:
+            self.stream = True
+            self.loop_left = 0 #deadline() is due, on_timer() sends LOOP n
+            self.unschedule()
+        elif not p.stream and self.stream:
+            self.stream = False
+            if self.state == ACTIVE: self._send('\n') #any character ends LOOP n
+            self._start_polls()
+        elif self.poll_task:
+            self.sched.set_period(self.poll_task, self.rate)
+
+    def on_poll(self, now):
+        if self.state != ACTIVE or self.stream: return
+        self._send(self._loop_str(1 + self.loop2))
+        self.cmd_at = metrics.timer()
+
+    def on_timer(self, now):
+        if self.state == DISCONNECTED:
+            if now >= self.next_connect: self.connect(now)
+        elif self.state == CONNECTING:
+            if now >= self.wake_deadline:
+                self.timeouts += 1
+                self.close(now, 'connect timed out')
+        elif self.state == WAKING:
+            if now >= self.wake_deadline:
+                if self.wake_tries < WAKE_TRIES: self._send_wake(now)
+                else:
+                    self.timeouts += 1
+                    self.close(now, 'no wake up response')
+        elif self.stream:
+            if self._rearm_due() or now - self.last_rx > STALL:
+                if now - self.last_rx > STALL: self.timeouts += 1
+                self._send(self._loop_str(self.loop_n))
+                self.cmd_at = metrics.timer()
+                self.loop_left = self.loop_n
+                self.last_rx = now
+        elif now - self.last_rx > self._stale():
+            self.timeouts += 1
+            self.close(now, 'no data')
+
+
+class Multi_Station_Thread(threading.Thread):
+    '''
+    Polls every station in the --wx_stations list from one thread.  All
+    sockets are multiplexed on one poll() object; the poll timeout is the
+    earliest station deadline, so an idle daemon only wakes for real I/O,
+    a timeout or a due poll.  Periodic polls are Periodic_Tasks on the
+    shared scheduler, one per station in poll mode, so their jitter is in
+    Scheduler.stats() with every other task; due polls wake poll() through
+    poll_q.  Observations from every station go on the shared rx_q as
+    Station_Obs tuples.  DMPAFT archive backfill is single station only.
+    '''
+    def __init__ (self, args, sched = None):
+        threading.Thread.__init__(self, name = 'Weather_Thread')
+        self._stop      = threading.Event()
+        self.logger     = logging.getLogger('wxd')
+        print "Initializing {}".format(self.name)
+        self.logger.info("Initializing {}".format(self.name))
+
+        stations        = load_stations(args.wx_stations, args)
+        self.rx_q       = Select_Queue(args.queue_size * len(stations), args.queue_policy, 'rx_q',
+                                      metrics.RX_Q_DWELL) #Station_Obs out of thread
+        self.cmd_q      = Select_Queue(4, KEEP_LATEST, 'wx_cmd_q') #wakes poll() on stop()
+        self.poll_q     = Select_Queue(2 * len(stations), DROP_OLDEST, 'wx_poll_q') #due station polls
+        self.sched      = sched #shared scheduler, own one started in run() if None
+
+        history_len     = int(args.wx_history * 3600 / LOOP_INTERVAL) + 1
+        self.sessions   = {}
+        self.order      = []
+        rules = alarms.load_rules(args.wx_alarms) if args.wx_alarms else None
+        policy = adaptive.load_policy(args.wx_adaptive) if args.wx_adaptive else None
+        for cfg in stations:
+            if cfg['name'] in self.sessions:
+                raise ValueError('Duplicate station name: {:s}'.format(cfg['name']))
+            cap = None #one capture file per station
+            if args.wx_capture: cap = '{:s}.{:s}'.format(args.wx_capture, cfg['name'])
+            self.sessions[cfg['name']] = Station_Session(cfg, history_len, self.rx_q.put, cap, rules, policy)
+            self.order.append(cfg['name'])
+        self.logger.info('{:d} stations configured'.format(len(self.order)))
+
+        #First station answers service queries without an @station prefix
+        first = self.sessions[self.order[0]]
+        self.history    = first.history
+        self.rollups    = first.rollups
+        self.trackers   = first.trackers
+
+    def health(self):
+        return [self.sessions[name].health() for name in self.order]
+
+    def run(self):
+        print "{:s} Started...".format(self.name)
+        self.logger.info('Launched {:s}'.format(self.name))
+        if self.sched is None:
+            self.sched = scheduler.Scheduler()
+            self.sched.daemon = True
+            self.sched.start()
+        poller = select.poll()
+        poller.register(self.cmd_q, select.POLLIN)
+        poller.register(self.poll_q, select.POLLIN)
+        registered = {} #fd -> (session, mask)
+        sessions = [self.sessions[name] for name in self.order]
+        for s in sessions: s.schedule(self.sched, self.poll_q)
+
+        while (not self._stop.isSet()):
+            if profiling.hook: profiling.hook()
+            now = monotonic()
+            for s in sessions:
+                if s.deadline() <= now: s.on_timer(now)
+
+            #sync poll() registrations with socket state
+            live = {}
+            for s in sessions:
+                mask = s.events()
+                if mask: live[s.fileno()] = (s, mask)
+            for fd in registered.keys():
+                if fd not in live or registered[fd] != live[fd]:
+                    poller.unregister(fd)
+                    del registered[fd]
+            for fd, entry in live.items():
+                if fd not in registered:
+                    poller.register(fd, entry[1])
+                    registered[fd] = entry
+
+            timeout = min(s.deadline() for s in sessions) - monotonic()
+            events = poller.poll(max(0, int(timeout * 1000) + 1))
+            now = monotonic()
+            for fd, ev in events:
+                if fd not in registered: continue
+                s, mask = registered[fd]
+                if mask == select.POLLOUT: s.on_writable(now)
+                else: s.on_readable(now)
+            for name in set(self.poll_q.get_all()): self.sessions[name].on_poll(now)
+            self.cmd_q.get_all()
+
+        for s in sessions:
+            s.unschedule()
+            if s.sock is not None: s.sock.close()
+        self.logger.warning('{:s} Terminated'.format(self.name))
+        sys.exit()
+
+    def stop(self):
+        print '{:s} Terminating...'.format(self.name)
+        self.logger.info('{:s} Terminating...'.format(self.name))
+        self._stop.set()
+        self.cmd_q.wake()
+
+    def stopped(self):
+        return self._stop.isSet()
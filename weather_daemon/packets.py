@@ -0,0 +1,500 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Davis Vantage Pro2 Packet Decoder  #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Table driven LOOP packet layouts       #
+#   -See VantageSerialProtocolDocs_v261.pdf #
+#############################################
+
+import time
+import struct
+import numpy
+from collections import namedtuple
+
+import weather.temp_array as temp_array
+import derived
+import metrics
+
+ACK = 0x06
+
+#--CRC-16-CCITT---------------------------------------------------------
+# Vantage packets carry a big endian CRC-16 (poly 0x1021, init 0) so that
+# the CRC computed over a packet including its CRC bytes is zero.
+def _crc_table():
+    table = []
+    for i in xrange(256):
+        crc = i << 8
+        for j in xrange(8):
+            if crc & 0x8000: crc = (crc << 1) ^ 0x1021
+            else: crc = crc << 1
+        table.append(crc & 0xFFFF)
+    return tuple(table)
+
+CRC_TABLE    = _crc_table()
+CRC_TABLE_NP = numpy.array(CRC_TABLE, dtype=numpy.uint16)
+
+def crc16(data, offset=0, length=None):
+    '''
+    Computes the Vantage CRC-16 over data[offset:offset+length].
+    data must index to ints (bytearray).
+    '''
+    if length is None: length = len(data) - offset
+    crc = 0
+    table = CRC_TABLE
+    for i in xrange(offset, offset + length):
+        crc = table[(crc >> 8) ^ data[i]] ^ ((crc << 8) & 0xFFFF)
+    return crc
+
+def crc16_batch(rows):
+    '''
+    Computes the Vantage CRC-16 of every row of an (N, M) uint8 array,
+    one vector operation per byte column.
+    '''
+    crc = numpy.zeros(rows.shape[0], dtype=numpy.uint16)
+    for j in xrange(rows.shape[1]):
+        crc = CRC_TABLE_NP[(crc >> 8) ^ rows[:, j]] ^ (crc << 8)
+    return crc
+
+#--LOOP Packet Layout---------------------------------------------------
+# One entry per field of the 99 byte LOOP packet, in wire order.
+#   (name, struct code, count, divisor)
+# name == None marks bytes that are skipped (pad).
+# count > 1 yields a tuple of raw values for that field.
+# divisor != None scales the raw integer into engineering units.
+LOOP_LAYOUT = [
+    (None,              'x', 3, None),      #'LOO'
+    ('bar_trend',       'b', 1, None),      #3 Hour Barometer Trend, signed
+    ('pkt_type',        'B', 1, None),      #Packet Type, 0 = LOOP, 1 = LOOP2
+    ('next_record',     'H', 1, None),      #Next Archive Record
+    ('barometer',       'H', 1, 1000.0),    #In. Hg.
+    ('inside_temp',     'h', 1, 10.0),      #deg F
+    ('inside_hum',      'B', 1, None),      #% humidity
+    ('outside_temp',    'h', 1, 10.0),      #deg F
+    ('wind_speed',      'B', 1, None),      #mph
+    ('wind_avg',        'B', 1, None),      #mph, 10 minute average
+    ('wind_dir',        'H', 1, None),      #degrees
+    ('extra_temps',     'B', 7, None),      #deg F + 90
+    ('soil_temps',      'B', 4, None),      #deg F + 90
+    ('leaf_temps',      'B', 4, None),      #deg F + 90
+    ('outside_hum',     'B', 1, None),      #% humidity
+    ('extra_hums',      'B', 7, None),      #% humidity
+    ('rain_rate',       'H', 1, 100.0),     #inches/hour
+    ('uv_index',        'B', 1, 10.0),      #uv index
+    ('solar_rad',       'H', 1, None),      #watts/m^2
+    ('storm_rain',      'H', 1, 100.0),     #inches
+    ('storm_date',      'H', 1, None),      #packed date, see manual
+    ('day_rain',        'H', 1, 100.0),     #inches
+    ('month_rain',      'H', 1, 100.0),     #inches
+    ('year_rain',       'H', 1, 100.0),     #inches
+    ('day_et',          'H', 1, 1000.0),    #inches
+    ('month_et',        'H', 1, 100.0),     #inches
+    ('year_et',         'H', 1, 100.0),     #inches
+    ('soil_moist',      'B', 4, None),      #centibar
+    ('leaf_wet',        'B', 4, None),      #0-15
+    ('inside_alarms',   'B', 1, None),
+    ('rain_alarms',     'B', 1, None),
+    ('outside_alarms',  'H', 1, None),
+    ('extra_alarms',    'B', 8, None),
+    ('soil_leaf_alarms','B', 4, None),
+    ('tx_battery',      'B', 1, None),      #transmitter battery status
+    ('battery',         'H', 1, 512.0 / 3.0), #Volts, raw * 300 / 512 / 100
+    ('forecast_icons',  'B', 1, None),
+    ('forecast_rule',   'B', 1, None),
+    ('sunrise',         'H', 1, None),      #hour * 100 + min
+    ('sunset',          'H', 1, None),      #hour * 100 + min
+    (None,              'x', 2, None),      #'\n\r'
+    (None,              'x', 2, None),      #CRC-16
+]
+
+#Fields computed from the decoded packet, appended to every record
+DERIVED_FIELDS = derived.DERIVED_FIELDS
+
+#--Dashed Values--------------------------------------------------------
+# Raw values the console sends for a dashed reading (sensor missing, ISS
+# link lost), by struct code, the console's own value first.  Scalar
+# LOOP/LOOP2 readings holding one decode as NaN, so every consumer sees
+# them as missing and never as 3276.7 deg F or 255 mph.  The store and the
+# wire format write the first value for a missing field and read any of
+# them back as missing; this is the one table of these values.
+DASHED = {'b':(0x7F, -0x80), 'B':(0xFF,), 'h':(0x7FFF, -0x8000), 'H':(0xFFFF, 0x7FFF)}
+
+#Codes, counters and bit fields: every raw value means something, never dashed
+NOT_DASHED = frozenset(('pkt_type', 'next_record', 'storm_date', 'inside_alarms',
+                        'rain_alarms', 'outside_alarms', 'tx_battery', 'forecast_icons',
+                        'forecast_rule', 'sunrise', 'sunset', 'bar_reduction', 'bar_cal'))
+
+NAN = float('nan')
+
+
+def compile_layout(layout):
+    '''
+    Compiles a layout table into a precompiled struct.Struct, the tuple of
+    field names and a decode plan of (start, stop, divisor, dashed) per
+    field.  stop is 0 for scalar fields, dashed the raw values decoded as
+    NaN.
+    '''
+    fmt = '<'
+    names = []
+    plan = []
+    idx = 0
+    for name, code, count, divisor in layout:
+        if count > 1: fmt += '{:d}{:s}'.format(count, code)
+        else: fmt += code
+        if name is None: continue
+        names.append(name)
+        if count > 1: plan.append((idx, idx + count, divisor, ()))
+        elif name in NOT_DASHED: plan.append((idx, 0, divisor, ()))
+        else: plan.append((idx, 0, divisor, DASHED[code]))
+        idx += count
+    return struct.Struct(fmt), tuple(names), tuple(plan)
+
+LOOP_STRUCT, LOOP_NAMES, LOOP_PLAN = compile_layout(LOOP_LAYOUT)
+LOOP_SIZE   = LOOP_STRUCT.size #99
+LOOP_INDEX  = dict((name, i) for i, name in enumerate(LOOP_NAMES))
+
+Loop_Record = namedtuple('Loop_Record', ('ts',) + LOOP_NAMES + DERIVED_FIELDS)
+
+
+#--LOOP2 Packet Layout--------------------------------------------------
+# Same 99 byte frame and 'LOO' header as LOOP, pkt_type == 1.
+LOOP2_TYPE = 1
+
+LOOP2_LAYOUT = [
+    (None,              'x', 3, None),      #'LOO'
+    ('bar_trend',       'b', 1, None),      #3 Hour Barometer Trend, signed
+    ('pkt_type',        'B', 1, None),      #Packet Type, 1 = LOOP2
+    (None,              'x', 2, None),      #unused
+    ('barometer',       'H', 1, 1000.0),    #In. Hg.
+    ('inside_temp',     'h', 1, 10.0),      #deg F
+    ('inside_hum',      'B', 1, None),      #% humidity
+    ('outside_temp',    'h', 1, 10.0),      #deg F
+    ('wind_speed',      'B', 1, None),      #mph
+    (None,              'x', 1, None),      #unused
+    ('wind_dir',        'H', 1, None),      #degrees
+    ('wind_avg_10min',  'H', 1, 10.0),      #mph
+    ('wind_avg_2min',   'H', 1, 10.0),      #mph
+    ('wind_gust_10min', 'H', 1, None),      #mph
+    ('wind_gust_dir',   'H', 1, None),      #degrees, direction of 10 minute gust
+    (None,              'x', 4, None),      #unused
+    ('console_dew_point','h', 1, None),     #deg F
+    (None,              'x', 1, None),      #unused
+    ('outside_hum',     'B', 1, None),      #% humidity
+    (None,              'x', 1, None),      #unused
+    ('console_heat_index','h', 1, None),    #deg F
+    ('console_wind_chill','h', 1, None),    #deg F
+    ('thsw_index',      'h', 1, None),      #deg F
+    ('rain_rate',       'H', 1, 100.0),     #inches/hour
+    ('uv_index',        'B', 1, 10.0),      #uv index
+    ('solar_rad',       'H', 1, None),      #watts/m^2
+    ('storm_rain',      'H', 1, 100.0),     #inches
+    ('storm_date',      'H', 1, None),      #packed date, see manual
+    ('day_rain',        'H', 1, 100.0),     #inches
+    ('rain_15min',      'H', 1, 100.0),     #inches
+    ('rain_hour',       'H', 1, 100.0),     #inches
+    ('day_et',          'H', 1, 1000.0),    #inches
+    ('rain_24hr',       'H', 1, 100.0),     #inches
+    ('bar_reduction',   'B', 1, None),      #barometric reduction method
+    ('bar_offset',      'h', 1, 1000.0),    #In. Hg., user entered offset
+    ('bar_cal',         'H', 1, None),      #barometric calibration number
+    ('bar_raw',         'H', 1, 1000.0),    #In. Hg., sensor raw reading
+    ('bar_abs',         'H', 1, 1000.0),    #In. Hg., absolute (station) pressure
+    ('altimeter',       'H', 1, 1000.0),    #In. Hg., altimeter setting
+    (None,              'x', 2, None),      #unused
+    (None,              'x', 10, None),     #graph pointers
+    (None,              'x', 12, None),     #unused
+    (None,              'x', 2, None),      #'\n\r'
+    (None,              'x', 2, None),      #CRC-16
+]
+
+LOOP2_STRUCT, LOOP2_NAMES, LOOP2_PLAN = compile_layout(LOOP2_LAYOUT)
+LOOP2_INDEX = dict((name, i) for i, name in enumerate(LOOP2_NAMES))
+
+Loop2_Record = namedtuple('Loop2_Record', ('ts',) + LOOP2_NAMES)
+
+#LOOP2 fields not already carried by LOOP, appended when both are merged
+LOOP2_EXTRA     = tuple(name for name in LOOP2_NAMES if name not in LOOP_INDEX)
+_LOOP2_EXTRA_IDX = tuple(LOOP2_INDEX[name] for name in LOOP2_EXTRA)
+_BAR_ABS    = LOOP2_INDEX['bar_abs']
+_ALTIMETER  = LOOP2_INDEX['altimeter']
+_THSW       = LOOP2_INDEX['thsw_index']
+
+Wx_Record = namedtuple('Wx_Record', ('ts',) + LOOP_NAMES + LOOP2_EXTRA + DERIVED_FIELDS)
+
+
+def apply_plan(raw, plan):
+    '''
+    Converts a flat tuple of unpacked integers into field values.
+    '''
+    out = []
+    for start, stop, divisor, dashed in plan:
+        if stop:
+            out.append(raw[start:stop])
+        elif raw[start] in dashed:
+            out.append(NAN)
+        elif divisor:
+            out.append(raw[start] / divisor)
+        else:
+            out.append(raw[start])
+    return out
+
+
+def unpack_loop(frame, offset=0):
+    '''
+    Decodes a LOOP packet starting at offset ('LOO') into a list of field
+    values ordered as LOOP_NAMES.  One unpack_from, no intermediate slices.
+    '''
+    return apply_plan(LOOP_STRUCT.unpack_from(frame, offset), LOOP_PLAN)
+
+_OUT_TEMP   = LOOP_INDEX['outside_temp']
+_OUT_HUM    = LOOP_INDEX['outside_hum']
+_IN_TEMP    = LOOP_INDEX['inside_temp']
+_IN_HUM     = LOOP_INDEX['inside_hum']
+_WIND_SPEED = LOOP_INDEX['wind_speed']
+_WIND_AVG   = LOOP_INDEX['wind_avg']
+_SOLAR      = LOOP_INDEX['solar_rad']
+_BAROMETER  = LOOP_INDEX['barometer']
+
+#Shared by callers without a station of their own (tools, benchmarks)
+DEFAULT_ENGINE = derived.Derived_Engine()
+
+def derive_loop(vals, ts=None, loop2=None, engine=None):
+    '''
+    Computes DERIVED_FIELDS from a list of LOOP field values, and the
+    matching LOOP2 values when LOOP2 was polled too.
+    '''
+    t0 = metrics.timer()
+    if engine is None: engine = DEFAULT_ENGINE
+    if loop2 is not None: loop2 = (loop2[_BAR_ABS], loop2[_ALTIMETER], loop2[_THSW])
+    out = engine.derive(ts, vals[_OUT_TEMP], vals[_OUT_HUM], vals[_IN_TEMP], vals[_IN_HUM],
+                        vals[_WIND_SPEED], vals[_WIND_AVG], vals[_SOLAR], vals[_BAROMETER], loop2)
+    metrics.DERIVE.observe(metrics.timer() - t0)
+    return out
+
+
+def decode_loop(frame, ts=None, offset=0, engine=None):
+    '''
+    Decodes a LOOP packet into a Loop_Record, including derived fields.
+    offset should be 1 when the frame still carries the leading ACK.
+    '''
+    vals = unpack_loop(frame, offset)
+    vals.extend(derive_loop(vals, ts, engine=engine))
+    vals.insert(0, ts)
+    return Loop_Record._make(vals)
+
+
+def unpack_loop2(frame, offset=0):
+    '''
+    Decodes a LOOP2 packet into a list of field values ordered as LOOP2_NAMES.
+    '''
+    return apply_plan(LOOP2_STRUCT.unpack_from(frame, offset), LOOP2_PLAN)
+
+
+def decode_loop2(frame, ts=None, offset=0):
+    '''
+    Decodes a LOOP2 packet into a Loop2_Record.
+    '''
+    vals = unpack_loop2(frame, offset)
+    vals.insert(0, ts)
+    return Loop2_Record._make(vals)
+
+
+def merge_loop(loop_frame, loop2_frame, ts=None, engine=None):
+    '''
+    Merges a LOOP and a LOOP2 packet (as sent by LPS 3 n) into one Wx_Record:
+    all LOOP fields, the LOOP2 only fields, then the derived fields.
+    '''
+    vals = unpack_loop(loop_frame)
+    loop2 = unpack_loop2(loop2_frame)
+    extra = derive_loop(vals, ts, loop2, engine)
+    vals.extend([loop2[i] for i in _LOOP2_EXTRA_IDX])
+    vals.extend(extra)
+    vals.insert(0, ts)
+    return Wx_Record._make(vals)
+
+
+#--Batch Decoding-------------------------------------------------------
+_NP_CODES = {'b': 'i1', 'B': 'u1', 'h': '<i2', 'H': '<u2', 'i': '<i4', 'I': '<u4'}
+
+def layout_dtype(layout, offset=0, itemsize=None):
+    '''
+    Builds a NumPy structured dtype matching a layout table, with the first
+    field starting at offset.  Pad entries are left out of the dtype.
+    '''
+    names, formats, offsets = [], [], []
+    pos = offset
+    for name, code, count, divisor in layout:
+        if name is not None:
+            names.append(name)
+            if count > 1: formats.append((_NP_CODES[code], (count,)))
+            else: formats.append(_NP_CODES[code])
+            offsets.append(pos)
+        pos += struct.calcsize('<' + code) * count
+    if itemsize is None: itemsize = pos
+    return numpy.dtype({'names': names, 'formats': formats,
+                        'offsets': offsets, 'itemsize': itemsize})
+
+
+def decode_batch(buf, layout, dtype, frame_size, offset=0, header=None, dashed=False):
+    '''
+    Decodes a contiguous buffer of N fixed size frames with one zero-copy
+    numpy.frombuffer view.  Returns (cols, valid) where cols maps field name
+    to a column array, scaled fields converted in bulk, and valid is a
+    boolean mask of frames passing the ACK/header and CRC checks.
+    With dashed, scalar readings holding a DASHED value become NaN (as
+    float columns).  Trailing bytes short of a full frame are ignored.
+    '''
+    n = len(buf) // frame_size
+    recs = numpy.frombuffer(buf, dtype=dtype, count=n)
+    rows = numpy.frombuffer(buf, dtype=numpy.uint8, count=n * frame_size).reshape(n, frame_size)
+
+    cols = {}
+    for name, code, count, divisor in layout:
+        if name is None: continue
+        if divisor: cols[name] = recs[name] / divisor
+        else: cols[name] = recs[name]
+        if dashed and count == 1 and name not in NOT_DASHED:
+            bad = numpy.in1d(recs[name], DASHED[code])
+            if bad.any():
+                cols[name] = cols[name].astype(numpy.float64)
+                cols[name][bad] = numpy.nan
+
+    valid = crc16_batch(rows[:, offset:frame_size]) == 0
+    if offset: valid &= rows[:, 0] == ACK
+    if header:
+        for i, c in enumerate(bytearray(header)):
+            valid &= rows[:, offset + i] == c
+    return cols, valid
+
+LOOP_DTYPE      = layout_dtype(LOOP_LAYOUT)
+LOOP_ACK_DTYPE  = layout_dtype(LOOP_LAYOUT, offset=1)
+
+def decode_loop_batch(buf, ack=False):
+    '''
+    Decodes back to back LOOP packets (LOOP_SIZE bytes each, or
+    LOOP_SIZE + 1 when every frame carries a leading ACK).
+    '''
+    if ack:
+        return decode_batch(buf, LOOP_LAYOUT, LOOP_ACK_DTYPE, LOOP_SIZE + 1, 1, 'LOO', True)
+    return decode_batch(buf, LOOP_LAYOUT, LOOP_DTYPE, LOOP_SIZE, 0, 'LOO', True)
+
+
+def derive_loop_batch(cols):
+    '''
+    Adds the stateless DERIVED_FIELDS columns (dew points, wind chill,
+    heat index) to the output of decode_loop_batch.
+    '''
+    t_out = cols['outside_temp']
+    h_out = cols['outside_hum']
+    with numpy.errstate(invalid='ignore'): #dashed (NaN) rows stay NaN
+        cols['dew_point_out'] = derived.dewpoint_batch(t_out, h_out)
+        cols['dew_point_in']  = derived.dewpoint_batch(cols['inside_temp'], cols['inside_hum'])
+        cols['wind_chill']    = temp_array.calc_wind_chill(t_out, cols['wind_speed'], cols['wind_avg'])
+        cols['heat_index']    = temp_array.calc_heat_index(t_out, h_out)
+    return cols
+
+
+#--Archive Records (DMPAFT)---------------------------------------------
+# Rev B archive record, 52 bytes.  Pages are 267 bytes: sequence number,
+# 5 records, 4 unused bytes, CRC-16.
+ARCHIVE_LAYOUT = [
+    ('date_stamp',      'H', 1, None),      #day + month * 32 + (year - 2000) * 512
+    ('time_stamp',      'H', 1, None),      #hour * 100 + minute
+    ('outside_temp',    'h', 1, 10.0),      #deg F
+    ('high_out_temp',   'h', 1, 10.0),      #deg F
+    ('low_out_temp',    'h', 1, 10.0),      #deg F
+    ('rain',            'H', 1, 100.0),     #inches
+    ('high_rain_rate',  'H', 1, 100.0),     #inches/hour
+    ('barometer',       'H', 1, 1000.0),    #In. Hg.
+    ('solar_rad',       'H', 1, None),      #watts/m^2
+    ('wind_samples',    'H', 1, None),
+    ('inside_temp',     'h', 1, 10.0),      #deg F
+    ('inside_hum',      'B', 1, None),      #% humidity
+    ('outside_hum',     'B', 1, None),      #% humidity
+    ('wind_avg',        'B', 1, None),      #mph
+    ('wind_high',       'B', 1, None),      #mph
+    ('wind_high_dir',   'B', 1, None),      #0-15 compass point, 255 = none
+    ('wind_dir',        'B', 1, None),      #0-15 prevailing compass point
+    ('uv_index',        'B', 1, 10.0),      #uv index
+    ('et',              'B', 1, 1000.0),    #inches
+    ('high_solar_rad',  'H', 1, None),      #watts/m^2
+    ('high_uv_index',   'B', 1, 10.0),      #uv index
+    ('forecast_rule',   'B', 1, None),
+    ('leaf_temps',      'B', 2, None),      #deg F + 90
+    ('leaf_wet',        'B', 2, None),      #0-15
+    ('soil_temps',      'B', 4, None),      #deg F + 90
+    ('record_type',     'B', 1, None),      #0x00 = Rev B
+    ('extra_hums',      'B', 2, None),      #% humidity
+    ('extra_temps',     'B', 3, None),      #deg F + 90
+    ('soil_moist',      'B', 4, None),      #centibar
+]
+
+ARCHIVE_DTYPE   = layout_dtype(ARCHIVE_LAYOUT)
+ARCHIVE_SIZE    = ARCHIVE_DTYPE.itemsize #52
+PAGE_RECORDS    = 5
+PAGE_SIZE       = 1 + PAGE_RECORDS * ARCHIVE_SIZE + 4 + 2 #267
+ARCHIVE_EMPTY   = 0xFFFF #date_stamp of a never written record
+
+
+def archive_stamp(date_stamp, time_stamp):
+    '''
+    Combines the date/time stamps into one monotonic integer, scalar or array.
+    '''
+    return (date_stamp * 10000) + time_stamp
+
+
+def stamp_from_datetime(dt):
+    '''
+    Console (date_stamp, time_stamp) for a datetime, as DMPAFT expects.
+    '''
+    return (dt.day + dt.month * 32 + (dt.year - 2000) * 512,
+            dt.hour * 100 + dt.minute)
+
+
+def archive_times(date_stamp, time_stamp):
+    '''
+    Vectorised conversion of archive date/time stamps to datetime64[m].
+    Archive times are console local time.
+    '''
+    date_stamp = date_stamp.astype(numpy.int64)
+    time_stamp = time_stamp.astype(numpy.int64)
+    months = ((date_stamp >> 9) + 30) * 12 + ((date_stamp >> 5) & 0xF) - 1
+    days = months.astype('M8[M]').astype('M8[D]') + ((date_stamp & 0x1F) - 1).astype('m8[D]')
+    return days.astype('M8[m]') + ((time_stamp // 100) * 60 + time_stamp % 100).astype('m8[m]')
+
+
+def archive_epoch(times):
+    '''
+    Epoch seconds of archive_times() values.  The console clock is taken
+    to be in the daemon host's local time zone.
+    '''
+    return numpy.array([time.mktime(t.timetuple()) for t in times.astype(object)], dtype=numpy.float64)
+
+
+def decode_archive_pages(buf, first=0, since=0):
+    '''
+    Decodes a buffer of back to back DMPAFT pages in bulk.  Returns
+    (cols, valid) like decode_batch, with one entry per record slot and a
+    'ts' datetime64 column.  valid drops records from pages failing CRC,
+    the first `first` slots of the first page, empty slots and anything at
+    or before the `since` archive_stamp (old data past the newest record).
+    '''
+    n = len(buf) // PAGE_SIZE
+    rows = numpy.frombuffer(buf, dtype=numpy.uint8, count=n * PAGE_SIZE).reshape(n, PAGE_SIZE)
+    recs = numpy.ascontiguousarray(rows[:, 1:1 + PAGE_RECORDS * ARCHIVE_SIZE])
+    recs = recs.reshape(n * PAGE_RECORDS, ARCHIVE_SIZE).view(ARCHIVE_DTYPE).reshape(-1)
+
+    cols = {}
+    for name, code, count, divisor in ARCHIVE_LAYOUT:
+        if divisor: cols[name] = recs[name] / divisor
+        else: cols[name] = recs[name]
+
+    valid = numpy.repeat(crc16_batch(rows) == 0, PAGE_RECORDS)
+    valid[:first] = False
+    valid &= recs['date_stamp'] != ARCHIVE_EMPTY
+    valid &= archive_stamp(recs['date_stamp'].astype(numpy.int64), recs['time_stamp']) > since
+    cols['ts'] = archive_times(recs['date_stamp'], recs['time_stamp'])
+    return cols, valid
@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Observation Pipeline             #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Frame to observation path shared by    #
+#    the single and multi station threads   #
+#############################################
+
+from collections import namedtuple
+
+import packets
+import capture
+import ring_buffer
+import metrics
+
+#Tagged observation put on rx_q, seq counts observations per station and
+#is assigned before any queue, so a drop anywhere shows as a gap.  The
+#single station daemon tags its observations with station None.
+Station_Obs = namedtuple('Station_Obs', ('station', 'seq', 'obs'))
+
+
+class Obs_Pipeline(object):
+    '''
+    Per-frame handling common to Ethernet_VantagePro2 and Station_Session.
+    The station provides loop2, last_loop, capture, derived, alarms,
+    history, rollups, trackers, adaptive and _apply_rate().  _observe()
+    captures the raw frame, pairs LPS LOOP/LOOP2 frames, decodes, then
+    runs alarms, history, rollups, trackers and the rate policy; queueing
+    the observation is left to the caller.
+    '''
+    __slots__ = ()
+
+    def _observe(self, frame, ts):
+        #Returns the observation, None while an LPS LOOP waits for its LOOP2
+        if self.capture: self.capture.write(capture.FRAME, ring_buffer.epoch(ts), frame)
+        t0 = metrics.timer()
+        if frame[4] == packets.LOOP2_TYPE:
+            if self.last_loop is None: return None
+            msg = packets.merge_loop(self.last_loop, frame, ts, self.derived)
+            self.last_loop = None
+        elif self.loop2:
+            self.last_loop = frame
+            return None
+        else:
+            msg = packets.decode_loop(frame, ts, 0, self.derived)
+        metrics.PARSE.observe(metrics.timer() - t0)
+        metrics.OBSERVATIONS.inc()
+        if self.alarms: self.alarms.evaluate(msg) #before anything can queue
+        self.history.append(msg)
+        self.rollups.update(msg)
+        self.trackers.update(msg)
+        if self.adaptive and self.adaptive.update(msg): self._apply_rate()
+        return msg
+
+    def _loop_str(self, n):
+        #LPS 3 n for merged LOOP/LOOP2, n counts packets of either type
+        if self.loop2: return 'LPS 3 {:d}\r\n'.format(n)
+        return 'LOOP {:d}\r\n'.format(n)
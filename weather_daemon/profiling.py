@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+#############################################
+#   Title: On Demand Profiling              #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Thread stack sampler, collapsed stacks #
+#   -cProfile across daemon threads, pstats #
+#   -Started/stopped from the service port  #
+#############################################
+
+import os
+import sys
+import time
+import thread
+import pstats
+import cProfile
+import logging
+import datetime
+import threading
+from collections import OrderedDict
+
+SAMPLE, CPROFILE = 'sample', 'cprofile'
+MODES       = (SAMPLE, CPROFILE)
+EXTENSIONS  = {SAMPLE:'collapsed', CPROFILE:'pstats'}
+MAX_SECONDS = 600   #longest session
+SAMPLE_HZ   = 100   #default stack samples per second
+MAX_HZ      = 1000
+DETACH_WAIT = 10.0  #seconds cProfile sessions wait for threads to detach
+
+#cProfile can only be enabled from the thread being profiled.  While a
+#cProfile session runs, hook is its poll(); every daemon thread loop does
+#    if profiling.hook: profiling.hook()
+#to join and later leave the session.  None otherwise, so a daemon that
+#is not being profiled only pays for that test.
+hook = None
+
+
+class Profile_Session(object):
+    '''
+    One profiling run of up to seconds, written to path when it ends.
+    SAMPLE mode walks sys._current_frames() hz times a second from its
+    own thread and counts collapsed stacks (flamegraph.pl input), root
+    first and prefixed with the thread name.  CPROFILE mode runs one
+    cProfile.Profile per daemon thread, merged into a single pstats file.
+    wake, when given, is called once the session ends so a thread blocked
+    on its socket gets the loop pass that detaches it.
+    '''
+    def __init__(self, mode, seconds, path, hz=SAMPLE_HZ, wake=None):
+        self.mode       = mode
+        self.seconds    = seconds
+        self.hz         = hz
+        self.path       = path
+        self.wake       = wake
+        self.logger     = logging.getLogger('wxd')
+
+        self.state      = 'running'
+        self.started    = datetime.datetime.utcnow()
+        self.samples    = 0
+        self.stacks     = {} #collapsed stack -> samples
+        self.labels     = {} #code object -> 'func (file:line)'
+        self.profiles   = {} #thread ident -> (thread name, cProfile.Profile)
+        self.detached   = set()
+        self.finished   = False
+        self._stop      = threading.Event()
+        self.thread     = threading.Thread(target=self._run, name='Profile_Thread')
+        self.thread.daemon = True
+
+    def start(self):
+        global hook
+        if self.mode == CPROFILE: hook = self.poll
+        self.thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def poll(self):
+        #Runs in each daemon thread, through hook.  The hook stays set until
+        #every thread that joined has disabled its own profiler.
+        global hook
+        ident = thread.get_ident()
+        if not self.finished:
+            if ident not in self.profiles:
+                p = cProfile.Profile()
+                self.profiles[ident] = (threading.current_thread().name, p)
+                p.enable()
+        elif ident in self.profiles and ident not in self.detached:
+            self.profiles[ident][1].disable()
+            self.detached.add(ident)
+        if self.finished and len(self.detached) == len(self.profiles): hook = None
+
+    def _run(self):
+        try:
+            if self.mode == SAMPLE: self._sample_loop()
+            else: self._cprofile_wait()
+            self._write()
+        except Exception as e:
+            self.state = 'failed: {:s}'.format(str(e))
+            self.logger.warning('Profile {:s} failed: {:s}'.format(self.path, str(e)))
+        finally:
+            self._release()
+
+    def _sample_loop(self):
+        me = thread.get_ident()
+        period = 1.0 / self.hz
+        end = time.time() + self.seconds
+        next_at = time.time()
+        while not self._stop.isSet():
+            names = dict((t.ident, t.name) for t in threading.enumerate())
+            for ident, frame in sys._current_frames().items():
+                if ident != me: self._count(names.get(ident, str(ident)), frame)
+            self.samples += 1
+            next_at += period
+            now = time.time()
+            if now >= end: break
+            if next_at < now: next_at = now #fell behind, do not burst
+            self._stop.wait(next_at - now)
+
+    def _count(self, name, frame):
+        labels = self.labels
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            label = labels.get(code)
+            if label is None:
+                label = labels[code] = '{:s} ({:s}:{:d})'.format(
+                    code.co_name, os.path.basename(code.co_filename), code.co_firstlineno)
+            stack.append(label)
+            frame = frame.f_back
+        stack.append(name)
+        key = ';'.join(reversed(stack))
+        self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def _cprofile_wait(self):
+        self._stop.wait(self.seconds)
+        self.finished = True
+        if self.wake: self.wake()
+        #Give every joined thread a loop pass to disable its own profiler
+        end = time.time() + DETACH_WAIT
+        while len(self.detached) < len(self.profiles) and time.time() < end:
+            time.sleep(0.1)
+        if len(self.detached) < len(self.profiles):
+            idle = [n for i, (n, p) in self.profiles.items() if i not in self.detached]
+            self.logger.warning('Profile: {:s} not detached yet, stats may be partial'.format(', '.join(idle)))
+
+    def _write(self):
+        tmp = self.path + '.tmp'
+        if self.mode == SAMPLE:
+            with open(tmp, 'w') as f:
+                for stack, n in sorted(self.stacks.items()):
+                    f.write('{:s} {:d}\n'.format(stack, n))
+        else:
+            profiles = [p for n, p in self.profiles.values()]
+            if not profiles: raise ValueError('no thread joined the session')
+            pstats.Stats(*profiles).dump_stats(tmp)
+        os.rename(tmp, self.path)
+        self.state = 'written'
+        self.logger.info('Profile written: {:s}'.format(self.path))
+
+    def _release(self):
+        global hook
+        self.finished = True
+        if hook == self.poll and len(self.detached) == len(self.profiles): hook = None
+
+    def active(self):
+        #Sampling, or profilers still enabled in some thread
+        return self.thread.is_alive() or hook == self.poll
+
+    def info(self):
+        resp = OrderedDict([('mode', self.mode), ('state', self.state),
+                            ('seconds', self.seconds), ('path', self.path),
+                            ('started', self.started.isoformat())])
+        if self.mode == SAMPLE: resp['samples'] = self.samples
+        else: resp['threads'] = sorted(n for n, p in self.profiles.values())
+        return resp
+
+
+class Profiler(object):
+    '''
+    Owns the profiling session started through the service socket, at
+    most one at a time.  Output files go to log_path as
+    wxd_profile_<utc>_<mode>.<collapsed|pstats>.
+    '''
+    def __init__(self, log_path, wake=None):
+        self.log_path   = log_path
+        self.wake       = wake
+        self.session    = None
+        self.logger     = logging.getLogger('wxd')
+
+    def start(self, mode=SAMPLE, seconds=30, hz=SAMPLE_HZ):
+        #Raises ValueError on bad parameters or a session still running
+        if mode not in MODES:
+            raise ValueError('mode must be one of {:s}'.format(', '.join(MODES)))
+        seconds, hz = float(seconds), int(hz)
+        if not 0 < seconds <= MAX_SECONDS:
+            raise ValueError('seconds must be in (0, {:d}]'.format(MAX_SECONDS))
+        if not 0 < hz <= MAX_HZ:
+            raise ValueError('hz must be in (0, {:d}]'.format(MAX_HZ))
+        if self.running():
+            raise ValueError('a {:s} session is already running'.format(self.session.mode))
+        stamp = datetime.datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+        path = os.path.join(self.log_path, 'wxd_profile_{:s}_{:s}.{:s}'.format(stamp, mode, EXTENSIONS[mode]))
+        self.session = Profile_Session(mode, seconds, path, hz, self.wake)
+        self.session.start()
+        self.logger.info('Profile {:s} started for {:g} s: {:s}'.format(mode, seconds, path))
+        return self.session.info()
+
+    def stop(self):
+        if not self.running(): return None
+        self.session.stop()
+        return self.session.info()
+
+    def running(self):
+        return self.session is not None and self.session.active()
+
+    def info(self):
+        if self.session is None: return None
+        return self.session.info()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Capture Replay                   #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Replays a raw frame capture through    #
+#    the parse/derive/store/publish path    #
+#   -Real time, xN or as fast as possible   #
+#############################################
+
+import sys
+import time
+import struct
+import datetime
+
+import packets
+import archive
+import capture
+import davis
+import profiling
+from select_queue import BLOCK
+
+
+class Replay_Thread(davis.Ethernet_VantagePro2):
+    '''
+    Stands in for the weather thread and feeds a capture file through the
+    same frame handling as a live station: LPS pairing, decode, derived
+    fields, history and rollups, then rx_q for Main_Thread to store and
+    publish.  Observations keep their captured receive time.  speed is
+    the replay rate relative to real time, 0 replays as fast as possible.
+    '''
+    def __init__(self, args):
+        args.wx_archive = False #pages come from the capture
+        args.wx_capture = None
+        args.wx_adaptive = None #no station to poll faster
+        args.queue_policy = BLOCK #pace to the consumer, a replay never drops
+        davis.Ethernet_VantagePro2.__init__(self, args)
+        self.name       = 'Replay_Thread'
+        self.path       = args.replay
+        self.speed      = args.replay_speed
+        self.frames     = 0
+        self.archive_first = 0
+        self.archive_buf = bytearray()
+        self.loop2      = self._has_loop2() #pair LOOP/LOOP2 as LPS did live
+
+    def _has_loop2(self):
+        #LPS captures alternate LOOP and LOOP2, the first few frames tell
+        frames = 0
+        for t, kind, payload in capture.read_capture(self.path):
+            if kind != capture.FRAME: continue
+            if payload[4] == packets.LOOP2_TYPE: return True
+            frames += 1
+            if frames == 4: break
+        return False
+
+    def run(self):
+        print "{:s} Started...".format(self.name)
+        self.logger.info('Replaying {:s} at {:s}'.format(self.path,
+            'full speed' if not self.speed else 'x{:g}'.format(self.speed)))
+        start = time.time()
+        t0 = None
+        for t, kind, payload in capture.read_capture(self.path):
+            if self._stop.isSet(): break
+            if profiling.hook: profiling.hook()
+            if t0 is None: t0 = t
+            if self.speed:
+                delay = start + (t - t0) / self.speed - time.time()
+                if delay > 0: self._stop.wait(delay)
+            if kind == capture.FRAME:
+                self._archive_flush() #backfill is stored before newer frames
+                self.frames += 1
+                self._handle_frame(payload, datetime.datetime.utcfromtimestamp(t))
+                for msg in self.loop_q.get_all(): self.rx_q.put(msg)
+            elif kind == capture.ARCHIVE_HDR:
+                self._archive_flush()
+                pages, self.archive_first = struct.unpack('<HH', payload)
+            elif kind == capture.ARCHIVE_PAGE:
+                self.archive_buf.extend(payload)
+                if len(self.archive_buf) >= archive.PAGES_PER_BATCH * packets.PAGE_SIZE:
+                    self._archive_flush()
+        self._archive_flush()
+        elapsed = time.time() - start
+        self.logger.info('Replay complete: {:d} frames in {:.1f}s'.format(self.frames, elapsed))
+        print 'Replay complete: {:d} frames in {:.1f}s'.format(self.frames, elapsed)
+        sys.exit()
+
+    def _archive_flush(self):
+        if not self.archive_buf: return
+        cols, valid = packets.decode_archive_pages(bytes(self.archive_buf), self.archive_first)
+        if valid.any():
+            self._archive_handler(cols, valid, None) #no checkpoint to advance
+            self._archive_wait()
+        self.archive_first = 0
+        self.archive_buf = bytearray()
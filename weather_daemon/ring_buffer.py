@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Observation Ring Buffer          #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Preallocated columns of recent obs     #
+#   -O(1) append, O(log n) window lookup    #
+#############################################
+
+import calendar
+import threading
+import numpy
+
+import packets
+
+#Every scalar LOOP/LOOP2 field plus the derived fields
+DEFAULT_FIELDS = tuple([name for name, code, count, divisor in packets.LOOP_LAYOUT
+                        if name is not None and count == 1] +
+                       [name for name in packets.LOOP2_EXTRA] +
+                       list(packets.DERIVED_FIELDS))
+
+
+def epoch(ts):
+    #naive UTC datetime -> float seconds
+    return calendar.timegm(ts.utctimetuple()) + ts.microsecond * 1e-6
+
+
+class Obs_Ring_Buffer(object):
+    '''
+    Fixed capacity history of observations stored as columns.  Timestamps
+    are float64 epoch seconds, values float32 with NaN for fields a record
+    does not carry (e.g. LOOP2 fields when only LOOP is polled) and for
+    dashed readings; stats() skip them.  Slots are
+    written in time order, so the buffer holds at most two sorted runs and
+    a time window maps to at most two slices found by binary search.
+    Window statistics reduce over views of those slices, nothing is copied.
+    Appends and queries take a lock; they may come from different threads.
+    '''
+    def __init__(self, capacity, fields=DEFAULT_FIELDS):
+        self.capacity = capacity
+        self.fields   = tuple(fields)
+        self.index    = dict((name, i) for i, name in enumerate(self.fields))
+        self.ts       = numpy.zeros(capacity, dtype=numpy.float64)
+        self.data     = numpy.full((capacity, len(self.fields)), numpy.nan, dtype=numpy.float32)
+        self.head     = 0 #next slot to write
+        self.count    = 0
+        self.lock     = threading.Lock()
+        self._plans   = {} #record type -> (column indices, record indices)
+
+    def __len__(self):
+        return self.count
+
+    def _plan(self, rec_type):
+        cols, idx = [], []
+        for i, name in enumerate(rec_type._fields):
+            if name in self.index:
+                cols.append(self.index[name])
+                idx.append(i)
+        plan = (numpy.array(cols, dtype=numpy.intp), tuple(idx))
+        self._plans[rec_type] = plan
+        return plan
+
+    def append(self, obs):
+        plan = self._plans.get(type(obs))
+        if plan is None: plan = self._plan(type(obs))
+        cols, idx = plan
+        row = numpy.full(len(self.fields), numpy.nan, dtype=numpy.float32)
+        row[cols] = [obs[i] for i in idx]
+        t = epoch(obs.ts)
+        with self.lock:
+            self.ts[self.head] = t
+            self.data[self.head] = row
+            self.head = (self.head + 1) % self.capacity
+            if self.count < self.capacity: self.count += 1
+
+    def _slices(self, t0, t1):
+        #Physical [start, stop) slices holding t0 <= ts <= t1, oldest first
+        if self.count < self.capacity:
+            runs = [(0, self.count)]
+        else:
+            runs = [(self.head, self.capacity), (0, self.head)]
+        out = []
+        for start, stop in runs:
+            if start == stop: continue
+            seg = self.ts[start:stop]
+            a = start + numpy.searchsorted(seg, t0, 'left')
+            b = start + numpy.searchsorted(seg, t1, 'right')
+            if b > a: out.append((a, b))
+        return out
+
+    def latest_ts(self):
+        with self.lock:
+            if not self.count: return None
+            return self.ts[self.head - 1]
+
+    def stats(self, field, t0, t1=None):
+        '''
+        min/max/mean/count of field over t0 <= ts <= t1 (t1 default newest).
+        '''
+        c = self.index[field]
+        if t1 is None: t1 = numpy.inf
+        mn, mx, total, n = numpy.inf, -numpy.inf, 0.0, 0
+        with self.lock:
+            for a, b in self._slices(t0, t1):
+                col = self.data[a:b, c]
+                good = ~numpy.isnan(col)
+                k = int(good.sum())
+                if not k: continue
+                mn = min(mn, float(numpy.nanmin(col)))
+                mx = max(mx, float(numpy.nanmax(col)))
+                total += float(numpy.nansum(col, dtype=numpy.float64))
+                n += k
+        if not n: return {'min':None, 'max':None, 'mean':None, 'count':0}
+        return {'min':mn, 'max':mx, 'mean':total / n, 'count':n}
+
+    def last(self, field, seconds):
+        #stats over the newest `seconds` of history
+        t1 = self.latest_ts()
+        if t1 is None: return {'min':None, 'max':None, 'mean':None, 'count':0}
+        return self.stats(field, t1 - seconds, t1)
+
+    def window(self, field, t0, t1=None):
+        '''
+        (ts, values) arrays for t0 <= ts <= t1, copied out of the buffer.
+        '''
+        c = self.index[field]
+        if t1 is None: t1 = numpy.inf
+        with self.lock:
+            sl = self._slices(t0, t1)
+            ts = [self.ts[a:b] for a, b in sl]
+            vals = [self.data[a:b, c] for a, b in sl]
+            if not sl: return numpy.zeros(0), numpy.zeros(0, dtype=numpy.float32)
+            return numpy.concatenate(ts), numpy.concatenate(vals)
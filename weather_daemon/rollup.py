@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Multi Resolution Rollups         #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Running min/max/mean per time bucket   #
+#   -Vector averaged wind, rain from the    #
+#    day_rain counter                       #
+#############################################
+
+import math
+import threading
+from collections import namedtuple, deque, OrderedDict
+import numpy
+
+import ring_buffer
+
+RESOLUTIONS = (60, 600, 3600, 86400) #1 min, 10 min, hourly, daily
+
+#Aggregates kept in memory per resolution: 1 day, 1 week, 1 year, 10 years
+SERIES_DEPTH = {60:1440, 600:1008, 3600:8784, 86400:3660}
+
+DEFAULT_FIELDS = ('outside_temp', 'inside_temp', 'outside_hum', 'inside_hum',
+                  'barometer', 'wind_speed', 'rain_rate', 'solar_rad',
+                  'uv_index', 'dew_point_out')
+
+#start is epoch seconds (UTC) of the bucket, stats maps field -> (min, max, mean)
+Rollup = namedtuple('Rollup', ('resolution', 'start', 'count', 'stats',
+                               'wind_dir', 'wind_vec_speed', 'rain'))
+
+
+class Accumulator(object):
+    '''
+    Running totals for one open bucket.  NaN (missing or dashed) values
+    are ignored per field, wind_n counts the samples in the wind vector.
+    '''
+    __slots__ = ('start', 'count', 'n', 'sums', 'mins', 'maxs', 'wind_n', 'wind_x', 'wind_y', 'rain')
+
+    def __init__(self, start, nfields):
+        self.start  = start
+        self.count  = 0
+        self.n      = numpy.zeros(nfields, dtype=numpy.int64)
+        self.sums   = numpy.zeros(nfields)
+        self.mins   = numpy.full(nfields, numpy.nan)
+        self.maxs   = numpy.full(nfields, numpy.nan)
+        self.wind_n = 0
+        self.wind_x = 0.0
+        self.wind_y = 0.0
+        self.rain   = 0.0
+
+    def add(self, vals, good, wx, wy, rain):
+        self.count += 1
+        self.n += good
+        self.sums[good] += vals[good]
+        numpy.fmin(self.mins, vals, out=self.mins)
+        numpy.fmax(self.maxs, vals, out=self.maxs)
+        if wx is not None:
+            self.wind_n += 1
+            self.wind_x += wx
+            self.wind_y += wy
+        self.rain += rain
+
+
+class Rollup_Engine(object):
+    '''
+    Incremental rollups at several resolutions.  update() folds each
+    observation into the open bucket of every resolution; when an
+    observation lands past a bucket's end the finished Rollup is appended
+    to that resolution's series and passed to every handler.
+
+    Wind direction is the vector mean of speed weighted unit vectors, so
+    350 and 10 degrees average to north.  Rain is the sum of day_rain
+    increments; a counter that goes backwards (console midnight reset)
+    counts its new value as the increment.  Dashed wind speed or
+    direction leaves the sample out of the wind vector, a dashed day_rain
+    adds no rain and the next valid reading is measured from the last
+    valid one.  A bucket without wind samples has None wind_dir and
+    wind_vec_speed.
+    '''
+    def __init__(self, fields=DEFAULT_FIELDS, resolutions=RESOLUTIONS):
+        self.fields      = tuple(fields)
+        self.resolutions = tuple(resolutions)
+        self.handlers    = []
+        self.open        = dict((res, None) for res in self.resolutions)
+        self.series      = dict((res, deque(maxlen=SERIES_DEPTH.get(res, 1000))) for res in self.resolutions)
+        self.lock        = threading.Lock()
+        self.last_rain   = None
+        self._plans      = {}
+
+    def _plan(self, rec_type):
+        idx = [rec_type._fields.index(f) if f in rec_type._fields else None for f in self.fields]
+        plan = (idx, rec_type._fields.index('wind_speed'), rec_type._fields.index('wind_dir'),
+                rec_type._fields.index('day_rain'))
+        self._plans[rec_type] = plan
+        return plan
+
+    def update(self, obs):
+        plan = self._plans.get(type(obs))
+        if plan is None: plan = self._plan(type(obs))
+        idx, i_speed, i_dir, i_rain = plan
+
+        t = ring_buffer.epoch(obs.ts)
+        vals = numpy.array([numpy.nan if i is None else obs[i] for i in idx], dtype=numpy.float64)
+        good = ~numpy.isnan(vals)
+
+        speed, direction = obs[i_speed], obs[i_dir]
+        if speed == speed and direction == direction:
+            rad = math.radians(direction)
+            wx, wy = speed * math.sin(rad), speed * math.cos(rad)
+        else:
+            wx = wy = None #dashed anemometer or vane
+
+        day_rain = obs[i_rain]
+        rain = 0.0
+        if day_rain == day_rain:
+            if self.last_rain is not None:
+                if day_rain >= self.last_rain: rain = day_rain - self.last_rain
+                else: rain = day_rain #counter reset at midnight
+            self.last_rain = day_rain
+
+        for res in self.resolutions:
+            start = t - (t % res)
+            acc = self.open[res]
+            if acc is None or acc.start != start:
+                if acc is not None and start > acc.start: self._close(res, acc)
+                acc = Accumulator(start, len(self.fields))
+                self.open[res] = acc
+            acc.add(vals, good, wx, wy, rain)
+
+    def _close(self, res, acc):
+        stats = OrderedDict()
+        for i, field in enumerate(self.fields):
+            if acc.n[i]:
+                stats[field] = (float(acc.mins[i]), float(acc.maxs[i]), float(acc.sums[i] / acc.n[i]))
+            else:
+                stats[field] = (None, None, None)
+        if acc.wind_n:
+            wind_dir = math.degrees(math.atan2(acc.wind_x, acc.wind_y)) % 360.0
+            wind_vec = math.hypot(acc.wind_x, acc.wind_y) / acc.wind_n
+        else:
+            wind_dir = wind_vec = None
+        rollup = Rollup(res, acc.start, acc.count, stats, wind_dir, wind_vec, round(acc.rain, 2))
+        with self.lock:
+            self.series[res].append(rollup)
+        for handler in self.handlers:
+            handler(rollup)
+
+    def last(self, res, n=1):
+        #newest n closed rollups at resolution res, oldest first
+        with self.lock:
+            series = list(self.series[res])
+        return series[-n:]
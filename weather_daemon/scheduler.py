@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Periodic Task Scheduler          #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -One thread runs every periodic task    #
+#   -Absolute monotonic deadlines, no drift #
+#############################################
+
+import sys
+import time
+import math
+import heapq
+import select
+import logging
+import threading
+import itertools
+
+from select_queue import Select_Queue
+import profiling
+
+try:
+    monotonic = time.monotonic
+except AttributeError:
+    #Python 2: CLOCK_MONOTONIC through ctypes
+    import os
+    import ctypes
+    import ctypes.util
+
+    class _timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    _libc = ctypes.CDLL(ctypes.util.find_library('rt') or ctypes.util.find_library('c'), use_errno=True)
+    _clock_gettime = _libc.clock_gettime
+    _clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(_timespec)]
+    CLOCK_MONOTONIC = 1
+
+    def monotonic():
+        t = _timespec()
+        if _clock_gettime(CLOCK_MONOTONIC, ctypes.byref(t)) != 0:
+            errno_ = ctypes.get_errno()
+            raise OSError(errno_, os.strerror(errno_))
+        return t.tv_sec + t.tv_nsec * 1e-9
+
+
+CATCH_UP = 'catch_up' #run every missed period back to back
+SKIP     = 'skip'     #drop missed periods, stay on the original grid
+
+MAX_CATCH_UP = 10 #CATCH_UP falls back to SKIP when further behind than this
+
+class Periodic_Task(object):
+    '''
+    One periodic job.  Deadlines are start + k * period on the monotonic
+    clock, so handler run time never shifts later runs.  Lateness (start
+    time minus deadline) is tracked as the jitter statistic.
+    '''
+    def __init__(self, name, period, handler, policy=SKIP):
+        self.name       = name
+        self.period     = float(period)
+        self.handler    = handler
+        self.policy     = policy
+        self.deadline   = None
+        self.cancelled  = False
+
+        self.runs       = 0
+        self.overruns   = 0 #handler finished after the next deadline
+        self.skipped    = 0 #periods dropped under the SKIP policy
+        self.errors     = 0
+        self.late_last  = 0.0
+        self.late_max   = 0.0
+        self._late_sum  = 0.0
+        self._late_sq   = 0.0
+
+    def _record(self, late):
+        self.runs += 1
+        self.late_last = late
+        if late > self.late_max: self.late_max = late
+        self._late_sum += late
+        self._late_sq  += late * late
+
+    def stats(self):
+        mean = std = 0.0
+        if self.runs:
+            mean = self._late_sum / self.runs
+            std  = math.sqrt(max(0.0, self._late_sq / self.runs - mean * mean))
+        return {'name':self.name, 'period':self.period, 'policy':self.policy,
+                'runs':self.runs, 'overruns':self.overruns, 'skipped':self.skipped,
+                'errors':self.errors, 'jitter_last':self.late_last,
+                'jitter_mean':mean, 'jitter_std':std, 'jitter_max':self.late_max}
+
+
+class Scheduler(threading.Thread):
+    '''
+    Single thread running all Periodic_Tasks from a heap of deadlines.
+    The thread sleeps in select() until the earliest deadline or until
+    add/cancel/set_period/stop is called from another thread; heap changes
+    are queued as commands and applied in the scheduler thread.
+    Handlers run in this thread and should hand real work off quickly.
+    '''
+    def __init__ (self):
+        threading.Thread.__init__(self, name = 'Scheduler')
+        self._stop  = threading.Event()
+        self.logger = logging.getLogger('wxd')
+        self.tasks  = []
+        self._heap  = []
+        self._seq   = itertools.count()
+        self._cmd_q = Select_Queue()
+
+    def add(self, name, period, handler, policy=SKIP, delay=None):
+        '''
+        Schedules handler every period seconds, first run after delay
+        (default one period).  Returns the Periodic_Task.
+        '''
+        task = Periodic_Task(name, period, handler, policy)
+        if delay is None: delay = task.period
+        start = monotonic() + delay
+        def _add():
+            if task.cancelled: return
+            task.deadline = start
+            self.tasks.append(task)
+            heapq.heappush(self._heap, (start, next(self._seq), task))
+        self._cmd_q.put(_add)
+        return task
+
+    def cancel(self, task):
+        def _cancel():
+            task.cancelled = True
+            if task in self.tasks: self.tasks.remove(task)
+        self._cmd_q.put(_cancel)
+
+    def set_period(self, task, period):
+        '''
+        Changes a task's period; the next run is one new period after the
+        last run's deadline, or immediately if that is already past.
+        '''
+        def _set():
+            if task.cancelled or task.deadline is None: return
+            last = task.deadline - task.period
+            task.period = float(period)
+            self._heap = [e for e in self._heap if e[2] is not task]
+            heapq.heapify(self._heap)
+            task.deadline = max(last + task.period, monotonic())
+            heapq.heappush(self._heap, (task.deadline, next(self._seq), task))
+        self._cmd_q.put(_set)
+
+    def stats(self):
+        return [task.stats() for task in list(self.tasks)]
+
+    def run(self):
+        self.logger.info('Launched {:s}'.format(self.name))
+        while (not self._stop.isSet()):
+            if profiling.hook: profiling.hook()
+            #Run everything due as of now, later arrivals wait for the
+            #next pass so commands and stop() are never starved
+            timeout = None
+            now = monotonic()
+            while self._heap:
+                deadline, seq, task = self._heap[0]
+                if task.cancelled:
+                    heapq.heappop(self._heap)
+                    continue
+                if deadline > now:
+                    timeout = max(0, deadline - monotonic())
+                    break
+                heapq.heappop(self._heap)
+                self._run_task(task, deadline, monotonic())
+            select.select([self._cmd_q], [], [], timeout)
+            for cmd in self._cmd_q.get_all(): self._run_cmd(cmd)
+        self.logger.warning('{:s} Terminated'.format(self.name))
+
+    def _run_cmd(self, cmd):
+        #A failed add/cancel/set_period must not take every task down with it
+        try:
+            cmd()
+        except Exception as e:
+            self.logger.warning('{:s} command {:s} failed: {:s}'.format(self.name, cmd.__name__, str(e)))
+
+    def _run_task(self, task, deadline, start):
+        task._record(start - deadline)
+        try:
+            task.handler()
+        except Exception as e:
+            task.errors += 1
+            self.logger.warning('{:s} task {:s} failed: {:s}'.format(self.name, task.name, str(e)))
+        end = monotonic()
+        nxt = deadline + task.period
+        if end > nxt:
+            task.overruns += 1
+            if task.policy == SKIP or end - nxt > MAX_CATCH_UP * task.period:
+                k = int((end - deadline) // task.period) + 1
+                task.skipped += k - 1
+                nxt = deadline + k * task.period
+        task.deadline = nxt
+        heapq.heappush(self._heap, (nxt, next(self._seq), task))
+
+    def stop(self):
+        self.logger.info('{:s} Terminating...'.format(self.name))
+        self._stop.set()
+        self._cmd_q.wake()
+
+    def stopped(self):
+        return self._stop.isSet()
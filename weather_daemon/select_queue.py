@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Selectable Queue                 #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Queue.Queue with a pipe fileno() so    #
+#    threads can select() on queues and     #
+#    sockets together, no sleep polling     #
+#   -Bounded with an overflow policy, depth #
+#    high-water mark and drop counters      #
+#############################################
+
+import os
+import time
+import fcntl
+import errno
+
+from Queue import Queue, Empty
+
+#Overflow policies of a bounded Select_Queue, what put() does when full
+DROP_OLDEST = 'drop_oldest' #discard the oldest queued item
+KEEP_LATEST = 'keep_latest' #discard the whole backlog, keep only the new item
+BLOCK       = 'block'       #wait for the consumer, Queue.put() semantics
+
+class Select_Queue(Queue):
+    '''
+    Queue that becomes readable in select() when items are waiting.
+    A byte is written to the pipe only when a put finds the queue empty,
+    so consumers must drain with get_all(), which empties the pipe before
+    the queue.  Spurious wakeups are possible, missed ones are not.
+    With maxsize the queue never holds more than maxsize items; a put on
+    a full queue follows policy and every discarded item is counted.
+    dwell is an optional histogram (observe(seconds)) of the time each
+    item spent queued.
+    '''
+    def __init__(self, maxsize=0, policy=DROP_OLDEST, name=None, dwell=None):
+        Queue.__init__(self, maxsize)
+        self.name       = name
+        self.policy     = policy
+        self.dwell      = dwell
+        self.puts       = 0
+        self.dropped    = 0
+        self.high_water = 0 #deepest the queue has been
+        self._rfd, self._wfd = os.pipe()
+        for fd in (self._rfd, self._wfd):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+    def fileno(self):
+        return self._rfd
+
+    def put(self, item, block=True, timeout=None):
+        if self.policy == BLOCK or self.maxsize <= 0:
+            return Queue.put(self, item, block, timeout)
+        with self.mutex:
+            n = self._qsize()
+            if n >= self.maxsize:
+                if self.policy == KEEP_LATEST:
+                    self.queue.clear()
+                    self.dropped += n
+                else:
+                    self.queue.popleft()
+                    self.dropped += 1
+                self.unfinished_tasks -= n - self._qsize() #dropped items count as done
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _put(self, item):
+        #called with the queue mutex held
+        n = self._qsize()
+        if not n: self.wake()
+        if self.dwell: item = (time.time(), item)
+        Queue._put(self, item)
+        self.puts += 1
+        if n >= self.high_water: self.high_water = n + 1
+
+    def _get(self):
+        item = Queue._get(self)
+        if not self.dwell: return item
+        self.dwell.observe(time.time() - item[0])
+        return item[1]
+
+    def stats(self):
+        with self.mutex:
+            return {'name':self.name, 'depth':self._qsize(), 'maxsize':self.maxsize,
+                    'policy':self.policy, 'high_water':self.high_water,
+                    'puts':self.puts, 'dropped':self.dropped}
+
+    def wake(self):
+        #Make the queue readable without adding an item, e.g. on stop()
+        try:
+            os.write(self._wfd, 'x')
+        except OSError as e:
+            if e.errno != errno.EAGAIN: raise
+
+    def get_all(self):
+        #Returns every queued item without blocking
+        try:
+            while os.read(self._rfd, 4096): pass
+        except OSError as e:
+            if e.errno != errno.EAGAIN: raise
+        items = []
+        try:
+            while True: items.append(self.get_nowait())
+        except Empty:
+            pass
+        return items
@@ -12,23 +12,116 @@
 import threading
 import time
 import socket
+import select
 import errno
+import json
+from collections import OrderedDict
+import numpy
 
-from Queue import Queue
+from select_queue import Select_Queue, DROP_OLDEST
 from logger import *
+from ring_buffer import epoch
+import subscribe
+import metrics
+import profiling
+import wire
+import packets
+import store
+
+#Query protocol, one UDP datagram per request, JSON reply to the sender:
+#   latest                      -> every field of the newest observation
+#   wire                        -> the newest observation as a binary wire.py
+#                                  record instead of JSON
+#   get <field> [<field> ...]   -> named fields of the newest observation
+#   window <field> <seconds>    -> min/max/mean/count over the last N seconds
+#   history <field> <t0> [<t1>] -> min/max/mean/count between epoch seconds t0
+#                                  and t1 (default now) from the history store,
+#                                  store.FIELDS only, records written up to the
+#                                  last store flush
+#   rollup <resolution> [n]     -> newest n closed rollups, resolution in seconds
+#   peaks [<field>]             -> max/min (rise/fall) over the 3 s, 2 min and
+#                                  10 min windows, wind_speed max over 3 s is the gust
+#   stations                    -> per station health counters, multi-station mode
+#   subscribers                 -> push subscriptions and their counters
+#   alarms                      -> alarm rules and whether they are active
+#   rates                       -> adaptive poll rate mode and transitions
+#   queues                      -> depth, high-water mark and drops per pipeline queue
+#   scheduler                   -> runs, overruns, skipped periods and start time
+#                                  jitter (last/mean/std/max s) per periodic task
+#   profile [start [sample|cprofile] [seconds] [hz] | stop]
+#                               -> profile every daemon thread for N seconds (default
+#                                  sample, 30 s, 100 Hz), written to --log_path as
+#                                  collapsed stacks or pstats; no argument reports
+#                                  the current or last session.  Only accepted
+#                                  from a loopback peer, profiling slows the
+#                                  whole daemon
+#In multi-station mode any query may be prefixed with @<station>, without
+#a prefix it is answered from the first station in the list.
+#Anything else is queued on q for Main_Thread as before.
+#
+#Push subscriptions, every new observation is sent to the subscriber:
+#   subscribe [fields=<f1>,<f2>..|wire] [interval=<seconds>] [coalesce]
+#                               -> wire pushes binary wire.py records
+#   subscribe alarms            -> alarm/clear events as they happen, from
+#                                  every station unless @<station> is given
+#   unsubscribe
+#Over UDP the reply to subscribe carries the lease, renew by subscribing
+#again.  The same commands and queries are accepted over TCP on the same
+#port, one per line, with newline terminated JSON replies and pushes.
+#A TCP subscription lasts until the connection closes.  Over TCP a wire
+#record is not newline terminated, its bytes can include 0x0A: a reader
+#that sees 'WX' reads wire.HEADER_SIZE bytes and takes the record size
+#from the header instead of reading to the next newline.
+QUERIES     = ('latest', 'get', 'window', 'rollup', 'peaks', subscribe.WIRE)
+NO_DATA     = json.dumps({'error':'no observation yet'})
+MAX_CACHED  = 256 #distinct requests cached per observation
+CMD_Q_SIZE  = 64   #unrecognised commands waiting for Main_Thread
+PUB_Q_SIZE  = 1024 #observations/events waiting for the subscriber fan out
+
+
+def _loopback(addr):
+    #peer (host, port) on this machine
+    return addr[0].startswith('127.') or addr[0] == '::1'
+
+
+def _jsonable(value):
+    if hasattr(value, 'isoformat'): return value.isoformat()
+    if value != value: return None #dashed reading, NaN is not valid JSON
+    return value
+
 
 class Service_Thread(threading.Thread):
-    def __init__ (self, args):
+    def __init__ (self, args, history = None, rollups = None, trackers = None):
         threading.Thread.__init__(self, name = 'Service_Thread')
         self._stop  = threading.Event()
         self.args   = args
 
         self.ip     = args.ser_ip
         self.port   = args.ser_port
-        self.q      = Queue()
+        self.q      = Select_Queue(CMD_Q_SIZE, DROP_OLDEST, 'service_q')
+        self._wake_r, self._wake_w = os.pipe() #wakes the select() on stop()
 
         self.state  = 0x00
 
+        #station -> (Obs_Ring_Buffer, Rollup_Engine, Peak_Tracker) for window,
+        #rollup and peaks queries, the single station daemon uses the None key
+        self.stations = {None:(history, rollups, trackers)}
+        self.default  = None
+        self.health   = None #callable returning station health, multi-station mode
+        self._caches  = {None:(None, {}, 0)} #station -> (latest observation, request -> reply bytes, its seq)
+        self.station_ids = {None:0} #station -> wire record station id
+        self.wire     = wire.Wire_Encoder()
+
+        self.pub_q    = Select_Queue(PUB_Q_SIZE, DROP_OLDEST, 'pub_q') #(query, station, obs or event) to push to subscribers
+        self.alarm_engines = [] #Alarm_Engine per station, emit() calls alarm()
+        self.rate_policies = [] #Rate_Policy per station, --wx_adaptive
+        self.queues   = [self.q, self.pub_q] #Select_Queues reported by 'queues', Main_Thread adds its own
+        self.sched    = None #Scheduler reported by 'scheduler', set by Main_Thread
+        self.stores   = {} #station -> History_Store for 'history', set by Main_Thread
+        self.subs     = {} #('udp', addr) or ('tcp', fd) -> Subscriber
+        self.clients  = {} #TCP socket -> Subscriber, subscribed or not
+        self.profiler = profiling.Profiler(args.log_path, self._wake)
+
         self.logger = logging.getLogger('wxd')
         print "Initializing {}".format(self.name)
         self.logger.info("Initializing {}".format(self.name))
@@ -39,9 +132,13 @@ class Service_Thread(threading.Thread):
         try:
             self.rx_sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
             self.rx_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.rx_sock.settimeout(0.01) #
             self.rx_sock.setblocking(0)
             self.rx_sock.bind((self.ip, self.port))
+            self.tcp_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.tcp_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self.tcp_sock.setblocking(0)
+            self.tcp_sock.bind((self.ip, self.rx_sock.getsockname()[1]))
+            self.tcp_sock.listen(8)
             self.logger.info("Ready to receive Service data on: [{}:{}]".format(self.ip, self.port))
             print "Ready to receive Service data on: [{}:{}]".format(self.ip, self.port)
         except Exception as e:
@@ -51,11 +148,24 @@ class Service_Thread(threading.Thread):
             sys.exit()
 
         while (not self._stop.isSet()):
+            if profiling.hook: profiling.hook()
+            wlist = [c for c in self.clients if self.clients[c].pending()]
+            r, w, x = select.select([self.rx_sock, self.tcp_sock, self._wake_r, self.pub_q] + self.clients.keys(), wlist, [])
+            if self._wake_r in r: os.read(self._wake_r, 64)
+            if self.pub_q in r: self._fan_out()
+            for c in w:
+                if c in self.clients: self._tcp_flush(self.clients[c])
+            for c in r:
+                if c in self.clients: self._tcp_rx(self.clients[c])
+            if self.tcp_sock in r: self._tcp_accept()
+            if self.rx_sock not in r: continue
             try:
                 #data, addr = self.rx_sock.recvfrom(1024)
                 data, addr= self.rx_sock.recvfrom(1024)
                 data = data.strip('\n') 
-                if data:
+                if data and self._handle_query(data, addr):
+                    pass
+                elif data:
                     #print addr, data
                     print "\n[{:s}:{:d}]->[{:s}:{:d}] Received User Message: {:s}".format(addr[0], addr[1], self.ip, self.port, data)
                     self.logger.info("[{:s}:{:d}]->[{:s}:{:d}] Received User Message: {:s}".format(addr[0], addr[1], self.ip, self.port, data))
@@ -69,20 +179,274 @@ class Service_Thread(threading.Thread):
             except Exception as e:
                 print 'Some other Exception occurred:', e
                 self.logger.info(e)
-            
-            time.sleep(0.01) #Needed to throttle CPU
 
         self.rx_sock.close()
+        self.tcp_sock.close()
+        for c in self.clients.keys(): c.close()
         self.logger.warning('{:s} Terminated'.format(self.name))
         sys.exit()
 
     def _send_resp(self, msg):
         print "{:s} | Sending Response: {:s}".format(self.name, str(msg))
 
+    def add_station(self, name, history, rollups, trackers = None):
+        #Call before start(), the first station added answers unprefixed queries
+        if self.default is None:
+            del self.stations[None], self._caches[None], self.station_ids[None]
+            self.default = name
+        self.stations[name] = (history, rollups, trackers)
+        self._caches[name] = (None, {}, 0)
+        self.station_ids[name] = len(self.stations)
+
+    def publish(self, obs, station, seq):
+        '''
+        New observation from the weather thread.  Replies are cached per
+        observation, swapping the tuple drops every cached reply at once.
+        seq is the station's observation count from the weather thread.
+        '''
+        self._caches[station] = (obs, {}, seq)
+        if self.subs: self.pub_q.put((None, station, obs, seq))
+
+    def alarm(self, event):
+        '''
+        Alarm/clear event, called from the weather thread as soon as the
+        observation that caused it is decoded.
+        '''
+        if self.subs: self.pub_q.put((subscribe.ALARMS, event['station'], json.dumps(event), None))
+
+    def _handle_query(self, data, addr):
+        #Returns False when data is not a query
+        t0 = metrics.timer()
+        key = ('udp', addr)
+        reply = self._command(data, key, self.subs.get(key))
+        if reply is None: return False
+        self.rx_sock.sendto(reply, addr)
+        metrics.REPLY.observe(metrics.timer() - t0)
+        return True
+
+    def _command(self, data, key, sub):
+        #Reply to a query or (un)subscribe, None when data is neither
+        words = data.split()
+        if not words: return None
+        station = self.default
+        explicit = words[0].startswith('@') and len(words) > 1
+        if explicit: station = words.pop(0)[1:]
+        cmd = words[0].lower()
+        if cmd == 'stations' and self.health is not None:
+            return json.dumps(self.health())
+        if cmd == 'subscribers':
+            return json.dumps([s.info() for s in self.subs.values()])
+        if cmd == 'alarms':
+            return json.dumps([s for e in self.alarm_engines for s in e.states()])
+        if cmd == 'queues':
+            return json.dumps([q.stats() for q in self.queues])
+        if cmd == 'rates':
+            return json.dumps([p.state() for p in self.rate_policies])
+        if cmd == 'scheduler' and self.sched is not None:
+            return json.dumps(self.sched.stats())
+        if cmd == 'profile':
+            if not _loopback(key[1] if key[0] == 'udp' else sub.addr):
+                return json.dumps({'error':'profile is only accepted from the daemon host'})
+            return json.dumps(self._profile(words[1:]))
+        if cmd not in QUERIES + ('history', 'subscribe', 'unsubscribe'): return None
+        if station not in self._caches:
+            return json.dumps({'error':'unknown station: {:s}'.format(station)})
+        if cmd == 'history':
+            return json.dumps(self._history(station, words[1:]))
+        if cmd == 'unsubscribe':
+            return json.dumps({'unsubscribed':self.subs.pop(key, None) is not None})
+        if cmd == 'subscribe':
+            try:
+                alarms, fields, interval, coalesce, binary = subscribe.parse_subscribe(words[1:])
+            except ValueError:
+                return json.dumps({'error':'usage: subscribe [alarms] [fields=<f1>,<f2>..|wire] [interval=<seconds>] [coalesce]'})
+            if alarms and not explicit: station = subscribe.ALL
+            #the newest observation's record type, the widest one before any
+            newest = self._caches[station][0] if station in self._caches else None
+            known = newest._fields if newest is not None else packets.Wx_Record._fields
+            unknown = [f for f in fields or () if f not in known]
+            if unknown:
+                return json.dumps({'error':'unknown field: {:s}'.format(','.join(unknown))})
+            if sub is None: sub = subscribe.Subscriber(self.rx_sock, key[1], udp=True)
+            sub.subscribe(station, fields, interval, coalesce, alarms, binary)
+            self.subs[key] = sub
+            resp = OrderedDict([('subscribed', sub.query), ('station', station), ('interval', interval)])
+            if binary: resp['station_id'] = self.station_ids[station]
+            if sub.udp: resp['lease'] = subscribe.SUB_LEASE
+            return json.dumps(resp)
+        return self._reply(station, ' '.join(words), cmd, words[1:])
+
+    def _history(self, station, params):
+        #Not cached per observation, the store changes on its own flushes
+        try:
+            field, t0 = params[0], float(params[1])
+            t1 = float(params[2]) if len(params) > 2 else time.time()
+        except (IndexError, ValueError):
+            return {'error':'usage: history <field> <t0> [<t1>]'}
+        s = self.stores.get(station)
+        if s is None or field not in store.FIELDS:
+            return {'error':'unknown field: {:s}'.format(field)}
+        ts, vals = s.query_field(field, t0, t1)
+        vals = vals[~numpy.isnan(vals)]
+        resp = {'min':None, 'max':None, 'mean':None, 'count':len(vals)}
+        if len(vals):
+            resp.update(min=float(vals.min()), max=float(vals.max()), mean=float(vals.mean()))
+        resp['field'] = field
+        resp['t0'] = t0
+        resp['t1'] = t1
+        return resp
+
+    def _profile(self, params):
+        if not params:
+            return self.profiler.info() or {'state':'idle'}
+        if params[0] == 'stop':
+            return self.profiler.stop() or {'error':'no profile running'}
+        if params[0] != 'start' or len(params) > 4:
+            return {'error':'usage: profile [start [sample|cprofile] [seconds] [hz] | stop]'}
+        try:
+            return self.profiler.start(*params[1:])
+        except ValueError as e:
+            return {'error':str(e)}
+
+    def _reply(self, station, key, cmd, params, obs = None, seq = None):
+        #Reply bytes for a query, cached while obs is the newest observation
+        newest, replies, newest_seq = self._caches[station]
+        if obs is not None and obs is not newest:
+            return self._build_reply(obs, cmd, params, station, seq)
+        reply = replies.get(key)
+        if reply is None:
+            reply = self._build_reply(newest, cmd, params, station, newest_seq)
+            if newest is not None and len(replies) < MAX_CACHED: replies[key] = reply
+        return reply
+
+    def _fan_out(self):
+        '''
+        Pushes queued observations to every due subscriber.  Sends never
+        block: UDP datagrams that would block are dropped, TCP messages
+        wait in the subscriber's bounded buffer.
+        '''
+        now = time.time()
+        for query, station, obs, seq in self.pub_q.get_all():
+            if query is None: t = epoch(obs.ts)
+            for key, sub in self.subs.items():
+                if sub.expires is not None and sub.expires < now:
+                    del self.subs[key]
+                    continue
+                try:
+                    if query != subscribe.ALARMS:
+                        if sub.station != station or sub.query == subscribe.ALARMS or not sub.due(t): continue
+                        words = sub.query.split()
+                        payload = self._reply(station, sub.query, words[0], words[1:], obs, seq)
+                    elif sub.query == subscribe.ALARMS and sub.station in (station, subscribe.ALL):
+                        payload = obs #event JSON
+                    else:
+                        continue
+                    sub.push(payload)
+                except socket.error as e:
+                    if sub.udp: del self.subs[key]
+                    else: self._tcp_close(sub, str(e))
+                except Exception as e:
+                    #one bad subscription must not stop the fan out
+                    self.logger.warning('Push to {:s} subscriber \'{:s}\' failed: {:s}'.format(key[0], sub.query, str(e)))
+
+    def _tcp_accept(self):
+        try:
+            conn, addr = self.tcp_sock.accept()
+        except socket.error:
+            return
+        conn.setblocking(0)
+        self.clients[conn] = subscribe.Subscriber(conn, addr)
+        self.logger.info('Service TCP client connected: [{:s}:{:d}]'.format(*addr))
+
+    def _tcp_rx(self, sub):
+        try:
+            data = sub.sock.recv(4096)
+        except socket.error as e:
+            if e.args[0] in (errno.EAGAIN, errno.EWOULDBLOCK): return
+            data = ''
+        if not data or len(sub.inbuf) > subscribe.MAX_INBUF:
+            self._tcp_close(sub, 'closed')
+            return
+        sub.inbuf += data
+        while '\n' in sub.inbuf:
+            line, sub.inbuf = sub.inbuf.split('\n', 1)
+            line = line.strip()
+            if not line: continue
+            t0 = metrics.timer()
+            try:
+                reply = self._command(line, ('tcp', sub.sock.fileno()), sub)
+            except Exception as e:
+                #one bad command must not take the service thread down
+                self.logger.warning('Service TCP command \'{:s}\' failed: {:s}'.format(line, str(e)))
+                reply = json.dumps({'error':'command failed: {:s}'.format(str(e))})
+            if reply is None: reply = json.dumps({'error':'unknown command'})
+            try:
+                sub.push(reply)
+            except socket.error as e:
+                self._tcp_close(sub, str(e))
+                return
+            metrics.REPLY.observe(metrics.timer() - t0)
+
+    def _tcp_flush(self, sub):
+        try:
+            sub.flush()
+        except socket.error as e:
+            self._tcp_close(sub, str(e))
+
+    def _tcp_close(self, sub, reason):
+        if sub.sock not in self.clients: return
+        self.subs.pop(('tcp', sub.sock.fileno()), None)
+        del self.clients[sub.sock]
+        sub.sock.close()
+        self.logger.info('Service TCP client [{:s}:{:d}] {:s}, sent {:d} dropped {:d}'.format(
+            sub.addr[0], sub.addr[1], reason, sub.sent, sub.dropped))
+
+    def _build_reply(self, obs, cmd, params, station, seq):
+        if obs is None: return NO_DATA
+        if cmd == subscribe.WIRE:
+            return self.wire.encode(obs, self.station_ids[station], seq)
+        history, rollups, trackers = self.stations[station]
+        if cmd == 'peaks':
+            try:
+                if trackers is None: raise KeyError
+                return json.dumps(trackers.peaks(params[0] if params else None))
+            except KeyError:
+                return json.dumps({'error':'no peaks tracked for: {:s}'.format(' '.join(params))})
+        if cmd == 'latest':
+            return json.dumps(OrderedDict((k, _jsonable(v)) for k, v in zip(obs._fields, obs)))
+        if cmd == 'get':
+            #only record fields, not tuple methods like count/index
+            fields = obs._fields
+            return json.dumps(OrderedDict((k, _jsonable(getattr(obs, k)) if k in fields else None) for k in params))
+        if cmd == 'rollup':
+            try:
+                res = int(params[0])
+                n = int(params[1]) if len(params) > 1 else 1
+                if rollups is None or res not in rollups.resolutions: raise ValueError
+            except (IndexError, ValueError):
+                return json.dumps({'error':'usage: rollup <resolution> [n]'})
+            return json.dumps([r._asdict() for r in rollups.last(res, n)])
+        #window <field> <seconds>
+        try:
+            field, seconds = params[0], float(params[1])
+            if history is None or field not in history.index:
+                return json.dumps({'error':'unknown field: {:s}'.format(field)})
+        except (IndexError, ValueError):
+            return json.dumps({'error':'usage: window <field> <seconds>'})
+        resp = history.last(field, seconds)
+        resp['field'] = field
+        resp['seconds'] = seconds
+        return json.dumps(resp)
+
     def stop(self):
         print '{:s} Terminating...'.format(self.name)
         self.logger.info('{:s} Terminating...'.format(self.name))
         self._stop.set()
+        self._wake()
+
+    def _wake(self):
+        #Any thread, one loop pass of run()
+        os.write(self._wake_w, 'x')
 
     def stopped(self):
         return self._stop.isSet()
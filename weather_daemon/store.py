@@ -0,0 +1,305 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Observation History Store        #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Append only fixed width day segments   #
+#   -Memory mapped reads, sparse ts index   #
+#############################################
+
+import os
+import time
+import datetime
+import threading
+import logging
+import numpy
+
+import ring_buffer
+from packets import DASHED
+
+#--Record Layout--------------------------------------------------------
+# (name, struct code, divisor) - values are stored little endian in the
+# station's own integer units.  A field the observation did not carry or
+# that was dashed is stored as the console's dashed value,
+# packets.DASHED[code][0].
+STORE_LAYOUT = [
+    ('barometer',       'H',    1000.0),    #In. Hg.
+    ('inside_temp',     'h',    10.0),      #deg F
+    ('outside_temp',    'h',    10.0),      #deg F
+    ('inside_hum',      'B',    None),      #% humidity
+    ('outside_hum',     'B',    None),      #% humidity
+    ('wind_speed',      'B',    None),      #mph
+    ('wind_avg',        'B',    None),      #mph, 10 minute average
+    ('wind_dir',        'H',    None),      #degrees
+    ('wind_gust_10min', 'H',    None),      #mph, LOOP2 only
+    ('rain_rate',       'H',    100.0),     #inches/hour
+    ('day_rain',        'H',    100.0),     #inches
+    ('solar_rad',       'H',    None),      #watts/m^2
+    ('uv_index',        'B',    10.0),      #uv index
+    ('bar_trend',       'b',    None),
+]
+
+#STORE_LAYOUT fields a DMPAFT archive record carries, as (archive column,
+#dashed value in station units), see packets.ARCHIVE_LAYOUT.  The archive
+#wind_dir is a 0-15 compass point.
+ARCHIVE_FIELDS = {
+    'barometer':        ('barometer',       0),
+    'inside_temp':      ('inside_temp',     0x7FFF),
+    'outside_temp':     ('outside_temp',    0x7FFF),
+    'inside_hum':       ('inside_hum',      0xFF),
+    'outside_hum':      ('outside_hum',     0xFF),
+    'wind_avg':         ('wind_avg',        0xFF),
+    'wind_dir':         ('wind_dir',        0xFF),
+    'solar_rad':        ('solar_rad',       0x7FFF),
+    'uv_index':         ('uv_index',        0xFF),
+}
+
+RECORD_DTYPE = numpy.dtype([('ts', '<f8')] + [(name, '<' + code) for name, code, divisor in STORE_LAYOUT])
+RECORD_SIZE  = RECORD_DTYPE.itemsize #30 bytes
+FIELDS       = tuple(name for name, code, divisor in STORE_LAYOUT)
+
+INDEX_STRIDE    = 256   #one sparse index entry per this many records
+BATCH_RECORDS   = 64    #records buffered before a write
+FSYNC_INTERVAL  = 60.0  #seconds between fsyncs of the open segment
+
+
+def segment_name(day):
+    return 'wx_{:s}.dat'.format(day.strftime('%Y%m%d'))
+
+
+class Segment(object):
+    '''
+    One day of records, memory mapped read only.  The sparse index holds
+    every INDEX_STRIDE-th timestamp, so a lookup binary searches the index
+    and then a single stride of the mapped ts column.
+    '''
+    def __init__(self, path):
+        self.path   = path
+        self.size   = os.path.getsize(path)
+        n = self.size // RECORD_SIZE
+        if n: self.recs = numpy.memmap(path, dtype=RECORD_DTYPE, mode='r', shape=(n,))
+        else: self.recs = numpy.zeros(0, dtype=RECORD_DTYPE)
+        self.index  = numpy.array(self.recs['ts'][::INDEX_STRIDE])
+
+    def _find(self, t, side):
+        blk = max(0, numpy.searchsorted(self.index, t, side) - 1)
+        a = blk * INDEX_STRIDE
+        b = min(len(self.recs), a + 2 * INDEX_STRIDE)
+        return a + numpy.searchsorted(self.recs['ts'][a:b], t, side)
+
+    def range(self, t0, t1):
+        #zero copy view of records with t0 <= ts <= t1
+        return self.recs[self._find(t0, 'left'):self._find(t1, 'right')]
+
+
+class History_Store(object):
+    '''
+    Append only store of observations in fixed width day segments.  It
+    keeps the STORE_LAYOUT subset of each observation, row by row, for
+    long range history beyond the ring buffer; derived fields and the rest
+    of LOOP/LOOP2 are not stored.  Queried through the service 'history'
+    command.  append() buffers records in a preallocated batch that is
+    written with one os.write when full or when flush() is called; the
+    open segment is fsynced at most every FSYNC_INTERVAL seconds.  Records
+    must arrive in time order, late ones are counted and dropped,
+    including ones older than what a segment already held when it was
+    opened.
+    '''
+    def __init__(self, path):
+        self.path       = path
+        self.logger     = logging.getLogger('wxd')
+        if not os.path.isdir(path): os.makedirs(path)
+
+        self.lock       = threading.Lock()
+        self.batch      = numpy.zeros(BATCH_RECORDS, dtype=RECORD_DTYPE)
+        self.pending    = 0
+        self.day        = None
+        self.fd         = None
+        self.last_ts    = -numpy.inf
+        self.last_fsync = time.time()
+        self.segments   = {} #path -> Segment, reopened when the file grows
+
+        self.written    = 0
+        self.dropped    = 0
+        self.reported   = 0 #dropped count last logged
+
+        self._plans     = {}
+
+    def _plan(self, rec_type):
+        plan = []
+        for name, code, divisor in STORE_LAYOUT:
+            idx = rec_type._fields.index(name) if name in rec_type._fields else None
+            plan.append((name, idx, divisor, DASHED[code][0]))
+        self._plans[rec_type] = plan
+        return plan
+
+    def append(self, obs):
+        t = ring_buffer.epoch(obs.ts)
+        plan = self._plans.get(type(obs))
+        if plan is None: plan = self._plan(type(obs))
+        with self.lock:
+            if t <= self.last_ts:
+                self.dropped += 1
+                return
+            day = obs.ts.date()
+            if day != self.day:
+                self._write()
+                self._open(day)
+                if t <= self.last_ts: #older than the segment's newest record
+                    self.dropped += 1
+                    return
+            rec = self.batch[self.pending]
+            rec['ts'] = t
+            for name, idx, divisor, missing in plan:
+                v = obs[idx] if idx is not None else None
+                if v is None or v != v: #not carried, or dashed (NaN)
+                    rec[name] = missing
+                elif divisor:
+                    rec[name] = int(round(v * divisor))
+                else:
+                    rec[name] = v
+            self.pending += 1
+            self.last_ts = t
+            if self.pending == BATCH_RECORDS: self._write()
+
+    def append_archive(self, ts, cols):
+        '''
+        Stores DMPAFT archive records: cols from
+        packets.decode_archive_pages cut down to the valid records, ts their
+        epoch seconds.  Fields an archive record does not carry and dashed
+        values are stored as missing, records at or before the newest
+        stored one are dropped like late observations.  Returns the number
+        of records stored.
+        '''
+        order = numpy.argsort(ts, kind='mergesort')
+        recs = numpy.zeros(len(order), dtype=RECORD_DTYPE)
+        recs['ts'] = ts[order]
+        for name, code, divisor in STORE_LAYOUT:
+            missing = DASHED[code][0]
+            src = ARCHIVE_FIELDS.get(name)
+            if src is None:
+                recs[name] = missing
+                continue
+            col, dashed = src
+            raw = cols[col][order]
+            if divisor: raw = numpy.round(raw * divisor)
+            raw = raw.astype(numpy.int64)
+            bad = raw == dashed
+            if name == 'wind_dir':
+                bad |= raw > 15
+                raw = (raw * 45 + 1) // 2 #compass point to degrees
+            raw[bad] = missing
+            recs[name] = raw
+        stored = 0
+        with self.lock:
+            for rec in recs:
+                t = rec['ts']
+                if t <= self.last_ts:
+                    self.dropped += 1
+                    continue
+                day = datetime.datetime.utcfromtimestamp(t).date()
+                if day != self.day:
+                    self._write()
+                    self._open(day)
+                    if t <= self.last_ts:
+                        self.dropped += 1
+                        continue
+                self.batch[self.pending] = rec
+                self.pending += 1
+                self.last_ts = t
+                stored += 1
+                if self.pending == BATCH_RECORDS: self._write()
+        return stored
+
+    def _open(self, day):
+        if self.fd is not None:
+            os.fsync(self.fd)
+            os.close(self.fd)
+        path = os.path.join(self.path, segment_name(day))
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0644)
+        #drop a torn trailing record left by a crash mid write
+        size = os.fstat(self.fd).st_size
+        if size % RECORD_SIZE:
+            size -= size % RECORD_SIZE
+            os.ftruncate(self.fd, size)
+        #an existing segment, from before a restart or a replay, stays
+        #sorted only if appends resume after its newest record
+        if size:
+            with open(path, 'rb') as f:
+                f.seek(size - RECORD_SIZE)
+                last = numpy.frombuffer(f.read(RECORD_SIZE), dtype=RECORD_DTYPE)['ts'][0]
+            self.last_ts = max(self.last_ts, last)
+        self.day = day
+
+    def _write(self):
+        if not self.pending: return
+        os.write(self.fd, self.batch[:self.pending].tobytes())
+        self.written += self.pending
+        self.pending = 0
+
+    def flush(self, sync=False):
+        '''
+        Writes buffered records, fsyncs when FSYNC_INTERVAL has passed.
+        Meant to be run periodically from the scheduler; logs records
+        dropped since the last flush.
+        '''
+        with self.lock:
+            if self.dropped != self.reported:
+                self.logger.warning('History Store {:s}: dropped {:d} records at or before the newest stored one, {:d} in total'.format(
+                    self.path, self.dropped - self.reported, self.dropped))
+                self.reported = self.dropped
+            self._write()
+            if self.fd is not None and (sync or time.time() - self.last_fsync >= FSYNC_INTERVAL):
+                os.fsync(self.fd)
+                self.last_fsync = time.time()
+
+    def close(self):
+        self.flush(True)
+        with self.lock:
+            if self.fd is not None: os.close(self.fd)
+            self.fd = None
+
+    def _segment(self, day):
+        path = os.path.join(self.path, segment_name(day))
+        if not os.path.exists(path): return None
+        seg = self.segments.get(path)
+        if seg is None or seg.size != os.path.getsize(path):
+            seg = Segment(path)
+            self.segments[path] = seg
+        return seg
+
+    def query(self, t0, t1):
+        '''
+        Records with t0 <= ts <= t1 (epoch seconds) as a list of zero copy
+        memory mapped views, one per day segment.  Only written records
+        are visible, call flush() first for the newest.
+        '''
+        out = []
+        day = datetime.datetime.utcfromtimestamp(t0).date()
+        last = datetime.datetime.utcfromtimestamp(t1).date()
+        while day <= last:
+            seg = self._segment(day)
+            if seg is not None:
+                recs = seg.range(t0, t1)
+                if len(recs): out.append(recs)
+            day += datetime.timedelta(days=1)
+        return out
+
+    def query_field(self, field, t0, t1):
+        '''
+        (ts, values) for one field in engineering units, missing (any
+        packets.DASHED value of the field's type) as NaN.
+        '''
+        parts = self.query(t0, t1)
+        if not parts: return numpy.zeros(0), numpy.zeros(0)
+        ts = numpy.concatenate([p['ts'] for p in parts])
+        raw = numpy.concatenate([p[field] for p in parts])
+        for name, code, divisor in STORE_LAYOUT:
+            if name == field: break
+        vals = raw.astype(numpy.float64)
+        if divisor: vals /= divisor
+        vals[numpy.in1d(raw, DASHED[code])] = numpy.nan
+        return ts, vals
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Observation Subscribers          #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Push subscriptions for Service_Thread  #
+#   -Bounded per subscriber buffers, never  #
+#    blocks the service loop                #
+#############################################
+
+import time
+import errno
+import socket
+from collections import deque
+
+import wire
+
+SUB_QUEUE   = 32    #pushes buffered per TCP subscriber, oldest dropped
+SUB_LEASE   = 300   #seconds a UDP subscription lives without a renewal
+MAX_INBUF   = 4096  #bytes of unterminated command from a TCP client
+
+_AGAIN = (errno.EAGAIN, errno.EWOULDBLOCK)
+
+
+ALARMS      = 'alarms' #query of alarm event subscribers
+ALL         = '*'      #station of subscribers to every station's alarms
+WIRE        = 'wire'   #query of binary wire record subscribers
+
+
+def parse_subscribe(params):
+    '''
+    subscribe [alarms] [fields=<f1>,<f2>..|wire] [interval=<seconds>] [coalesce]
+    Returns (alarms, fields, interval, coalesce, wire), raises ValueError.
+    '''
+    alarms, fields, interval, coalesce, wire = False, None, 0.0, False, False
+    for p in params:
+        key, sep, value = p.partition('=')
+        if key == 'fields' and value: fields = tuple(f for f in value.split(',') if f)
+        elif key == 'interval' and value: interval = float(value)
+        elif key == 'coalesce' and not sep: coalesce = True
+        elif key == ALARMS and not sep: alarms = True
+        elif key == WIRE and not sep: wire = True
+        else: raise ValueError(p)
+    if wire and (fields or alarms): raise ValueError('wire has a fixed field set')
+    return alarms, fields, interval, coalesce, wire
+
+
+class Subscriber(object):
+    '''
+    One push destination: a UDP address or a TCP connection.  A TCP
+    subscriber keeps at most SUB_QUEUE messages waiting for the socket
+    (one with coalesce, i.e. only the latest); older ones are dropped and
+    counted.  UDP pushes are single non-blocking sendto()s.
+    '''
+    __slots__ = ('sock', 'addr', 'udp', 'station', 'query', 'interval', 'out',
+                 'partial', 'inbuf', 'last_t', 'expires',
+                 'sent', 'dropped')
+
+    def __init__(self, sock, addr, udp=False):
+        self.sock       = sock  #TCP connection, or the service UDP socket
+        self.addr       = addr
+        self.udp        = udp
+        self.station    = None
+        self.query      = None  #reply cache key of the pushed payload
+        self.interval   = 0.0
+        self.out        = deque(maxlen=SUB_QUEUE)
+        self.partial    = ''    #unsent tail of the message being written
+        self.inbuf      = ''
+        self.last_t     = None  #observation time of the last push
+        self.expires    = None
+        self.sent       = 0
+        self.dropped    = 0
+
+    def subscribe(self, station, fields, interval, coalesce, alarms=False, wire=False):
+        self.station    = station
+        self.query      = 'latest'
+        if alarms: self.query = ALARMS
+        elif wire: self.query = WIRE
+        elif fields:
+            if 'ts' not in fields: fields = ('ts',) + fields
+            self.query = 'get ' + ' '.join(fields)
+        self.interval   = interval
+        self.out        = deque(self.out, maxlen=1 if coalesce else SUB_QUEUE)
+        self.last_t     = None
+        if self.udp: self.expires = time.time() + SUB_LEASE
+
+    def due(self, t):
+        #t is the observation time in epoch seconds
+        if self.last_t is not None and t - self.last_t < self.interval: return False
+        self.last_t = t
+        return True
+
+    def push(self, payload):
+        if self.udp:
+            try:
+                self.sock.sendto(payload, self.addr)
+                self.sent += 1
+            except socket.error as e:
+                if e.args[0] not in _AGAIN: raise
+                self.dropped += 1
+            return
+        if len(self.out) == self.out.maxlen: self.dropped += 1
+        #a wire record may hold 0x0A, it goes out unterminated and is
+        #framed by the size in its header
+        if not payload.startswith(wire.MAGIC): payload += '\n'
+        self.out.append(payload)
+        self.flush()
+
+    def pending(self):
+        return bool(self.partial or self.out)
+
+    def flush(self):
+        '''
+        Writes queued messages until the socket would block.  Raises
+        socket.error when the connection is broken.
+        '''
+        while self.partial or self.out:
+            if not self.partial:
+                self.partial = self.out.popleft()
+                self.sent += 1
+            try:
+                n = self.sock.send(self.partial)
+            except socket.error as e:
+                if e.args[0] in _AGAIN: return
+                raise
+            self.partial = self.partial[n:]
+
+    def info(self):
+        return {'addr':'{:s}:{:d}'.format(*self.addr), 'proto':'udp' if self.udp else 'tcp',
+                'station':self.station, 'query':self.query, 'interval':self.interval,
+                'queued':len(self.out), 'sent':self.sent, 'dropped':self.dropped}
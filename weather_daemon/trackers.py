@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Sliding Window Peak Trackers     #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Monotonic deque max/min per window     #
+#   -Gusts, peak rain rate, temperature     #
+#    rise/fall, amortized O(1) per update   #
+#############################################
+
+import threading
+from collections import deque, OrderedDict
+
+from ring_buffer import epoch
+
+WINDOWS = (3, 120, 600) #seconds: WMO 3 s gust, 2 min, 10 min
+
+MAX, MIN = 1, -1
+
+#(field, MAX/MIN) tracked over every window.  A field tracked both ways
+#also reports rise (latest - min) and fall (latest - max).
+DEFAULT_TRACKS = (('wind_speed', MAX), ('rain_rate', MAX),
+                  ('outside_temp', MAX), ('outside_temp', MIN))
+
+
+class Window_Extreme(object):
+    '''
+    Max (or min) of the values seen in the last `seconds`.  The deque holds
+    a decreasing run of (t, value * sign), every value enters and leaves it
+    once, so update() is amortized O(1) and value() is the front.
+    '''
+    __slots__ = ('seconds', 'sign', 'q')
+
+    def __init__(self, seconds, sign=MAX):
+        self.seconds    = seconds
+        self.sign       = sign
+        self.q          = deque()
+
+    def update(self, t, value):
+        v = value * self.sign
+        q = self.q
+        while q and q[-1][1] <= v: q.pop()
+        q.append((t, v))
+        self.expire(t)
+
+    def expire(self, t):
+        q = self.q
+        limit = t - self.seconds
+        while q and q[0][0] < limit: q.popleft()
+
+    def value(self):
+        if not self.q: return None
+        return self.q[0][1] * self.sign
+
+
+class Peak_Tracker(object):
+    '''
+    Window_Extreme per (field, mode, window), fed every observation.
+    Windows end at the newest observation, like Obs_Ring_Buffer.last(),
+    so peaks() never rescans history.  Missing (NaN/None) values are
+    skipped.
+    '''
+    def __init__(self, tracks=DEFAULT_TRACKS, windows=WINDOWS):
+        self.windows    = tuple(windows)
+        self.fields     = tuple(OrderedDict.fromkeys(f for f, mode in tracks))
+        self.extremes   = OrderedDict() #field -> [(mode, window, Window_Extreme)]
+        for field, mode in tracks:
+            self.extremes.setdefault(field, []).extend(
+                (mode, w, Window_Extreme(w, mode)) for w in self.windows)
+        self.latest     = dict((f, None) for f in self.fields)
+        self.lock       = threading.Lock()
+        self._plans     = {}
+
+    def _plan(self, rec_type):
+        plan = tuple((f, rec_type._fields.index(f)) for f in self.fields if f in rec_type._fields)
+        self._plans[rec_type] = plan
+        return plan
+
+    def update(self, obs):
+        plan = self._plans.get(type(obs))
+        if plan is None: plan = self._plan(type(obs))
+        t = epoch(obs.ts)
+        with self.lock:
+            for field, idx in plan:
+                v = obs[idx]
+                if v is None or v != v:
+                    for mode, w, ext in self.extremes[field]: ext.expire(t)
+                    continue
+                self.latest[field] = v
+                for mode, w, ext in self.extremes[field]:
+                    ext.update(t, v)
+
+    def peaks(self, field=None):
+        '''
+        {field: {window: {'max', 'min', 'rise', 'fall'}}}, only the keys
+        tracked for that field.  Raises KeyError on an untracked field.
+        '''
+        if field is not None and field not in self.extremes: raise KeyError(field)
+        fields = self.fields if field is None else (field,)
+        out = OrderedDict()
+        with self.lock:
+            for f in fields:
+                per = OrderedDict((str(w), OrderedDict()) for w in self.windows)
+                for mode, w, ext in self.extremes[f]:
+                    per[str(w)]['max' if mode == MAX else 'min'] = ext.value()
+                latest = self.latest[f]
+                for stats in per.values():
+                    if latest is None or 'max' not in stats or 'min' not in stats: continue
+                    if stats['min'] is not None: stats['rise'] = latest - stats['min']
+                    if stats['max'] is not None: stats['fall'] = latest - stats['max']
+                out[f] = per
+        return out
+
+    def gust(self, window=WINDOWS[0]):
+        #Peak wind speed over window seconds, None before the first sample
+        with self.lock:
+            for mode, w, ext in self.extremes.get('wind_speed', ()):
+                if mode == MAX and w == window: return ext.value()
+        return None
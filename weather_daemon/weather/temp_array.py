@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+#
+# Array aware versions of the derived products in temp.py
+#
+# COMMENT:
+#   - Same formulas, term for term, as weather/temp.py so results are
+#     identical to the scalar path, but branches are written with
+#     numpy.where / numpy.maximum so whole columns can be computed at once.
+#   - Inputs are cast to float64 first; batch columns arrive as uint8/int16
+#     and would otherwise overflow in terms like hum ** 2.
+#   - The unit conversions in temp.py are plain arithmetic and already
+#     accept arrays, they are re-exported here unchanged.
+#   - Utilized in VTGS weather Daemon for batch derived weather products.
+
+import numpy
+
+from temp import celsius_to_fahrenheit, celsius_to_kelvin, celsius_to_rankine, \
+                 fahrenheit_to_celsius, fahrenheit_to_kelvin, fahrenheit_to_rankine, \
+                 kelvin_to_celsius, kelvin_to_fahrenheit, kelvin_to_rankine, \
+                 rankine_to_celsius, rankine_to_fahrenheit, rankine_to_kelvin
+
+__doc__ = 'array aware temperature related functions'
+__usage__ = 'this module should not be run via the command line'
+
+
+def _f64(x):
+    return numpy.asarray(x, dtype=numpy.float64)
+
+
+def calc_heat_index(temp, hum):
+    '''
+    calculates the heat index based upon temperature (in F) and humidity.
+    array version of temp.calc_heat_index.
+    returns the heat index in degrees F.
+    '''
+    temp = _f64(temp)
+    hum = _f64(hum)
+    hi = -42.379 + 2.04901523 * temp + 10.14333127 * hum - 0.22475541 * \
+         temp * hum - 6.83783 * (10 ** -3) * (temp ** 2) - 5.481717 * \
+         (10 ** -2) * (hum ** 2) + 1.22874 * (10 ** -3) * (temp ** 2) * \
+         hum + 8.5282 * (10 ** -4) * temp * (hum ** 2) - 1.99 * \
+         (10 ** -6) * (temp ** 2) * (hum ** 2)
+    return numpy.where(temp < 80, temp, hi)
+
+
+def calc_wind_chill(t, windspeed, windspeed10min=None):
+    '''
+    calculates the wind chill value based upon the temperature (F) and
+    wind.  array version of temp.calc_wind_chill.
+    returns the wind chill in degrees F.
+    '''
+    t = _f64(t)
+    if windspeed10min is None:
+        w = _f64(windspeed)
+    else:
+        w = numpy.maximum(_f64(windspeed10min), _f64(windspeed))
+    return 35.74 + 0.6215 * t - 35.75 * (w ** 0.16) + 0.4275 * t * (w ** 0.16)
+
+
+def calc_humidity(temp, dewpoint):
+    '''
+    calculates the humidity via the formula from weatherwise.org
+    array version of temp.calc_humidity.
+    return the relative humidity
+    '''
+    t = fahrenheit_to_celsius(_f64(temp))
+    td = fahrenheit_to_celsius(_f64(dewpoint))
+
+    num = 112 - (0.1 * t) + td
+    denom = 112 + (0.9 * t)
+
+    return numpy.power((num / denom), 8)
+
+
+def calc_dewpoint(temp, hum):
+    '''
+    calculates the dewpoint via the formula from weatherwise.org
+    array version of temp.calc_dewpoint.
+    return the dewpoint in degrees F.
+    '''
+    c = fahrenheit_to_celsius(_f64(temp))
+    x = 1 - 0.01 * _f64(hum)
+
+    dewpoint = (14.55 + 0.114 * c) * x
+    dewpoint = dewpoint + ((2.5 + 0.007 * c) * x) ** 3
+    dewpoint = dewpoint + (15.9 + 0.117 * c) * x ** 14
+    dewpoint = c - dewpoint
+
+    return celsius_to_fahrenheit(dewpoint)
@@ -24,8 +24,8 @@ from main_thread import *
 import argparse
 
 
-def main():
-    """ Main entry point to start the service. """
+def build_parser():
+    """ Command line parser, also used by the benchmarks for their defaults. """
 
     startup_ts = datetime.datetime.utcnow().strftime("%Y%m%d_%H%M%S")
     #--------START Command Line argument parser------------------------------------------------------
@@ -60,10 +60,87 @@ def main():
                        action="store")
     wx.add_argument('--wx_rate',
                        dest='wx_rate',
-                       type=int,
+                       type=float,
                        default='5',
                        help="Weather Station Query Rate (seconds)",
                        action="store")
+    wx.add_argument('--wx_stream',
+                       dest='wx_stream',
+                       default=False,
+                       help="Stream LOOP packets with LOOP n instead of polling",
+                       action="store_true")
+    wx.add_argument('--wx_loop_n',
+                       dest='wx_loop_n',
+                       type=int,
+                       default='200',
+                       help="Packets requested per LOOP n in streaming mode",
+                       action="store")
+    wx.add_argument('--wx_loop2',
+                       dest='wx_loop2',
+                       default=False,
+                       help="Request LOOP and LOOP2 packets (LPS 3 n) and merge them",
+                       action="store_true")
+    wx.add_argument('--wx_history',
+                       dest='wx_history',
+                       type=float,
+                       default='24',
+                       help="Hours of observations kept in memory for windowed queries",
+                       action="store")
+    wx.add_argument('--wx_archive',
+                       dest='wx_archive',
+                       default=False,
+                       help="Download archive records missed since the last run (DMPAFT)",
+                       action="store_true")
+    wx.add_argument('--wx_archive_ckpt',
+                       dest='wx_archive_ckpt',
+                       type=str,
+                       default=None,
+                       help="Archive checkpoint file, default <log_path>/wxd_archive.json",
+                       action="store")
+    wx.add_argument('--wx_stations',
+                       dest='wx_stations',
+                       type=str,
+                       default=None,
+                       help="JSON station list, polls every station instead of --wx_ip",
+                       action="store")
+    wx.add_argument('--wx_alarms',
+                       dest='wx_alarms',
+                       type=str,
+                       default=None,
+                       help="JSON alarm rules (e.g. wind stow) evaluated on every observation",
+                       action="store")
+    wx.add_argument('--wx_adaptive',
+                       dest='wx_adaptive',
+                       type=str,
+                       default=None,
+                       help="JSON rate policy, faster polls or LOOP n in high wind/rain/pressure trend",
+                       action="store")
+    wx.add_argument('--wx_capture',
+                       dest='wx_capture',
+                       type=str,
+                       default=None,
+                       help="Record raw LOOP/LOOP2/archive frames to this capture file",
+                       action="store")
+    wx.add_argument('--wx_elevation',
+                       dest='wx_elevation',
+                       type=float,
+                       default=None,
+                       help="Station elevation, feet, for station pressure/altimeter without LOOP2",
+                       action="store")
+
+    replay = parser.add_argument_group('Capture replay, no station connection')
+    replay.add_argument('--replay',
+                       dest='replay',
+                       type=str,
+                       default=None,
+                       help="Feed a capture file through the pipeline instead of a station",
+                       action="store")
+    replay.add_argument('--replay_speed',
+                       dest='replay_speed',
+                       type=float,
+                       default=1.0,
+                       help="Replay speed, 1 = real time, N = xN, 0 = as fast as possible",
+                       action="store")
 
     other = parser.add_argument_group('Other daemon settings')
     other.add_argument('--log_path',
@@ -72,6 +149,60 @@ def main():
                        default='/log/wxd',
                        help="Relay daemon logging path",
                        action="store")
+    other.add_argument('--log_max_mb',
+                       dest='log_max_mb',
+                       type=float,
+                       default='50',
+                       help="Rotate the daemon log at this size, MB, 0 = no size limit",
+                       action="store")
+    other.add_argument('--log_rotate',
+                       dest='log_rotate',
+                       type=float,
+                       default='24',
+                       help="Rotate the daemon log after this many hours, 0 = never",
+                       action="store")
+    other.add_argument('--log_backups',
+                       dest='log_backups',
+                       type=int,
+                       default='10',
+                       help="Rotated daemon logs kept, 0 = keep all",
+                       action="store")
+    other.add_argument('-v', '--verbose',
+                       dest='verbose',
+                       default=0,
+                       help="Log every observation, -vv logs every field",
+                       action="count")
+    other.add_argument('--store_path',
+                       dest='store_path',
+                       type=str,
+                       default=None,
+                       help="Observation history store, default <log_path>/store, <log_path>/replay_store with --replay",
+                       action="store")
+    other.add_argument('--queue_size',
+                       dest='queue_size',
+                       type=int,
+                       default=1024,
+                       help="Observations queued for storage per station before overflow",
+                       action="store")
+    other.add_argument('--queue_policy',
+                       dest='queue_policy',
+                       type=str,
+                       default='drop_oldest',
+                       choices=['drop_oldest', 'keep_latest', 'block'],
+                       help="Observation queue overflow policy",
+                       action="store")
+    other.add_argument('--metrics_port',
+                       dest='metrics_port',
+                       type=int,
+                       default=None,
+                       help="Serve latency/throughput metrics on 127.0.0.1:<port>/metrics, off by default",
+                       action="store")
+    other.add_argument('--metrics_interval',
+                       dest='metrics_interval',
+                       type=float,
+                       default='5',
+                       help="Seconds a rendered metrics scrape is reused",
+                       action="store")
     other.add_argument('--startup_ts',
                        dest='startup_ts',
                        type=str,
@@ -85,7 +216,13 @@ def main():
     #                   help="Daemon startup timestamp",
     #                   action="store")
 
-    args = parser.parse_args()
+    return parser
+
+
+def main():
+    """ Main entry point to start the service. """
+
+    args = build_parser().parse_args()
     #--------END Command Line argument parser------------------------------------------------------ 
 
     main_thread = Main_Thread(args)
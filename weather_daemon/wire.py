@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+#############################################
+#   Title: Observation Wire Format          #
+# Project: VTGS Weather Daemon              #
+# Version: 1.0                              #
+#    Date: Oct 17, 2026                     #
+#  Author: Zach Leffke, KJ4QLP              #
+# Comment:                                  #
+#   -Fixed layout, versioned binary record  #
+#    of one observation, 61 bytes           #
+#   -Scaled integers in Davis units         #
+#############################################
+
+import struct
+import operator
+from collections import namedtuple
+
+from ring_buffer import epoch
+from packets import DASHED
+
+MAGIC       = 'WX'
+VERSION     = 2     #2: every packets.DASHED value is missing, 1 only -0x80/0xFF/-0x8000/0xFFFF
+FLAG_LOOP2  = 0x01  #LPS record, thsw/station pressure/altimeter came from LOOP2
+
+#--Record Layout--------------------------------------------------------
+# Little endian, header then one scaled integer per field:
+#   magic 'WX', version, record size, flags, station id, sequence,
+#   time (epoch seconds, milliseconds)
+# Station id is 0 for the single station daemon, 1.. in --wx_stations
+# order otherwise.  Sequence counts observations per station as the
+# weather thread decodes them, a gap means observations were dropped on
+# the way.  A record is binary and may contain 0x0A; on a byte stream it
+# is framed by the size field, not by a terminator.
+HEADER_LAYOUT = [
+    ('magic',       '2s'),
+    ('version',     'B'),
+    ('size',        'B'),
+    ('flags',       'B'),
+    ('station',     'H'),
+    ('seq',         'I'),
+    ('ts_s',        'I'),
+    ('ts_ms',       'H'),
+]
+
+#   (name, struct code, scale), sent as round(value * scale)
+WIRE_LAYOUT = [
+    ('barometer',           'H', 1000),     #In. Hg.
+    ('bar_trend',           'b', 1),
+    ('inside_temp',         'h', 10),       #deg F
+    ('inside_hum',          'B', 1),        #% humidity
+    ('outside_temp',        'h', 10),       #deg F
+    ('outside_hum',         'B', 1),        #% humidity
+    ('wind_speed',          'B', 1),        #mph
+    ('wind_avg',            'B', 1),        #mph, 10 minute average
+    ('wind_dir',            'H', 1),        #degrees
+    ('rain_rate',           'H', 100),      #inches/hour
+    ('day_rain',            'H', 100),      #inches
+    ('storm_rain',          'H', 100),      #inches
+    ('uv_index',            'B', 10),       #uv index
+    ('solar_rad',           'H', 1),        #watts/m^2
+    ('day_et',              'H', 1000),     #inches
+    ('battery',             'H', 100),      #Volts
+    ('dew_point_out',       'h', 10),       #deg F
+    ('wind_chill',          'h', 10),       #deg F
+    ('heat_index',          'h', 10),       #deg F
+    ('thsw',                'h', 10),       #deg F
+    ('wet_bulb',            'h', 10),       #deg F
+    ('station_pressure',    'H', 1000),     #In. Hg.
+    ('altimeter_setting',   'H', 1000),     #In. Hg.
+    ('cloud_base',          'H', 1),        #feet
+    ('et_hour',             'H', 1000),     #inches
+]
+
+#Missing (NaN, absent from the record type, out of range) is sent as the
+#console's dashed value of the field's type, packets.DASHED[code][0].  A
+#value that scales to any dashed value is sent as missing too, so a
+#decoder treats all of DASHED[code] as missing and everything else as
+#valid.
+LIMITS  = {'b':(-0x80, 0x7F), 'B':(0, 0xFF), 'h':(-0x8000, 0x7FFF), 'H':(0, 0xFFFF)}
+MISSING = dict((code, values[0]) for code, values in DASHED.items())
+_DASHED = dict((code, frozenset(values)) for code, values in DASHED.items())
+
+WIRE_NAMES      = tuple(name for name, code, scale in WIRE_LAYOUT)
+HEADER_STRUCT   = struct.Struct('<' + ''.join(code for name, code in HEADER_LAYOUT))
+RECORD_STRUCT   = struct.Struct(HEADER_STRUCT.format + ''.join(code for name, code, scale in WIRE_LAYOUT))
+HEADER_SIZE     = HEADER_STRUCT.size
+RECORD_SIZE     = RECORD_STRUCT.size
+
+Wire_Record = namedtuple('Wire_Record', ('station', 'seq', 'ts', 'flags') + WIRE_NAMES)
+
+
+class Wire_Encoder(object):
+    '''
+    Packs observations into a preallocated RECORD_SIZE buffer.  The fields
+    a record type carries are fetched with one itemgetter resolved per
+    record type; a field it does not carry is always sent as missing.
+    '''
+    def __init__(self):
+        self.buf    = bytearray(RECORD_SIZE)
+        self._plans = {}
+
+    def _plan(self, rec_type):
+        fields = rec_type._fields
+        present = [(i, name, code, scale) for i, (name, code, scale) in enumerate(WIRE_LAYOUT) if name in fields]
+        getter = operator.itemgetter(*[fields.index(name) for i, name, code, scale in present] + [0])
+        consts = tuple((i, scale, MISSING[code], _DASHED[code]) + LIMITS[code]
+                       for i, name, code, scale in present)
+        vals = [MISSING[code] for name, code, scale in WIRE_LAYOUT] #preallocated per record type
+        flags = FLAG_LOOP2 if 'bar_abs' in fields else 0
+        plan = self._plans[rec_type] = (getter, consts, vals, flags)
+        return plan
+
+    def encode(self, obs, station=0, seq=0):
+        getter, consts, vals, flags = self._plans.get(type(obs)) or self._plan(type(obs))
+        for x, (i, scale, missing, dashed, lo, hi) in zip(getter(obs), consts): #ts at the end is dropped
+            if x is None or x != x: #NaN != NaN
+                vals[i] = missing
+                continue
+            x *= scale
+            x = int(x + 0.5) if x >= 0 else int(x - 0.5)
+            vals[i] = x if lo <= x <= hi and x not in dashed else missing
+        t = epoch(obs.ts) if obs.ts is not None else 0.0
+        s = int(t)
+        RECORD_STRUCT.pack_into(self.buf, 0, MAGIC, VERSION, RECORD_SIZE, flags,
+                                station, seq & 0xFFFFFFFF, s, int((t - s) * 1000), *vals)
+        return str(self.buf)
+
+
+_DECODE = tuple((_DASHED[code], float(scale) if scale != 1 else None) for name, code, scale in WIRE_LAYOUT)
+
+def decode(data, offset=0):
+    '''
+    Unpacks one wire record into a Wire_Record, ts in epoch seconds and
+    missing values as NaN.  Raises ValueError on anything that is not a
+    complete record of this version.
+    '''
+    if len(data) - offset < HEADER_SIZE:
+        raise ValueError('Short wire record: {:d} bytes'.format(len(data) - offset))
+    magic, version, size = HEADER_STRUCT.unpack_from(data, offset)[:3]
+    if magic != MAGIC:
+        raise ValueError('Not a wire record')
+    if version != VERSION or size != RECORD_SIZE:
+        raise ValueError('Unsupported wire record version {:d}, size {:d}'.format(version, size))
+    if len(data) - offset < RECORD_SIZE:
+        raise ValueError('Short wire record: {:d} bytes'.format(len(data) - offset))
+    raw = RECORD_STRUCT.unpack_from(data, offset)
+    vals = [raw[4], raw[5], raw[6] + raw[7] * 1e-3, raw[3]] #station, seq, ts, flags
+    for x, (dashed, scale) in zip(raw[len(HEADER_LAYOUT):], _DECODE):
+        if x in dashed: vals.append(float('nan'))
+        elif scale is None: vals.append(x)
+        else: vals.append(x / scale)
+    return Wire_Record._make(vals)